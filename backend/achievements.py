@@ -0,0 +1,333 @@
+"""
+Achievement engine for QuizMaster.
+
+Rules are evaluated against a handful of per-user counters kept in
+``user_achievement_stats`` (completions, score sum, perfect scores,
+fastest time, categories explored, daily streaks, quizzes created)
+instead of the user's history. ``consume`` folds submission and creation
+events into those counters in O(1) per event, re-evaluates only the
+rules that watch a counter the event changed and are not unlocked yet,
+and stores new unlocks in ``user_achievements``. Unlocked rules are also
+kept as a bitmask on the counters row, so an event costs one
+primary-key read per user.
+
+Events carry the result or quiz id, and ids at or below the last one
+counted are skipped, so delivering an event twice is harmless.
+``rebuild`` recomputes everything from stored results for backfills.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import text
+
+from partitions import archived_months, results_table
+
+PERFECT_SCORE = 100
+
+COUNTERS = (
+    "quizzes_completed", "score_sum", "perfect_scores", "fastest_time", "categories_explored",
+    "current_streak", "longest_streak", "quizzes_created",
+)
+_STATE = ("last_active_day", "last_result_id", "last_quiz_id", "unlocked_mask")
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    bit: int  # position in user_achievement_stats.unlocked_mask; never reuse or renumber
+    name: str
+    description: str
+    watches: Tuple[str, ...]  # counters whose changes can unlock the rule
+    target: float
+    value: Callable[[Mapping], float]  # progress towards target; unlocked once it reaches it
+
+
+def _average(counters):
+    completed = counters["quizzes_completed"]
+    return counters["score_sum"] / completed if completed else 0
+
+
+def _is_fast(counters):
+    fastest = counters["fastest_time"]
+    return 1 if fastest is not None and fastest <= 120 else 0
+
+
+RULES = (
+    Rule("first_quiz", 0, "Getting Started", "Complete your first quiz",
+         ("quizzes_completed",), 1, lambda c: c["quizzes_completed"]),
+    Rule("quiz_master", 1, "Quiz Master", "Complete 10 quizzes",
+         ("quizzes_completed",), 10, lambda c: c["quizzes_completed"]),
+    Rule("perfect_score", 2, "Perfect Score", "Get 100% on any quiz",
+         ("perfect_scores",), 1, lambda c: c["perfect_scores"]),
+    Rule("high_achiever", 3, "High Achiever", "Maintain 80%+ average score over at least 5 quizzes",
+         ("quizzes_completed", "score_sum"), 80, lambda c: _average(c) if c["quizzes_completed"] >= 5 else 0),
+    Rule("speed_demon", 4, "Speed Demon", "Complete a quiz in under 2 minutes",
+         ("fastest_time",), 1, _is_fast),
+    Rule("knowledge_seeker", 5, "Knowledge Seeker", "Try quizzes from 3 different categories",
+         ("categories_explored",), 3, lambda c: c["categories_explored"]),
+    Rule("creator", 6, "Quiz Creator", "Create your first quiz",
+         ("quizzes_created",), 1, lambda c: c["quizzes_created"]),
+    Rule("prolific_creator", 7, "Prolific Creator", "Create 5 quizzes",
+         ("quizzes_created",), 5, lambda c: c["quizzes_created"]),
+    Rule("on_a_roll", 8, "On a Roll", "Complete quizzes on 3 days in a row",
+         ("longest_streak",), 3, lambda c: c["longest_streak"]),
+    Rule("dedicated", 9, "Dedicated", "Complete quizzes on 7 days in a row",
+         ("longest_streak",), 7, lambda c: c["longest_streak"]),
+)
+RULES_BY_ID = {rule.id: rule for rule in RULES}
+_RULES_BY_COUNTER: Dict[str, List[Rule]] = {}
+for _rule in RULES:
+    for _counter in _rule.watches:
+        _RULES_BY_COUNTER.setdefault(_counter, []).append(_rule)
+
+
+def new_counters() -> dict:
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(fastest_time=None, last_active_day=None, last_result_id=0, last_quiz_id=0, unlocked_mask=0)
+    return counters
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def advance_streak(counters: dict, day: date) -> bool:
+    """Count a day with a completed quiz; days at or before the last active day change nothing"""
+    last = counters["last_active_day"]
+    if last is not None and day <= last:
+        return False
+    consecutive = last is not None and (day - last).days == 1
+    counters["current_streak"] = counters["current_streak"] + 1 if consecutive else 1
+    counters["longest_streak"] = max(counters["longest_streak"], counters["current_streak"])
+    counters["last_active_day"] = day
+    return True
+
+
+def apply_completion(counters: dict, score: int, time_taken: Optional[int], day: date, new_category: bool) -> set:
+    """Fold one completed quiz into the counters; returns the names of the counters that changed"""
+    changed = {"quizzes_completed", "score_sum"}
+    counters["quizzes_completed"] += 1
+    counters["score_sum"] += score or 0
+    if (score or 0) >= PERFECT_SCORE:
+        counters["perfect_scores"] += 1
+        changed.add("perfect_scores")
+    if time_taken and (counters["fastest_time"] is None or time_taken < counters["fastest_time"]):
+        counters["fastest_time"] = time_taken
+        changed.add("fastest_time")
+    if new_category:
+        counters["categories_explored"] += 1
+        changed.add("categories_explored")
+    if advance_streak(counters, day):
+        changed.update(("current_streak", "longest_streak"))
+    return changed
+
+
+def newly_unlocked(counters: dict, changed: Iterable[str]) -> List[Rule]:
+    """Rules watching a changed counter that are met now and were not unlocked before; marks them unlocked"""
+    unlocked = []
+    for counter in changed:
+        for rule in _RULES_BY_COUNTER.get(counter, ()):
+            if not counters["unlocked_mask"] >> rule.bit & 1 and rule.value(counters) >= rule.target:
+                counters["unlocked_mask"] |= 1 << rule.bit
+                unlocked.append(rule)
+    return unlocked
+
+
+def progress(counters: Mapping) -> List[dict]:
+    return [
+        {"id": rule.id, "name": rule.name, "description": rule.description,
+         "progress": min(rule.value(counters), rule.target), "target": rule.target,
+         "unlocked": bool(counters["unlocked_mask"] >> rule.bit & 1)}
+        for rule in RULES
+    ]
+
+
+def completion_event(result_id: int, user_id: int, category: str, score: int, time_taken: Optional[int],
+                     completed_at: datetime) -> dict:
+    return {"type": "quiz_completed", "user_id": user_id, "result_id": result_id, "category": category,
+            "score": score, "time_taken": time_taken, "completed_at": completed_at}
+
+
+def creation_event(quiz_id: int, user_id: int) -> dict:
+    return {"type": "quiz_created", "user_id": user_id, "quiz_id": quiz_id}
+
+
+_COLUMNS = COUNTERS + _STATE
+
+
+def load_counters(conn, user_id: int) -> Optional[dict]:
+    row = conn.execute(text(
+        f"SELECT {', '.join(_COLUMNS)} FROM user_achievement_stats WHERE user_id = :user_id"
+    ), {"user_id": user_id}).first()
+    if row is None:
+        return None
+    counters = dict(zip(_COLUMNS, row))
+    counters["last_active_day"] = _as_date(counters["last_active_day"])
+    return counters
+
+
+def _counter_values(user_id: int, counters: dict, now: datetime) -> dict:
+    values = {name: counters[name] for name in _COLUMNS}
+    values.update(user_id=user_id, updated_at=now)
+    return values
+
+
+_INSERT_COUNTERS = "INSERT INTO user_achievement_stats ({}) VALUES ({})".format(
+    ", ".join(("user_id",) + _COLUMNS + ("updated_at",)),
+    ", ".join(":" + name for name in ("user_id",) + _COLUMNS + ("updated_at",)),
+)
+_UPDATE_COUNTERS = "UPDATE user_achievement_stats SET {} WHERE user_id = :user_id".format(
+    ", ".join(f"{name} = :{name}" for name in _COLUMNS + ("updated_at",))
+)
+
+
+def _insert_unlocks(conn, rows: List[dict]):
+    if rows:
+        conn.execute(text(
+            "INSERT INTO user_achievements (user_id, achievement_id, unlocked_at) "
+            "VALUES (:user_id, :achievement_id, :unlocked_at)"
+        ), rows)
+
+
+def consume(conn, events: Iterable[dict]) -> List[Tuple[int, Rule]]:
+    """Apply events in order inside the caller's transaction; returns (user_id, rule) for every new unlock"""
+    by_user: Dict[int, List[dict]] = {}
+    for event in events:
+        by_user.setdefault(event["user_id"], []).append(event)
+
+    now = datetime.utcnow()
+    unlocks = []
+    for user_id, user_events in by_user.items():
+        counters = load_counters(conn, user_id)
+        exists = counters is not None
+        counters = counters or new_counters()
+        changed = set()
+        for event in user_events:
+            if event["type"] == "quiz_completed":
+                if event["result_id"] <= counters["last_result_id"]:
+                    continue
+                counters["last_result_id"] = event["result_id"]
+                new_category = conn.execute(text(
+                    "SELECT 1 FROM user_categories WHERE user_id = :user_id AND category = :category"
+                ), {"user_id": user_id, "category": event["category"]}).first() is None
+                if new_category:
+                    conn.execute(text("INSERT INTO user_categories (user_id, category) VALUES (:user_id, :category)"),
+                                 {"user_id": user_id, "category": event["category"]})
+                changed |= apply_completion(counters, event["score"], event["time_taken"],
+                                            _as_date(event["completed_at"]), new_category)
+            elif event["type"] == "quiz_created":
+                if event["quiz_id"] <= counters["last_quiz_id"]:
+                    continue
+                counters["last_quiz_id"] = event["quiz_id"]
+                counters["quizzes_created"] += 1
+                changed.add("quizzes_created")
+        if not changed:
+            continue
+        rules = newly_unlocked(counters, changed)
+        conn.execute(text(_UPDATE_COUNTERS if exists else _INSERT_COUNTERS), _counter_values(user_id, counters, now))
+        _insert_unlocks(conn, [{"user_id": user_id, "achievement_id": rule.id, "unlocked_at": now} for rule in rules])
+        unlocks.extend((user_id, rule) for rule in rules)
+    return unlocks
+
+
+def _streaks(days: List[date]) -> Tuple[int, int]:
+    """(current streak ending at the last day, longest streak) for sorted distinct days"""
+    current = longest = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def rebuild(conn, first_user_id: int = 0, last_user_id: Optional[int] = None) -> int:
+    """Recompute counters and unlocks of users with ids in [``first_user_id``, ``last_user_id``] from stored results.
+
+    Reads the hot results and every retained monthly partition; months already dropped by
+    retention contribute their rollup's attempts and score sum. Rules are checked against the
+    final counters, so a rule met only earlier in a user's history (a high average that has
+    since dropped) is not unlocked by a rebuild. The old rows are deleted before anything is
+    read, so on SQLite the transaction holds the write lock while it reads and a concurrent
+    ``consume`` either commits first (and is counted) or waits and then skips events whose
+    ids the rebuild already covered.
+    """
+    window = {"first": first_user_id, "last": last_user_id if last_user_id is not None else 2 ** 62}
+    in_range = "user_id >= :first AND user_id <= :last"
+    conn.execute(text(f"DELETE FROM user_achievements WHERE {in_range}"), window)
+    conn.execute(text(f"DELETE FROM user_categories WHERE {in_range}"), window)
+    conn.execute(text(f"DELETE FROM user_achievement_stats WHERE {in_range}"), window)
+
+    users = dict(conn.execute(text("SELECT id, username FROM users WHERE id >= :first AND id <= :last"), window).all())
+    counters = {user_id: new_counters() for user_id in users}
+    categories = {user_id: set() for user_id in users}
+    days = {user_id: set() for user_id in users}
+
+    tables = ["quiz_results"] + [results_table(key).name for key in archived_months(conn)]
+    for table in tables:
+        for user_id, completed, score_sum, perfect, fastest, last_id in conn.execute(text(
+            f"SELECT user_id, COUNT(*), SUM(score), SUM(CASE WHEN score >= {PERFECT_SCORE} THEN 1 ELSE 0 END), "
+            f"MIN(CASE WHEN time_taken > 0 THEN time_taken END), MAX(id) FROM {table} "
+            f"WHERE {in_range} GROUP BY user_id"
+        ), window):
+            if user_id not in counters:
+                continue
+            c = counters[user_id]
+            c["quizzes_completed"] += completed
+            c["score_sum"] += score_sum or 0
+            c["perfect_scores"] += perfect or 0
+            if fastest is not None and (c["fastest_time"] is None or fastest < c["fastest_time"]):
+                c["fastest_time"] = fastest
+            c["last_result_id"] = max(c["last_result_id"], last_id)
+        for user_id, category in conn.execute(text(
+            f"SELECT DISTINCT r.user_id, q.category FROM {table} r JOIN quizzes q ON q.id = r.quiz_id "
+            "WHERE r.user_id >= :first AND r.user_id <= :last"
+        ), window):
+            if user_id in categories:
+                categories[user_id].add(category)
+        for user_id, day in conn.execute(text(
+            f"SELECT DISTINCT user_id, date(completed_at) FROM {table} "
+            f"WHERE {in_range} AND completed_at IS NOT NULL"
+        ), window):
+            if user_id in days:
+                days[user_id].add(_as_date(day))
+    for user_id, attempts, score_sum in conn.execute(text(
+        f"SELECT user_id, SUM(attempts), SUM(score_sum) FROM user_monthly_stats WHERE {in_range} "
+        "AND month IN (SELECT month FROM result_partitions WHERE dropped_at IS NOT NULL) GROUP BY user_id"
+    ), window):
+        if user_id in counters:
+            counters[user_id]["quizzes_completed"] += attempts or 0
+            counters[user_id]["score_sum"] += score_sum or 0
+
+    user_ids = {username: user_id for user_id, username in users.items()}
+    for created_by, created, last_quiz_id in conn.execute(text(
+        "SELECT created_by, COUNT(*), MAX(id) FROM quizzes WHERE created_by IS NOT NULL GROUP BY created_by"
+    )):
+        if created_by in user_ids:
+            counters[user_ids[created_by]].update(quizzes_created=created, last_quiz_id=last_quiz_id)
+
+    now = datetime.utcnow()
+    counter_rows, unlock_rows, category_rows = [], [], []
+    for user_id, c in counters.items():
+        active = sorted(days[user_id])
+        if active:
+            c["current_streak"], c["longest_streak"] = _streaks(active)
+            c["last_active_day"] = active[-1]
+        c["categories_explored"] = len(categories[user_id])
+        category_rows.extend({"user_id": user_id, "category": category} for category in categories[user_id])
+        unlock_rows.extend({"user_id": user_id, "achievement_id": rule.id, "unlocked_at": now}
+                           for rule in newly_unlocked(c, COUNTERS))
+        counter_rows.append(_counter_values(user_id, c, now))
+    if counter_rows:
+        conn.execute(text(_INSERT_COUNTERS), counter_rows)
+    if category_rows:
+        conn.execute(text("INSERT INTO user_categories (user_id, category) VALUES (:user_id, :category)"),
+                     category_rows)
+    _insert_unlocks(conn, unlock_rows)
+    return len(counters)
@@ -0,0 +1,174 @@
+"""
+Answer-pattern similarity between attempts at a quiz, for spotting copied answers.
+
+Each attempt in the window is encoded as one row of small integers, the
+index of its answer (chosen option, or hash of a free-text answer) for
+every question or -1. Two attempts are scored by how much better "one
+copied a share ``copy_rate`` of its answers from the other" explains them
+than "they answered independently", as a log-likelihood ratio in bits.
+An answer given by a share p of attempts adds log2((c + (1 - c) p) / p)
+when both gave it and each question they answered differently costs
+log2(1 - c). So agreeing on a popular correct answer says little (~0.3
+bits at p = 0.65), agreeing on a wrong answer few others gave says a lot
+(~3 bits at p = 0.06), and ``wrong_weight`` scales shared wrong answers
+further. Under independence a pair reaches t bits with probability at
+most 2^-t, so pairs are flagged above log2(pairs compared) + ``margin``
+bits: fewer than 2^-margin false flags expected, however many attempts.
+Strong students agree more often than independence at population rates
+predicts, which is what the margin is for.
+
+The evidence of every pair is ``X @ X.T + log2(1 - c) * A @ A.T`` with
+``X`` the attempts x answers matrix holding sqrt(weight) where an attempt
+gave an answer and ``A`` the attempts x questions answered indicator.
+It is computed in blocks of rows against the rows after them, so the
+n^2 / 2 comparisons run as BLAS matrix products with bounded memory
+instead of a Python loop over pairs.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from sqlalchemy import bindparam, text
+
+from partitions import answers_table, archived_months, month_key, results_table
+
+LOAD_BATCH = 20000
+BLOCK_ROWS = 512  # a block's similarities take BLOCK_ROWS x attempts x 4 bytes
+
+
+@dataclass
+class Attempts:
+    """A quiz's attempts as an attempts x questions matrix of answer indexes (-1: not answered)"""
+    result_ids: np.ndarray  # row -> quiz_results.id
+    user_ids: np.ndarray  # row -> users.id
+    codes: np.ndarray  # int32, rows x questions
+    answer_wrong: np.ndarray  # bool per answer index
+
+    def __len__(self):
+        return len(self.result_ids)
+
+
+def load_attempts(conn, quiz_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Attempts:
+    """Graded answers of the quiz's results completed in [since, until), hot and in retained monthly partitions"""
+    tables = [("quiz_results", "result_answers")] + [
+        (results_table(key).name, answers_table(key).name) for key in archived_months(conn)
+        if (since is None or key >= month_key(since)) and (until is None or key <= month_key(until))
+    ]
+    # A plain DB-API cursor: SQLAlchemy rows would cost ten times the scan for a large quiz
+    marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    where, params = f"r.quiz_id = {marker}", [quiz_id]
+    if since is not None:
+        where += f" AND r.completed_at >= {marker}"
+        params.append(since)
+    if until is not None:
+        where += f" AND r.completed_at < {marker}"
+        params.append(until)
+    cursor = conn.connection.cursor()
+    chunks = []
+    try:
+        for results, answers in tables:
+            cursor.execute(
+                f"SELECT r.id, r.user_id, a.question_id, COALESCE(a.option_id, -1), COALESCE(a.answer_hash, 0), "
+                f"a.is_correct FROM {results} r JOIN {answers} a ON a.result_id = r.id WHERE {where}", params
+            )
+            while True:
+                batch = cursor.fetchmany(LOAD_BATCH)
+                if not batch:
+                    break
+                chunks.append(np.array(batch, dtype=np.int64))
+    finally:
+        cursor.close()
+    data = np.concatenate(chunks) if chunks else np.empty((0, 6), dtype=np.int64)
+
+    result_ids, first, row = np.unique(data[:, 0], return_index=True, return_inverse=True)
+    _, column = np.unique(data[:, 2], return_inverse=True)
+    # Number distinct (question, option, hash) answers; a lexsort is several times faster than np.unique(axis=0)
+    order = np.lexsort((data[:, 4], data[:, 3], data[:, 2]))
+    starts = np.ones(len(data), dtype=bool)
+    starts[1:] = (data[order[1:], 2:5] != data[order[:-1], 2:5]).any(axis=1)
+    answer = np.empty(len(data), dtype=np.int64)
+    answer[order] = np.cumsum(starts) - 1
+    codes = np.full((len(result_ids), column.max() + 1 if len(data) else 0), -1, dtype=np.int32)
+    codes[row, column] = answer
+    answer_wrong = np.zeros(int(starts.sum()), dtype=bool)
+    answer_wrong[answer] = data[:, 5] == 0
+    return Attempts(result_ids, data[first, 1], codes, answer_wrong)
+
+
+def answer_weights(attempts: Attempts, copy_rate: float, wrong_weight: float) -> np.ndarray:
+    """Bits of evidence for copying when two attempts share each answer, net of the mismatch they avoid"""
+    counts = np.bincount(attempts.codes[attempts.codes >= 0], minlength=len(attempts.answer_wrong))
+    answered = (attempts.codes >= 0).sum(axis=0)
+    # Attempts answering the question of each answer: the count of the column it appears in
+    question_of = np.zeros(len(counts), dtype=np.int64)
+    rows, columns = np.nonzero(attempts.codes >= 0)
+    question_of[attempts.codes[rows, columns]] = columns
+    share = np.maximum(counts, 1) / np.maximum(answered[question_of], 1)
+    weights = np.log2((copy_rate + (1 - copy_rate) * share) / share) - np.log2(1 - copy_rate)
+    weights[attempts.answer_wrong] *= wrong_weight
+    return weights
+
+
+def similar_pairs(attempts: Attempts, margin: float = 2.0, copy_rate: float = 0.5, wrong_weight: float = 1.0,
+                  max_pairs: int = 500, block_rows: int = BLOCK_ROWS) -> dict:
+    """Pairs of attempts with more evidence of copying than chance explains, strongest first"""
+    n = len(attempts)
+    pairs_compared = n * (n - 1) // 2
+    threshold = np.log2(max(pairs_compared, 1)) + margin
+    report = {"attempts": n, "pairs_compared": pairs_compared, "threshold_bits": round(float(threshold), 2)}
+    if n < 2:
+        return dict(report, flagged=0, pairs=[])
+    codes = attempts.codes
+    answered = codes >= 0
+    weights = answer_weights(attempts, copy_rate, wrong_weight)
+
+    # Only answers given by two or more attempts can be shared
+    shared = np.flatnonzero(np.bincount(codes[answered], minlength=len(weights)) > 1)
+    column_of = np.full(len(weights), -1, dtype=np.int64)
+    column_of[shared] = np.arange(len(shared))
+    x = np.zeros((n, len(shared)), dtype=np.float32)
+    rows, questions = np.nonzero(answered)
+    columns = column_of[codes[rows, questions]]
+    keep = columns >= 0
+    x[rows[keep], columns[keep]] = np.sqrt(weights[codes[rows[keep], questions[keep]]])
+    both_answered = answered.astype(np.float32)
+    mismatch = np.float32(np.log2(1 - copy_rate))
+
+    found_i, found_j, found_bits = [], [], []
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        bits = x[start:stop] @ x[start:].T
+        bits += mismatch * (both_answered[start:stop] @ both_answered[start:].T)
+        # Each pair once: within the diagonal block keep only j > i
+        bits[np.tril_indices(stop - start, 0, bits.shape[1])] = -np.inf
+        i, j = np.nonzero(bits >= threshold)
+        found_i.append(i + start)
+        found_j.append(j + start)
+        found_bits.append(bits[i, j])
+    i, j, bits = np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_bits)
+    flagged = len(bits)
+
+    order = np.argsort(-bits, kind="stable")[:max_pairs]
+    i, j, bits = i[order], j[order], bits[order]
+    both = answered[i] & answered[j]
+    same = both & (codes[i] == codes[j])
+    shared_wrong = (same & attempts.answer_wrong[np.maximum(codes[i], 0)]).sum(axis=1)
+    matching, both = same.sum(axis=1), both.sum(axis=1)
+    return dict(report, flagged=flagged, pairs=[
+        {"result_ids": [int(attempts.result_ids[i[k]]), int(attempts.result_ids[j[k]])],
+         "user_ids": [int(attempts.user_ids[i[k]]), int(attempts.user_ids[j[k]])],
+         "evidence_bits": round(float(bits[k]), 2), "matching_answers": int(matching[k]),
+         "shared_wrong_answers": int(shared_wrong[k]), "answered_by_both": int(both[k])}
+        for k in range(len(bits))
+    ])
+
+
+def user_names(conn, user_ids: List[int]) -> dict:
+    if not user_ids:
+        return {}
+    rows = conn.execute(text("SELECT id, username FROM users WHERE id IN :ids").bindparams(
+        bindparam("ids", expanding=True)), {"ids": sorted(set(user_ids))})
+    return dict(rows.all())
@@ -1,21 +1,56 @@
+import asyncio
 import json
+import logging
+import os
+import random
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    and_, bindparam, case, create_engine, event, func, insert, literal, or_, select, text,
+    BigInteger, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import aliased, selectinload, sessionmaker, Session, relationship
 from pydantic import BaseModel
 
 from config import settings
+from compression import CompressedBodyCache, CompressionMiddleware
+from http_cache import SnapshotCache, StampedCache, VersionRegistry, not_modified, quiz_validators
+import achievements
+import changelog
+import jobs
+import metrics
+import outbox
+import snapshot
+from ratelimit import AdmissionControlMiddleware, AdmissionStats
+from grading import grade, parse_answers
+from partitions import SCORE_RANGES, archived_months, maintain as maintain_partitions, rebuild_rollups, results_table
+from question_bank import BankIndex, BankIndexCache
+from migrations import (
+    add_missing_columns, backfill_achievements, backfill_quiz_versions, backfill_user_totals,
+    drop_deleted_quiz_bank_items, ensure_indexes, migrate_question_options, migrate_result_answers, record_schema, reset_user_totals, schema_fingerprint,
+    schema_is_current,
+)
+from security import HasherBusy, PasswordHasher
+from serialization import FastJSONResponse, dumps as dump_json
+
+logger = logging.getLogger(__name__)
 
 # --- Database Setup ---
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+metrics.instrument_engine(engine)
 Base = declarative_base()
 
 # --- Pydantic Schemas (Data Validation) ---
@@ -60,6 +95,7 @@ class QuizPublic(BaseModel):
         orm_mode = True
 
 class QuizDetail(QuizPublic):
+    version: int
     questions: List[QuestionPublic]
 
 class Answer(BaseModel):
@@ -67,6 +103,8 @@ class Answer(BaseModel):
     answer: str
 
 class QuizSubmission(BaseModel):
+    quiz_id: int
+    version: Optional[int] = None  # the quiz version that was shown; defaults to the current one
     answers: List[Answer]
     time_taken: int
 
@@ -76,6 +114,41 @@ class QuizResultPublic(BaseModel):
     percentage: float
     time_taken: int
 
+class RatingCreate(BaseModel):
+    rating: int
+    review: Optional[str] = None
+
+class QuestionBankCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    created_by: Optional[str] = None
+    # Questions to add: every question matching all of the given filters
+    question_ids: Optional[List[int]] = None
+    quiz_ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+
+class BankItemsAdd(BaseModel):
+    question_ids: Optional[List[int]] = None
+    quiz_ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+
+class StratumQuota(BaseModel):
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+    points: Optional[int] = None
+    count: int
+
+class BankDrawRequest(BaseModel):
+    count: int = 20
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+    points: Optional[int] = None
+    # Per-stratum quotas; when given they replace count/category/difficulty/points
+    strata: Optional[List[StratumQuota]] = None
+    exclude_last: Optional[int] = None
+
 # --- SQLAlchemy Models (Database Tables) ---
 class User(Base):
     __tablename__ = "users"
@@ -84,9 +157,13 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    total_score = Column(Integer, default=0)
+    total_score = Column(Integer, default=0)  # kept by the "leaderboard" outbox consumer
     quizzes_taken = Column(Integer, default=0)
 
+    __table_args__ = (
+        Index("ix_users_total_score", "total_score"),
+    )
+
 class Quiz(Base):
     __tablename__ = "quizzes"
     id = Column(Integer, primary_key=True, index=True)
@@ -95,34 +172,545 @@ class Quiz(Base):
     category = Column(String, nullable=False)
     difficulty = Column(String, nullable=False)
     time_limit = Column(Integer, default=300)
+    created_by = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)  # number of the current QuizVersion
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    current_version_id = Column(Integer)  # quiz_versions.id of the published version
+    deleted_at = Column(DateTime)  # deleted quizzes leave the catalog but keep their versions and results
+    # Every question row any version has used; a version's own questions are in quiz_version_questions
     questions = relationship('Question', back_populates='quiz', cascade='all, delete-orphan')
 
+class QuizVersion(Base):
+    """An immutable snapshot of a published quiz. Questions are shared with other versions until edited:
+    a changed question is a new row, so a question row and its answer key never change."""
+    __tablename__ = "quiz_versions"
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    version = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    category = Column(String, nullable=False)
+    difficulty = Column(String, nullable=False)
+    time_limit = Column(Integer, default=300)
+    question_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_quiz_versions_quiz_version", "quiz_id", "version", unique=True),
+    )
+
+class QuizVersionQuestion(Base):
+    __tablename__ = "quiz_version_questions"
+    version_id = Column(Integer, ForeignKey('quiz_versions.id'), primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_quiz_version_questions_question", "question_id"),
+    )
+
 class Question(Base):
     __tablename__ = "questions"
     id = Column(Integer, primary_key=True, index=True)
-    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False, index=True)
     question_text = Column(Text, nullable=False)
     question_type = Column(String, nullable=False)
-    options = Column(Text)
+    legacy_options = Column('options', Text)  # JSON text from older databases, moved into question_options on startup
     correct_answer = Column(String, nullable=False)
     points = Column(Integer, default=1)
     order = Column(Integer, default=0)
+    duplicate_of = Column(Integer, ForeignKey('questions.id'))  # canonical question of its near-duplicate cluster
     quiz = relationship('Quiz', back_populates='questions')
+    choices = relationship('QuestionOption', back_populates='question', order_by='QuestionOption.position',
+                           cascade='all, delete-orphan')
+
+    @property
+    def options(self):
+        return [choice.text for choice in self.choices] or None
+
+    @options.setter
+    def options(self, values):
+        self.choices = [QuestionOption(position=i, text=text) for i, text in enumerate(values or [])]
+
+class QuestionOption(Base):
+    __tablename__ = "question_options"
+    id = Column(Integer, primary_key=True, index=True)
+    question_id = Column(Integer, ForeignKey('questions.id'), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    text = Column(Text, nullable=False)
+    question = relationship('Question', back_populates='choices')
+
+class QuestionLshBucket(Base):
+    """One LSH band of a canonical question's MinHash signature; questions sharing a bucket are compared (dedupe.py)"""
+    __tablename__ = "question_lsh_buckets"
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
 
 class QuizResult(Base):
     __tablename__ = "quiz_results"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    quiz_version_id = Column(Integer, ForeignKey('quiz_versions.id'))  # the version that was taken and graded
     score = Column(Integer, nullable=False)
     total_questions = Column(Integer, nullable=False)
     time_taken = Column(Integer)
     completed_at = Column(DateTime, default=datetime.utcnow)
-    answers = Column(Text)
+    answers = Column(Text)  # JSON from older databases, moved into result_answers on startup
+
+    __table_args__ = (
+        Index("ix_quiz_results_user_completed", "user_id", "completed_at"),
+        Index("ix_quiz_results_quiz_completed", "quiz_id", "completed_at"),
+        Index("ix_quiz_results_completed", "completed_at"),
+    )
+
+class ResultAnswer(Base):
+    """One graded answer of a quiz result: the chosen option, or a hash of free-text answers"""
+    __tablename__ = "result_answers"
+    result_id = Column(Integer, ForeignKey('quiz_results.id'), primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    option_id = Column(Integer, ForeignKey('question_options.id'))
+    answer_hash = Column(Integer)
+    is_correct = Column(Boolean, nullable=False)
+    points = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Covers per-question attempt and correct counts without touching the table
+        Index("ix_result_answers_question_correct", "question_id", "is_correct"),
+    )
+
+class ResultPartition(Base):
+    """A closed month of quiz results moved out of the hot tables (see partitions.py)"""
+    __tablename__ = "result_partitions"
+    month = Column(String, primary_key=True)  # "YYYY_MM"
+    results = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime)
+    dropped_at = Column(DateTime)  # raw rows removed by retention; rollups remain
+
+class QuizDailyStats(Base):
+    """Per-quiz, per-day rollup of archived results"""
+    __tablename__ = "quiz_daily_stats"
+    quiz_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    time_sum = Column(Integer, nullable=False, default=0)
+    scores_0_25 = Column(Integer, nullable=False, default=0)
+    scores_26_50 = Column(Integer, nullable=False, default=0)
+    scores_51_75 = Column(Integer, nullable=False, default=0)
+    scores_76_100 = Column(Integer, nullable=False, default=0)
+
+class UserMonthlyStats(Base):
+    """Per-user, per-month rollup of archived results"""
+    __tablename__ = "user_monthly_stats"
+    user_id = Column(Integer, primary_key=True)
+    month = Column(String, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+
+class QuestionMonthlyStats(Base):
+    """Per-question, per-month rollup of archived answers"""
+    __tablename__ = "question_monthly_stats"
+    question_id = Column(Integer, primary_key=True)
+    month = Column(String, primary_key=True)
+    answered = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    points = Column(Integer, nullable=False, default=0)
+
+class QuizRating(Base):
+    """A user's star rating (1-5) and optional review of a quiz; rating again replaces it"""
+    __tablename__ = "quiz_ratings"
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    rating = Column(Integer, nullable=False)
+    review = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_quiz_ratings_quiz_user", "quiz_id", "user_id", unique=True),
+        Index("ix_quiz_ratings_quiz_updated", "quiz_id", "updated_at"),
+    )
+
+class QuizRatingStats(Base):
+    """Running rating totals of a quiz, updated with every rating write"""
+    __tablename__ = "quiz_rating_stats"
+    quiz_id = Column(Integer, ForeignKey('quizzes.id'), primary_key=True)
+    category = Column(String, nullable=False)  # copied from the quiz so top-rated pages are one index range
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    bayes_avg = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_quiz_rating_stats_category_bayes", "category", "bayes_avg", "quiz_id"),
+        Index("ix_quiz_rating_stats_bayes", "bayes_avg", "quiz_id"),
+    )
+
+class OutboxEvent(Base):
+    """An event written with the change it describes, delivered to consumers by outbox.py"""
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class OutboxOffset(Base):
+    """Last outbox event each consumer has processed"""
+    __tablename__ = "outbox_offsets"
+    consumer = Column(String, primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxDeadLetter(Base):
+    """An event a consumer kept failing on, skipped so later events could be delivered"""
+    __tablename__ = "outbox_dead_letters"
+    consumer = Column(String, primary_key=True)
+    event_id = Column(Integer, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    error = Column(Text)
+    failed_at = Column(DateTime, default=datetime.utcnow)
+
+class UserAchievementStats(Base):
+    """Per-user counters the achievement rules are evaluated against (see achievements.py)"""
+    __tablename__ = "user_achievement_stats"
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    quizzes_completed = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    perfect_scores = Column(Integer, nullable=False, default=0)
+    fastest_time = Column(Integer)
+    categories_explored = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)
+    longest_streak = Column(Integer, nullable=False, default=0)
+    quizzes_created = Column(Integer, nullable=False, default=0)
+    last_active_day = Column(Date)
+    last_result_id = Column(Integer, nullable=False, default=0)  # events up to these ids are already counted
+    last_quiz_id = Column(Integer, nullable=False, default=0)
+    unlocked_mask = Column(Integer, nullable=False, default=0)  # bit per rule, see achievements.RULES
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class UserCategory(Base):
+    """Categories a user has completed quizzes in, so a new one is counted once"""
+    __tablename__ = "user_categories"
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    category = Column(String, primary_key=True)
+
+class UserAchievement(Base):
+    __tablename__ = "user_achievements"
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    achievement_id = Column(String, primary_key=True)
+    unlocked_at = Column(DateTime, default=datetime.utcnow)
+
+class QuestionBank(Base):
+    __tablename__ = "question_banks"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text)
+    created_by = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+
+class BankItem(Base):
+    """A question in a bank, with its stratum copied from the question and its quiz"""
+    __tablename__ = "question_bank_items"
+    id = Column(Integer, primary_key=True, index=True)
+    bank_id = Column(Integer, ForeignKey('question_banks.id'), nullable=False)
+    question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
+    category = Column(String, nullable=False)
+    difficulty = Column(String, nullable=False)
+    points = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        Index("ix_question_bank_items_bank_question", "bank_id", "question_id", unique=True),
+        Index("ix_question_bank_items_bank_stratum", "bank_id", "category", "difficulty", "points"),
+    )
+
+class BankDraw(Base):
+    """Questions handed to a user by one draw, used to avoid repeats in the next draws"""
+    __tablename__ = "question_bank_draws"
+    id = Column(Integer, primary_key=True, index=True)
+    bank_id = Column(Integer, ForeignKey('question_banks.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    question_ids = Column(Text, nullable=False)  # JSON list
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_question_bank_draws_bank_user_created", "bank_id", "user_id", "created_at"),
+    )
+
+class CalibrationRun(Base):
+    """One run of the IRT calibration job (irt.py)"""
+    __tablename__ = "calibration_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    warm_start = Column(Boolean, default=True)
+    responses = Column(Integer)
+    users = Column(Integer)
+    questions = Column(Integer)
+    iterations = Column(Integer)
+    log_likelihood = Column(Float)
+    last_result_id = Column(Integer)
+
+class QuestionCalibration(Base):
+    """2PL parameters of a question from the latest calibration run"""
+    __tablename__ = "question_calibration"
+    question_id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    difficulty = Column(Float, nullable=False)
+    discrimination = Column(Float, nullable=False)
+    responses = Column(Integer, nullable=False, default=0)
+    p_correct = Column(Float)
+    run_id = Column(Integer, ForeignKey('calibration_runs.id'))
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class UserAbility(Base):
+    """Ability estimate of a user from the latest calibration run"""
+    __tablename__ = "user_abilities"
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    ability = Column(Float, nullable=False)
+    standard_error = Column(Float)
+    responses = Column(Integer, nullable=False, default=0)
+    run_id = Column(Integer, ForeignKey('calibration_runs.id'))
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    changes_floor = Column(Integer, nullable=False, default=0)  # catalog_changes is complete above this version
+    epoch = Column(String)  # random id of this database's catalog; a snapshot file built from another is ignored
+
+class SchemaState(Base):
+    """Fingerprint of the schema and migrations the database was last upgraded to (migrations.py)"""
+    __tablename__ = "schema_state"
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class CatalogChange(Base):
+    """A quiz inserted, updated or deleted (tombstone) at a catalog version; see changelog.py"""
+    __tablename__ = "catalog_changes"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, index=True)
+    quiz_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_catalog_changes_quiz_version", "quiz_id", "version"),
+    )
+
+class Job(Base):
+    """A background job run by jobs.JobRunner; checkpoint is where a new run of it resumes"""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    params = Column(Text, nullable=False)  # JSON
+    status = Column(String, nullable=False, default=jobs.QUEUED)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    done = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    checkpoint = Column(Text)  # JSON
+    runs = Column(Integer, nullable=False, default=0)  # claims so far; handler writes are conditional on it
+    failures = Column(Integer, nullable=False, default=0)
+    owner = Column(String)  # "host:pid" of the server process running it
+    heartbeat_at = Column(DateTime)
+    artifact_path = Column(String)
+    artifact_type = Column(String)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+class AnswerSimilarityReport(Base):
+    """Attempts at a quiz with suspiciously similar answers, as found by an answer_similarity job"""
+    __tablename__ = "answer_similarity_reports"
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    job_id = Column(Integer, ForeignKey('jobs.id'))
+    since = Column(DateTime)
+    until = Column(DateTime)
+    margin = Column(Float, nullable=False)
+    threshold_bits = Column(Float, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    flagged = Column(Integer, nullable=False)
+    pairs = Column(Text, nullable=False)  # JSON, strongest evidence first, at most SIMILARITY_MAX_PAIRS
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_answer_similarity_reports_quiz_created", "quiz_id", "created_at"),
+    )
+
+# --- Catalog Versioning (ETags) ---
+versions = VersionRegistry()
+
+def bump_catalog_version(db: Session, quiz_id: int, op: str = changelog.UPSERT):
+    """Advance the catalog version and log the quiz's change inside the caller's transaction.
+
+    The registry is updated once it commits.
+    """
+    now = datetime.utcnow()
+    db.flush()
+    bumped = db.query(CatalogVersion).filter(CatalogVersion.id == 1).update(
+        {CatalogVersion.version: CatalogVersion.version + 1, CatalogVersion.updated_at: now},
+        synchronize_session=False
+    )
+    if not bumped:
+        # Scripts may write before the server has ever started on this database
+        db.add(CatalogVersion(id=1, version=1, updated_at=now, epoch=uuid.uuid4().hex))
+        db.flush()
+    version = db.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar()
+    changelog.record(db, version, quiz_id, op)
+    db.info.setdefault("pending_versions", []).append(("catalog", version, now))
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_versions(db):
+    pending = db.info.pop("pending_versions", None)
+    if not pending:
+        return
+    for kind, *args in pending:
+        if kind == "quiz":
+            versions.set_quiz(*args)
+        else:
+            versions.set_catalog(*args)
+            catalog_publisher.notify()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_versions(db):
+    db.info.pop("pending_versions", None)
+
+# --- Outbox: derived data is updated by consumers after the write commits ---
+dispatcher = outbox.OutboxDispatcher(
+    engine,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    batch_delay=settings.OUTBOX_BATCH_DELAY,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_backoff=settings.OUTBOX_RETRY_BACKOFF,
+    retention=settings.OUTBOX_RETENTION,
+    lag_histogram=metrics.REGISTRY.histogram(
+        "quizmaster_outbox_lag_seconds", "Time from an outbox event's commit to its delivery", ("consumer",)
+    ),
+)
+
+def publish_event(db: Session, event_type: str, payload: dict):
+    """Queue an event in the caller's transaction; the dispatcher is woken once it commits"""
+    outbox.publish(db, event_type, payload)
+    db.info["outbox_pending"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_dispatcher(db):
+    if db.info.pop("outbox_pending", False):
+        dispatcher.notify()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_outbox_wakeup(db):
+    db.info.pop("outbox_pending", None)
+
+@dispatcher.consumer("leaderboard", "quiz_completed")
+def update_user_totals(conn, events):
+    totals = {}
+    for event in events:
+        count, score = totals.get(event.payload["user_id"], (0, 0))
+        totals[event.payload["user_id"]] = (count + 1, score + (event.payload["score"] or 0))
+    users = User.__table__
+    conn.execute(users.update().where(users.c.id == bindparam("user")).values(
+        total_score=func.coalesce(users.c.total_score, 0) + bindparam("score"),
+        quizzes_taken=func.coalesce(users.c.quizzes_taken, 0) + bindparam("count"),
+    ), [{"user": user_id, "count": count, "score": score} for user_id, (count, score) in totals.items()])
+
+@dispatcher.consumer("achievements", "quiz_completed", "quiz_created")
+def update_achievements(conn, events):
+    creators = {event.payload["created_by"] for event in events if event.type == "quiz_created"}
+    user_ids = dict(conn.execute(
+        select(User.username, User.id).where(User.username.in_(creators))
+    ).all()) if creators else {}
+    payloads = []
+    for event in events:
+        if event.type == "quiz_completed":
+            payloads.append(event.payload)
+        elif event.payload["created_by"] in user_ids:
+            payloads.append(achievements.creation_event(event.payload["quiz_id"], user_ids[event.payload["created_by"]]))
+    achievements.consume(conn, payloads)
+
+metrics.REGISTRY.gauge("quizmaster_outbox_backlog", "Outbox events the slowest consumer has not processed",
+                       dispatcher.backlog)
+metrics.REGISTRY.callback_counter("quizmaster_outbox_dead_letters_total",
+                                  "Outbox events skipped after repeated consumer failures",
+                                  lambda: dispatcher.dead_lettered)
+
+# --- Background jobs: worker processes import this module to find the runner and its handlers ---
+job_runner = jobs.JobRunner(
+    engine, __name__, "job_runner",
+    workers=settings.JOB_WORKERS,
+    artifact_dir=settings.JOB_ARTIFACT_DIR,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    stale_after=settings.JOB_STALE_AFTER,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retention=settings.JOB_RETENTION,
+    niceness=settings.JOB_NICENESS,
+)
+
+metrics.REGISTRY.gauge("quizmaster_jobs_running", "Background jobs running in worker processes",
+                       lambda: job_runner.active)
+
+def load_catalog_version(db: Session):
+    state = db.query(CatalogVersion).filter(CatalogVersion.id == 1).first()
+    if state is None:
+        state = CatalogVersion(id=1, version=1, updated_at=datetime.utcnow(), epoch=uuid.uuid4().hex)
+        db.add(state)
+        db.commit()
+    elif state.epoch is None:
+        # Databases of older releases
+        state.epoch = uuid.uuid4().hex
+        db.commit()
+    versions.set_catalog(state.version, state.updated_at)
+
+def catch_up_catalog_version(request: Request, db: Session):
+    """Before a conditional request is answered from the registry, bring it up to the database's catalog version.
+
+    Other workers and scripts commit changes this worker's registry never hears of; each one bumps
+    ``catalog_version``, so a primary-key read tells whether a registry-based 304 could be stale.
+    """
+    if "if-none-match" not in request.headers and "if-modified-since" not in request.headers:
+        return
+    state = db.query(CatalogVersion.version, CatalogVersion.updated_at).filter(CatalogVersion.id == 1).first()
+    if state is not None:
+        versions.catch_up(state.version, state.updated_at)
 
 # --- FastAPI App Initialization ---
-app = FastAPI()
+class ProfiledRoute(APIRoute):
+    """Routes whose sync endpoints let a profiled request's sampler follow them into the threadpool"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = metrics.profiled_call(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.router.route_class = ProfiledRoute
+
+# Admission control sits innermost so rejections still get CORS headers
+admission_stats = AdmissionStats()
+app.add_middleware(
+    AdmissionControlMiddleware,
+    identify=lambda scope: username_from_scope(scope),  # defined with the auth helpers below
+    rules=settings.RATE_LIMITS if settings.RATE_LIMITS_ENABLED else {},
+    max_concurrency=settings.MAX_CONCURRENT_REQUESTS,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    exempt=("/metrics", "/healthz", "/readyz"),
+    stats=admission_stats,
+)
 
 # Add CORS middleware to allow frontend access
 from fastapi.middleware.cors import CORSMiddleware
@@ -135,6 +723,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+compressed_bodies = CompressedBodyCache(settings.COMPRESSION_CACHE_BYTES)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    cache=compressed_bodies,
+)
+
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    profiling_enabled=settings.PROFILING_ENABLED,
+    profile_dir=settings.PROFILE_DIR,
+    profile_sample_rate=settings.PROFILE_SAMPLE_RATE,
+    profile_interval=settings.PROFILE_INTERVAL_MS / 1000,
+)
+
+metrics.REGISTRY.callback_counter("quizmaster_compression_cache_hits_total", "Precompressed body cache hits",
+                                  lambda: compressed_bodies.hits)
+metrics.REGISTRY.callback_counter("quizmaster_compression_cache_misses_total", "Precompressed body cache misses",
+                                  lambda: compressed_bodies.misses)
+metrics.REGISTRY.gauge("quizmaster_compression_cache_bytes", "Bytes held in the precompressed body cache",
+                       lambda: compressed_bodies.size)
+metrics.REGISTRY.gauge("quizmaster_requests_in_flight", "Requests admitted and not yet finished",
+                       lambda: admission_stats.in_flight)
+metrics.REGISTRY.callback_counter("quizmaster_requests_shed_total", "Requests shed with 503 by the concurrency cap",
+                                  lambda: admission_stats.shed)
+metrics.REGISTRY.callback_counter("quizmaster_requests_rate_limited_total", "Requests rejected with 429 by rate limits",
+                                  lambda: admission_stats.limited)
+
 # --- Dependency Injection ---
 def get_db():
     db = SessionLocal()
@@ -156,24 +773,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def decode_username(token: str) -> Optional[str]:
+    """Username from a valid access token, or None"""
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def username_from_scope(scope) -> Optional[str]:
+    """Username from the bearer token of a raw ASGI request, without touching the database"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return decode_username(token)
+            return None
+    return None
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = decode_username(token)
+    if username is None:
         raise credentials_exception
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
     return user
 
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    log_n=settings.SCRYPT_LOG_N,
+    r=settings.SCRYPT_R,
+    p=settings.SCRYPT_P,
+    niceness=settings.PASSWORD_HASH_NICENESS,
+)
+
 # --- Global Data Storage (minimal for compatibility) ---
 quizzes = []
 quiz_history = []
@@ -186,94 +828,351 @@ def initialize_sample_data():
     global quizzes
     quizzes = []
 
+# Columns added to tables that databases of older releases already have
+ADDED_COLUMNS = {
+    "quizzes": {
+        "created_by": "VARCHAR",
+        "version": "INTEGER NOT NULL DEFAULT 1",
+        "updated_at": "DATETIME",
+        "current_version_id": "INTEGER",
+        "deleted_at": "DATETIME",
+    },
+    "catalog_version": {"changes_floor": "INTEGER NOT NULL DEFAULT 0", "epoch": "VARCHAR"},
+    "quiz_results": {"quiz_version_id": "INTEGER"},
+    "questions": {"duplicate_of": "INTEGER"},
+}
+DATA_MIGRATIONS = (
+    migrate_question_options, migrate_result_answers, backfill_quiz_versions, backfill_achievements,
+    backfill_user_totals, drop_deleted_quiz_bank_items,
+)
+
+def upgrade_schema():
+    """Create missing tables, columns and indexes, then run the data migrations"""
+    Base.metadata.create_all(bind=engine)
+    for table, columns in ADDED_COLUMNS.items():
+        add_missing_columns(engine, table, columns)
+    ensure_indexes(Base.metadata, engine)
+    for migrate in DATA_MIGRATIONS:
+        migrate(engine)
+
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    # A database already upgraded by this release costs one read instead of DDL, inspection and backfill scans
+    fingerprint = schema_fingerprint(Base.metadata, ADDED_COLUMNS, [migrate.__name__ for migrate in DATA_MIGRATIONS])
+    if not (settings.SCHEMA_CHECK_ENABLED and schema_is_current(engine, fingerprint)):
+        upgrade_schema()
+        record_schema(engine, fingerprint)
+    db = SessionLocal()
+    try:
+        load_catalog_version(db)
+    finally:
+        db.close()
     # Initialize sample quiz data for compatibility
     initialize_sample_data()
 
+async def maintain_partitions_periodically():
+    """Archive closed months of quiz results and apply retention, now and then every interval"""
+    while True:
+        try:
+            summary = await run_in_threadpool(
+                maintain_partitions, engine, settings.RESULTS_HOT_MONTHS, settings.RESULTS_RETENTION_MONTHS
+            )
+            if summary["archived"] or summary["dropped"]:
+                logger.info("Quiz results partitions: archived %s, dropped %s", summary["archived"], summary["dropped"])
+        except Exception:
+            logger.exception("Quiz results partition maintenance failed")
+        await asyncio.sleep(settings.RESULTS_MAINTENANCE_INTERVAL)
+
+@app.on_event("startup")
+async def start_partition_maintenance():
+    if settings.RESULTS_PARTITIONING_ENABLED:
+        app.state.partition_maintenance = asyncio.create_task(maintain_partitions_periodically())
+
+async def compact_catalog_changes_periodically():
+    """Drop superseded catalog changes and expired tombstones, now and then every interval"""
+    while True:
+        try:
+            summary = await run_in_threadpool(
+                changelog.compact, engine, settings.CATALOG_TOMBSTONE_RETENTION_DAYS
+            )
+            if summary["tombstones"]:
+                logger.info("Catalog change log: dropped %s superseded changes, %s tombstones",
+                            summary["superseded"], summary["tombstones"])
+        except Exception:
+            logger.exception("Catalog change log compaction failed")
+        await asyncio.sleep(settings.CATALOG_COMPACTION_INTERVAL)
+
+@app.on_event("startup")
+async def start_catalog_compaction():
+    app.state.catalog_compaction = asyncio.create_task(compact_catalog_changes_periodically())
+
+@app.on_event("startup")
+def start_catalog_snapshot():
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        catalog_snapshots.refresh()
+        catalog_publisher.start()
+        if current_catalog_snapshot() is None:
+            catalog_publisher.notify()
+
+@app.on_event("startup")
+def start_outbox_dispatcher():
+    dispatcher.start()
+
+@app.on_event("startup")
+def start_job_runner():
+    job_runner.start()
+
+def warm_up():
+    """Fill the caches the first requests would otherwise fill: the quizzes most taken recently
+    (rendered details and answer keys) and the leaderboard's pages in the database cache"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(days=settings.WARMUP_WINDOW_DAYS)
+        version_ids = [version_id for (version_id,) in db.query(Quiz.current_version_id).join(
+            QuizResult, QuizResult.quiz_id == Quiz.id
+        ).filter(
+            QuizResult.completed_at >= since, Quiz.deleted_at.is_(None), Quiz.current_version_id.isnot(None)
+        ).group_by(Quiz.id, Quiz.current_version_id).order_by(func.count().desc()).limit(settings.WARMUP_TOP_QUIZZES)]
+        for version_id in version_ids:
+            quiz_version_body(db, version_id)
+            load_answer_key(db, version_id)
+        get_leaderboard(db)
+    finally:
+        db.close()
+    logger.info("Warm-up: %s quizzes and the leaderboard in %.2f s", len(version_ids), time.perf_counter() - start)
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Warm caches in the background; /readyz reports ready once they are (or warm-up failed)"""
+    async def warm():
+        try:
+            await run_in_threadpool(warm_up)
+        except Exception:
+            logger.exception("Warm-up failed")
+        app.state.ready = True
+
+    app.state.ready = False
+    if settings.WARMUP_ENABLED:
+        app.state.warm_up = asyncio.create_task(warm())
+    else:
+        app.state.ready = True
+
+@app.on_event("shutdown")
+def on_shutdown():
+    password_hasher.shutdown()
+    dispatcher.stop()
+    job_runner.stop()
+    catalog_publisher.stop()
+    for name in ("partition_maintenance", "catalog_compaction", "warm_up"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process serves requests; touches nothing else, so a slow database does not restart it"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: startup and warm-up are done and the database answers"""
+    if not getattr(app.state, "ready", False):
+        return FastJSONResponse({"status": "starting"}, status_code=503, headers={"Retry-After": "1"})
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        logger.exception("Readiness check: database unavailable")
+        return FastJSONResponse({"status": "database unavailable"}, status_code=503, headers={"Retry-After": "5"})
+    return {"status": "ready"}
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of request, SQL, serialization and cache metrics"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+async def run_in_session(fn):
+    """Run fn(db) in the threadpool with its own short-lived session.
+
+    Used by async endpoints so no pooled connection is held while they await other work.
+    """
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    return await run_in_threadpool(metrics.profiled_call(call))
+
+async def hash_or_503(coro):
+    """Await a password hasher call, turning a full hashing queue into 503 + Retry-After"""
+    try:
+        return await coro
+    except HasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in requests, please retry shortly",
+            headers={"Retry-After": str(max(1, int(settings.PASSWORD_HASH_QUEUE_TIMEOUT)))},
+        )
+
+async def rehash_password(user_id: int, password: str):
+    """Upgrade a stored password to the current hashing parameters after a successful login"""
+    try:
+        new_hash = await password_hasher.hash(password)
+    except HasherBusy:
+        return  # try again on the next login
+
+    def store(db: Session):
+        db.query(User).filter(User.id == user_id).update({User.password: new_hash})
+        db.commit()
+
+    await run_in_session(store)
 
 @app.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == user.username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email already exists")
-    
-    db_user = User(username=user.username, email=user.email, password=user.password) # In production, hash this!
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+async def register(user: UserCreate):
+    def existing_field(db: Session):
+        if db.query(User.id).filter(User.username == user.username).first():
+            return "Username"
+        if db.query(User.id).filter(User.email == user.email).first():
+            return "Email"
+        return None
+
+    taken = await run_in_session(existing_field)
+    if taken:
+        raise HTTPException(status_code=400, detail=f"{taken} already exists")
+
+    password_hash = await hash_or_503(password_hasher.hash(user.password))
+
+    def create(db: Session):
+        db_user = User(username=user.username, email=user.email, password=password_hash)
+        db.add(db_user)
+        db.commit()
+        return db_user.username
+
+    username = await run_in_session(create)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": db_user.username}, expires_delta=access_token_expires
+        data={"sub": username}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not user.password == form_data.password: # In production, use proper password hashing
+async def login_for_access_token(background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await run_in_session(
+        lambda db: db.query(User.id, User.username, User.password).filter(User.username == form_data.username).first()
+    )
+    if user:
+        matches, needs_rehash = await hash_or_503(password_hasher.verify(form_data.password, user.password))
+    else:
+        matches, needs_rehash = await hash_or_503(password_hasher.verify_missing(form_data.password))
+    if not matches:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if needs_rehash:
+        background_tasks.add_task(rehash_password, user.id, form_data.password)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.get("/api/quizzes", response_model=List[QuizPublic])
-def get_quizzes(category: Optional[str] = None, difficulty: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(Quiz)
+QUIZ_SUMMARY_FIELDS = ("id", "title", "description", "category", "difficulty", "time_limit", "question_count")
+
+def query_quiz_summaries(db: Session, category: Optional[str] = None, difficulty: Optional[str] = None,
+                         search: Optional[str] = None, limit: Optional[int] = None, ids: Optional[List[int]] = None):
+    """Catalog rows as plain dicts, read as column tuples with the current version's question count"""
+    question_count = (
+        select(QuizVersion.question_count).where(QuizVersion.id == Quiz.current_version_id).scalar_subquery()
+    )
+    query = db.query(
+        Quiz.id, Quiz.title, Quiz.description, Quiz.category, Quiz.difficulty, Quiz.time_limit, question_count
+    ).filter(Quiz.deleted_at.is_(None))
+    if ids is not None:
+        query = query.filter(Quiz.id.in_(ids))
     if category:
         query = query.filter(Quiz.category == category)
     if difficulty:
         query = query.filter(Quiz.difficulty == difficulty)
-    quizzes = query.all()
-    return [{**quiz.__dict__, "question_count": len(quiz.questions)} for quiz in quizzes]
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Quiz.title.ilike(pattern), Quiz.description.ilike(pattern), Quiz.category.ilike(pattern)))
+    query = query.order_by(Quiz.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [dict(zip(QUIZ_SUMMARY_FIELDS, row)) for row in query.all()]
+
+@app.get("/api/quizzes", response_model=List[QuizPublic])
+def get_quizzes(request: Request, category: Optional[str] = None, difficulty: Optional[str] = None, db: Session = Depends(get_db)):
+    catch_up_catalog_version(request, db)
+    catalog = current_catalog_snapshot() if not (category or difficulty) else None
+    validators = versions.catalog_validators("quizzes", settings.CATALOG_CACHE_CONTROL)
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    if catalog is not None:
+        return Response(catalog.array_body(), media_type="application/json", headers=validators.headers())
+    return FastJSONResponse(query_quiz_summaries(db, category, difficulty),
+                            headers=validators.headers() if validators else None)
 
 @app.get("/quizzes")
-def get_all_quizzes(db: Session = Depends(get_db)):
+def get_all_quizzes(request: Request, db: Session = Depends(get_db)):
     """Get all quizzes from database"""
-    quizzes = db.query(Quiz).all()
-    quiz_list = []
-    for quiz in quizzes:
-        quiz_dict = {
-            "id": quiz.id,
-            "title": quiz.title,
-            "description": quiz.description,
-            "category": quiz.category,
-            "difficulty": quiz.difficulty,
-            "time_limit": quiz.time_limit,
-            "question_count": len(quiz.questions)
-        }
-        quiz_list.append(quiz_dict)
-    return {"quizzes": quiz_list}
+    catch_up_catalog_version(request, db)
+    catalog = current_catalog_snapshot()
+    validators = versions.catalog_validators("quizzes", settings.CATALOG_CACHE_CONTROL)
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    if catalog is not None:
+        return Response(catalog.list_body(), media_type="application/json", headers=validators.headers())
+    return FastJSONResponse({"quizzes": query_quiz_summaries(db)},
+                            headers=validators.headers() if validators else None)
+
+@app.get("/quizzes/changes")
+def get_catalog_changes(request: Request, since: int = 0, db: Session = Depends(get_db)):
+    """Quizzes inserted, updated or deleted since catalog version ``since``.
+
+    Clients keep the returned ``version`` and pass it back as ``since`` next time. When the change
+    log no longer reaches back to ``since`` (or on the first sync, ``since=0``) the response is a full
+    snapshot with ``reset: true``, which replaces whatever the client had.
+    """
+    catch_up_catalog_version(request, db)
+    validators = versions.catalog_validators(f"changes{since}", settings.CATALOG_CACHE_CONTROL)
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    # Changes committed after this read carry a later version and are picked up by the next sync
+    version = db.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar() or 0
+    changes = changelog.changes_since(db, since, version) if 0 < since <= version else None
+    if changes is None:
+        body = {"version": version, "reset": True, "upserts": query_quiz_summaries(db), "deletes": []}
+    else:
+        upserts = query_quiz_summaries(db, ids=[quiz_id for quiz_id, op in changes.items() if op == changelog.UPSERT])
+        present = {quiz["id"] for quiz in upserts}
+        body = {"version": version, "reset": False, "upserts": upserts,
+                "deletes": sorted(quiz_id for quiz_id in changes if quiz_id not in present)}
+    return FastJSONResponse(body, headers=validators.headers() if validators else None)
 
 @app.get("/leaderboard")
 def get_leaderboard(db: Session = Depends(get_db)):
-    """Get leaderboard data from quiz results"""
-    # Get all quiz results and calculate stats per user
-    from sqlalchemy import func
-    
-    leaderboard_query = db.query(
-        func.coalesce(User.username, 'Anonymous').label('username'),
-        func.sum(QuizResult.score).label('total_score'),
-        func.count(QuizResult.id).label('quizzes_taken'),
-        func.avg(QuizResult.score).label('average_score')
-    ).join(User, QuizResult.user_id == User.id).group_by(User.username).order_by(func.sum(QuizResult.score).desc()).all()
+    """Get leaderboard data from the per-user totals kept by the outbox consumer"""
+    leaderboard_query = db.query(User.username, User.total_score, User.quizzes_taken).filter(
+        User.quizzes_taken > 0
+    ).order_by(User.total_score.desc(), User.id).all()
     
     leaderboard = []
     for entry in leaderboard_query:
         leaderboard.append({
             "username": entry.username,
             "total_score": int(entry.total_score or 0),
-            "quizzes_taken": entry.quizzes_taken,
-            "average_score": round(float(entry.average_score or 0), 1)
+            "quizzes_taken": int(entry.quizzes_taken),
+            "average_score": round((entry.total_score or 0) / entry.quizzes_taken, 1) if entry.quizzes_taken else 0.0
         })
     
     # If no data, return sample data for demo
@@ -284,96 +1183,403 @@ def get_leaderboard(db: Session = Depends(get_db)):
             {"username": "user2", "total_score": 60, "quizzes_taken": 3, "average_score": 75.0}
         ]
     
-    return {"leaderboard": leaderboard}
+    return FastJSONResponse({"leaderboard": leaderboard})
+
+# --- Quiz versions ---
+quiz_details = SnapshotCache(settings.QUIZ_DETAIL_CACHE_SIZE)  # rendered quiz detail JSON per version
+answer_keys = SnapshotCache(settings.ANSWER_KEY_CACHE_SIZE)  # grading keys per version
+
+def version_questions(query, version_id: int):
+    """Restrict a query over questions to one version's questions, in that version's order"""
+    return query.join(QuizVersionQuestion, QuizVersionQuestion.question_id == Question.id).filter(
+        QuizVersionQuestion.version_id == version_id
+    ).order_by(QuizVersionQuestion.position)
+
+def version_question_ids(version_id: int):
+    return select(QuizVersionQuestion.question_id).where(QuizVersionQuestion.version_id == version_id)
+
+def question_signature(question: Question):
+    """What a question asks and accepts; an edit that changes any of it needs a new question row"""
+    return (question.question_text, question.question_type, tuple(question.options or ()),
+            question.correct_answer, question.points)
+
+def publish_quiz_version(db: Session, quiz: Quiz, questions: List[Question]) -> QuizVersion:
+    """Publish the quiz's fields and ``questions`` as its next immutable version.
+
+    ``questions`` may mix rows of earlier versions, which the new version shares, with new unsaved
+    rows. Runs in the caller's transaction; the ETag registry learns the new version once it commits.
+    """
+    for question in questions:
+        if question.id is None:
+            question.quiz = quiz
+            db.add(question)
+    db.flush()
+    now = datetime.utcnow()
+    number = (db.query(func.max(QuizVersion.version)).filter(QuizVersion.quiz_id == quiz.id).scalar() or 0) + 1
+    version = QuizVersion(
+        quiz_id=quiz.id, version=number, title=quiz.title, description=quiz.description, category=quiz.category,
+        difficulty=quiz.difficulty, time_limit=quiz.time_limit, question_count=len(questions), created_at=now,
+    )
+    db.add(version)
+    db.flush()
+    if questions:
+        db.execute(insert(QuizVersionQuestion), [
+            {"version_id": version.id, "question_id": question.id, "position": position}
+            for position, question in enumerate(questions, 1)
+        ])
+    quiz.current_version_id, quiz.version, quiz.updated_at = version.id, number, now
+    db.info.setdefault("pending_versions", []).append(("quiz", quiz.id, number, now))
+    bump_catalog_version(db, quiz.id)
+    return version
+
+def flag_near_duplicates(db: Session, questions: List[Question], ignore_quiz_id: Optional[int] = None) -> List[dict]:
+    """Mark new questions that nearly duplicate a stored one, and add the others to the LSH index.
+
+    Candidates are the canonical questions sharing a bucket with the new one (see dedupe.py), earlier
+    questions of the same batch included; the most similar candidate whose exact Jaccard similarity
+    reaches DEDUPE_THRESHOLD becomes ``duplicate_of``. ``ignore_quiz_id`` skips that quiz's own
+    questions, so an edited question is not flagged as a copy of the text it replaces.
+    """
+    if not questions or not settings.DEDUPE_ENABLED:
+        return []
+    import dedupe  # numpy: loaded on first use rather than at startup
+
+    found = [dedupe.shingles(question.question_text, question.options) for question in questions]
+    keys = dedupe.band_keys(dedupe.signatures([dedupe.hash_shingles(shingles) for shingles in found])).tolist()
+    buckets = {}
+    wanted = sorted({key for row in keys for key in row})
+    for start in range(0, len(wanted), 500):
+        for bucket, question_id in db.query(QuestionLshBucket.bucket, QuestionLshBucket.question_id).filter(
+            QuestionLshBucket.bucket.in_(wanted[start:start + 500])
+        ):
+            buckets.setdefault(bucket, set()).add(question_id)
+    stored = {}
+    candidate_ids = set().union(*buckets.values())
+    if candidate_ids:
+        candidates = db.query(Question).options(selectinload(Question.choices)).filter(Question.id.in_(candidate_ids))
+        if ignore_quiz_id is not None:
+            candidates = candidates.filter(Question.quiz_id != ignore_quiz_id)
+        stored = {candidate.id: dedupe.shingles(candidate.question_text, candidate.options) for candidate in candidates}
+
+    flagged, index_rows = [], []
+    for question, shingles, row_keys in zip(questions, found, keys):
+        best_id, best = None, 0.0
+        for candidate_id in sorted({c for key in row_keys for c in buckets.get(key, ()) if c in stored}):
+            similarity = dedupe.jaccard(shingles, stored[candidate_id])
+            if similarity >= settings.DEDUPE_THRESHOLD and similarity > best:  # ties keep the oldest question
+                best_id, best = candidate_id, similarity
+        if best_id is not None:
+            question.duplicate_of = best_id
+            flagged.append({"question_id": question.id, "question": question.question_text,
+                            "duplicate_of": best_id, "similarity": round(best, 3)})
+            continue
+        stored[question.id] = shingles
+        for key in set(row_keys):
+            buckets.setdefault(key, set()).add(question.id)
+            index_rows.append({"bucket": key, "question_id": question.id})
+    if index_rows:
+        db.execute(insert(QuestionLshBucket), index_rows)
+    return flagged
+
+def render_quiz_versions(db: Session, version_ids: List[int]) -> dict:
+    """Quiz detail JSON of several versions by version id, with one query each for versions, questions and options"""
+    if not version_ids:
+        return {}
+    # Options come back as rows in question order, so no per-question JSON decoding is needed
+    options_by_question = {}
+    question_ids = select(QuizVersionQuestion.question_id).where(QuizVersionQuestion.version_id.in_(version_ids))
+    option_rows = db.query(QuestionOption.question_id, QuestionOption.text).filter(
+        QuestionOption.question_id.in_(question_ids)
+    ).order_by(QuestionOption.question_id, QuestionOption.position)
+    for question_id, text in option_rows:
+        options_by_question.setdefault(question_id, []).append(text)
+
+    questions_by_version = {}
+    question_rows = db.query(
+        QuizVersionQuestion.version_id, Question.id, Question.question_text, Question.question_type, Question.points
+    ).join(Question, Question.id == QuizVersionQuestion.question_id).filter(
+        QuizVersionQuestion.version_id.in_(version_ids)
+    ).order_by(QuizVersionQuestion.version_id, QuizVersionQuestion.position)
+    for q in question_rows:
+        questions_by_version.setdefault(q.version_id, []).append({
+            "id": q.id,
+            "question_text": q.question_text,
+            "question_type": q.question_type,
+            "options": options_by_question.get(q.id),
+            "points": q.points,
+        })
+
+    bodies = {}
+    for version in db.query(QuizVersion).filter(QuizVersion.id.in_(version_ids)):
+        questions = questions_by_version.get(version.id, [])
+        bodies[version.id] = dump_json({
+            "id": version.quiz_id,
+            "version": version.version,
+            "title": version.title,
+            "description": version.description,
+            "category": version.category,
+            "difficulty": version.difficulty,
+            "time_limit": version.time_limit,
+            "question_count": len(questions),
+            "questions": questions,
+        })
+    return bodies
+
+def quiz_version_body(db: Session, version_id: int) -> Optional[bytes]:
+    """Quiz detail JSON of one version, rendered once and then served from memory"""
+    body = quiz_details.get(version_id)
+    if body is None:
+        body = render_quiz_versions(db, [version_id]).get(version_id)
+        if body is not None:
+            quiz_details.put(version_id, body)
+    return body
+
+# --- Catalog snapshot: the catalog compiled into one file that every worker maps (see snapshot.py) ---
+def catalog_snapshot_path() -> str:
+    """CATALOG_SNAPSHOT_PATH, or by default a file next to the SQLite database, so each database has its own"""
+    if settings.CATALOG_SNAPSHOT_PATH:
+        return settings.CATALOG_SNAPSHOT_PATH
+    if engine.url.get_backend_name() == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        return os.path.join(os.path.dirname(os.path.abspath(engine.url.database)), "catalog_snapshot.bin")
+    return "catalog_snapshot.bin"
+
+def snapshot_matches_database(candidate: snapshot.CatalogSnapshot) -> bool:
+    """Whether a snapshot file was built from this database and not from a newer catalog than it holds"""
+    db = SessionLocal()
+    try:
+        state = db.query(CatalogVersion.epoch, CatalogVersion.version).filter(CatalogVersion.id == 1).first()
+    finally:
+        db.close()
+    return state is not None and candidate.epoch == state.epoch and candidate.version <= state.version
+
+catalog_snapshots = snapshot.SnapshotStore(catalog_snapshot_path(), settings.CATALOG_SNAPSHOT_CHECK_INTERVAL,
+                                           snapshot_matches_database)
+
+def current_catalog_snapshot() -> Optional[snapshot.CatalogSnapshot]:
+    """The mapped snapshot if it is of the catalog version this worker knows, else None (read the database).
+
+    A snapshot published by another worker also tells this one about the catalog version it was built from.
+    """
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    latest = catalog_snapshots.latest()
+    if latest is None:
+        return None
+    if versions.catalog_version is None or latest.version > versions.catalog_version:
+        versions.set_catalog(latest.version, latest.modified)
+    return latest if latest.version == versions.catalog_version else None
+
+def build_catalog_snapshot() -> bool:
+    """Compile the catalog into a new snapshot file unless the current one is up to date.
+
+    Detail bodies of quiz versions already in the current snapshot are copied from it; only new
+    versions are rendered, in chunks, while the file is written.
+    """
+    db = SessionLocal()
+    try:
+        state = db.query(CatalogVersion.epoch, CatalogVersion.version, CatalogVersion.updated_at).filter(
+            CatalogVersion.id == 1
+        ).first()
+        catalog_snapshots.refresh()
+        previous = catalog_snapshots.latest()
+        if state is None or state.epoch is None or (previous is not None and previous.version >= state.version):
+            return False
+        quiz_array = dump_json(query_quiz_summaries(db))
+        rows = db.query(Quiz.id, Quiz.version, Quiz.current_version_id, Quiz.updated_at).filter(
+            Quiz.deleted_at.is_(None), Quiz.current_version_id.isnot(None)
+        ).order_by(Quiz.id).all()
+
+        def bodies():
+            chunk_size = 500
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                reused = {}
+                if previous is not None:
+                    for row in chunk:
+                        entry = previous.find(row.id)
+                        if entry is not None and entry.version_id == row.current_version_id:
+                            reused[row.id] = previous.detail_body(entry)
+                rendered = render_quiz_versions(db, [row.current_version_id for row in chunk if row.id not in reused])
+                for row in chunk:
+                    yield reused[row.id] if row.id in reused else rendered[row.current_version_id]
+
+        written = snapshot.write(catalog_snapshots.path, state.epoch, state.version, state.updated_at, quiz_array,
+                                 rows, bodies())
+    finally:
+        db.close()
+    if written:
+        catalog_snapshots.refresh()
+    return written
+
+catalog_publisher = snapshot.SnapshotPublisher(build_catalog_snapshot, settings.CATALOG_SNAPSHOT_PUBLISH_DELAY)
 
 @app.get("/api/quizzes/{quiz_id}", response_model=QuizDetail)
-def get_quiz(quiz_id: int, db: Session = Depends(get_db)):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+def get_quiz(quiz_id: int, request: Request, db: Session = Depends(get_db)):
+    catch_up_catalog_version(request, db)
+    cached = not_modified(request, versions.quiz_validators(quiz_id, settings.QUIZ_CACHE_CONTROL))
+    if cached:
+        return cached
+
+    catalog = current_catalog_snapshot()
+    if catalog is not None:
+        entry = catalog.find(quiz_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        versions.set_quiz(quiz_id, entry.version, entry.updated_at)
+        validators = quiz_validators(quiz_id, entry.version, entry.updated_at, settings.QUIZ_CACHE_CONTROL)
+        return Response(catalog.detail_body(entry), media_type="application/json", headers=validators.headers())
+
+    quiz = db.query(Quiz.id, Quiz.version, Quiz.updated_at, Quiz.current_version_id).filter(
+        Quiz.id == quiz_id, Quiz.deleted_at.is_(None)
+    ).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Manually process questions to fit the Pydantic model
-    questions_public = []
-    for q in sorted(quiz.questions, key=lambda x: x.order):
-        questions_public.append(
-            QuestionPublic(
-                id=q.id,
-                question_text=q.question_text,
-                question_type=q.question_type,
-                options=json.loads(q.options) if q.options else None,
-                points=q.points
-            )
-        )
+    versions.set_quiz(quiz.id, quiz.version, quiz.updated_at)
+    return Response(quiz_version_body(db, quiz.current_version_id), media_type="application/json",
+                     headers=quiz_validators(quiz.id, quiz.version, quiz.updated_at, settings.QUIZ_CACHE_CONTROL).headers())
 
-    return QuizDetail(
-        id=quiz.id,
-        title=quiz.title,
-        description=quiz.description,
-        category=quiz.category,
-        difficulty=quiz.difficulty,
-        time_limit=quiz.time_limit,
-        question_count=len(quiz.questions),
-        questions=questions_public
-    )
+@app.get("/api/quizzes/{quiz_id}/versions")
+def get_quiz_versions(quiz_id: int, db: Session = Depends(get_db)):
+    current = db.query(Quiz.version).filter(Quiz.id == quiz_id).scalar()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    rows = db.query(
+        QuizVersion.version, QuizVersion.title, QuizVersion.category, QuizVersion.question_count, QuizVersion.created_at
+    ).filter(QuizVersion.quiz_id == quiz_id).order_by(QuizVersion.version.desc()).all()
+    return FastJSONResponse({
+        "quiz_id": quiz_id,
+        "current_version": current,
+        "versions": [dict(row._mapping) for row in rows],
+    })
+
+@app.get("/api/quizzes/{quiz_id}/versions/{version}", response_model=QuizDetail)
+def get_quiz_version(quiz_id: int, version: int, request: Request, db: Session = Depends(get_db)):
+    """A published version; it never changes, so clients and proxies may keep it indefinitely"""
+    validators = quiz_validators(quiz_id, version, None, settings.QUIZ_VERSION_CACHE_CONTROL)
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    version_id = db.query(QuizVersion.id).filter(QuizVersion.quiz_id == quiz_id, QuizVersion.version == version).scalar()
+    if version_id is None:
+        raise HTTPException(status_code=404, detail="Quiz version not found")
+    return Response(quiz_version_body(db, version_id), media_type="application/json", headers=validators.headers())
+
+def load_grading_keys(db: Session, question_filter):
+    """Correct answers/points and option ids for the questions matching ``question_filter``"""
+    questions = {
+        qid: (correct, points) for qid, correct, points in
+        db.query(Question.id, Question.correct_answer, Question.points).filter(question_filter)
+    }
+    options = {}
+    for option_id, question_id, text in db.query(
+        QuestionOption.id, QuestionOption.question_id, QuestionOption.text
+    ).join(Question).filter(question_filter):
+        options.setdefault((question_id, text), option_id)
+    return questions, options
+
+def store_graded_answers(db: Session, result_id: int, answers: dict, questions: dict, options: dict):
+    """Grade answers and bulk-insert them as result_answers rows"""
+    rows = grade(result_id, answers, questions, options)
+    if rows:
+        db.execute(insert(ResultAnswer), rows)
+    return rows
+
+def load_answer_key(db: Session, version_id: int) -> Optional[dict]:
+    """Questions, grading keys and options of a quiz version, loaded once and then served from memory"""
+    key = answer_keys.get(version_id)
+    if key is not None:
+        return key
+    category = db.query(QuizVersion.category).filter(QuizVersion.id == version_id).scalar()
+    if category is None:
+        return None
+    questions = [tuple(row) for row in version_questions(
+        db.query(Question.id, Question.question_text, Question.correct_answer), version_id
+    )]
+    keys, options = load_grading_keys(db, Question.id.in_(version_question_ids(version_id)))
+    options_by_question = {}
+    for (question_id, text), _ in sorted(options.items(), key=lambda item: item[1]):
+        options_by_question.setdefault(question_id, []).append(text)
+    key = {"category": category, "questions": questions, "keys": keys, "options": options,
+           "options_by_question": options_by_question}
+    answer_keys.put(version_id, key)
+    return key
 
 @app.post("/submit-quiz")
-async def submit_quiz(submission: QuizSubmission):
-    # Calculate score
-    quiz = next((q for q in quizzes if q["id"] == submission.quiz_id), None)
+def submit_quiz(submission: QuizSubmission, current_user: User = Depends(get_current_user),
+                db: Session = Depends(get_db)):
+    quiz = db.query(Quiz.id, Quiz.current_version_id).filter(
+        Quiz.id == submission.quiz_id, Quiz.deleted_at.is_(None)
+    ).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    correct_answers = 0
-    total_questions = len(quiz["questions"])
-    detailed_results = []
-    
-    for i, answer in enumerate(submission.answers):
-        question = quiz["questions"][i]
-        is_correct = answer == question["correct"]
-        if is_correct:
-            correct_answers += 1
-        
-        detailed_results.append({
-            "question": question["question"],
-            "your_answer": answer,
-            "correct_answer": question["correct"],
-            "is_correct": is_correct,
-            "options": question["options"]
-        })
-    
-    score = (correct_answers / total_questions) * 100
-    
-    # Add to leaderboard
-    leaderboard = []  
-    quiz_history = []  # Store user quiz attempts with detailed results
-    leaderboard_entry = {
-        "username": submission.username,
-        "quiz_title": quiz["title"],
-        "score": score,
-        "date": datetime.now().isoformat()
-    }
-    leaderboard.append(leaderboard_entry)
-    quiz_history.append({
-        "username": submission.username,
-        "quiz_title": quiz["title"],
-        "score": score,
-        "date": datetime.now().isoformat(),
-        "detailed_results": detailed_results
-    })
-    
+    version_id = quiz.current_version_id
+    if submission.version is not None:
+        # Graded against the version the user was shown, even if a newer one was published meanwhile
+        version_id = db.query(QuizVersion.id).filter(
+            QuizVersion.quiz_id == quiz.id, QuizVersion.version == submission.version
+        ).scalar()
+        if version_id is None:
+            raise HTTPException(status_code=404, detail="Quiz version not found")
+
+    key = load_answer_key(db, version_id)
+    questions, keys, options = key["questions"], key["keys"], key["options"]
+    answers = {answer.question_id: answer.answer for answer in submission.answers if answer.question_id in keys}
+
+    result = QuizResult(user_id=current_user.id, quiz_id=quiz.id, quiz_version_id=version_id, score=0,
+                        total_questions=len(questions), time_taken=submission.time_taken, completed_at=datetime.utcnow())
+    db.add(result)
+    db.flush()
+    rows = store_graded_answers(db, result.id, answers, keys, options)
+    correct = {row["question_id"] for row in rows if row["is_correct"]}
+    score = round(len(correct) * 100 / len(questions)) if questions else 0
+    result.score = score
+    # User totals and achievements are derived from this event by the outbox consumers
+    publish_event(db, "quiz_completed", achievements.completion_event(
+        result.id, current_user.id, key["category"], score, result.time_taken, result.completed_at
+    ))
+    db.commit()
+
+    detailed_results = [
+        {
+            "question": question_text,
+            "your_answer": answers.get(question_id),
+            "correct_answer": correct_answer,
+            "is_correct": question_id in correct,
+            "options": key["options_by_question"].get(question_id),
+        }
+        for question_id, question_text, correct_answer in questions
+    ]
     return {
-        "score": score, 
-        "correct": correct_answers, 
-        "total": total_questions,
+        "result_id": result.id,
+        "score": score,
+        "correct": len(correct),
+        "total": len(questions),
         "detailed_results": detailed_results
     }
 
-@app.post("/create-quiz")
-async def create_quiz(quiz_data: dict):
-    # Generate new quiz ID
-    new_id = max([q["id"] for q in quizzes]) + 1 if quizzes else 1
-    
-    # Validate quiz data
+def build_questions(questions_data: list):
+    """Question rows from the create/import payload, where `correct` is an option letter or text"""
+    questions = []
+    for i, question in enumerate(questions_data):
+        options = question["options"]
+        if isinstance(options, dict):
+            letters, values = list(options.keys()), list(options.values())
+        else:
+            values = list(options)
+            letters = [chr(ord("A") + j) for j in range(len(values))]
+        correct = question["correct"]
+        correct_answer = values[letters.index(correct)] if correct in letters else str(correct)
+        questions.append(Question(
+            question_text=question["question"],
+            question_type=question.get("type", "multiple_choice"),
+            options=values,
+            correct_answer=correct_answer,
+            points=question.get("points", 1),
+            order=i + 1
+        ))
+    return questions
+
+def validate_quiz_data(quiz_data: dict):
     required_fields = ["title", "description", "category", "difficulty", "time_limit", "questions"]
     for field in required_fields:
         if field not in quiz_data:
@@ -390,28 +1596,99 @@ async def create_quiz(quiz_data: dict):
             raise HTTPException(status_code=400, detail=f"Question {i+1} must have at least 2 options")
         if question["correct"] not in ["A", "B", "C", "D"]:
             raise HTTPException(status_code=400, detail=f"Question {i+1} correct answer must be A, B, C, or D")
-    
-    new_quiz = {
-        "id": new_id,
-        "title": quiz_data["title"],
-        "description": quiz_data["description"],
-        "category": quiz_data["category"],
-        "difficulty": quiz_data["difficulty"],
-        "time_limit": quiz_data["time_limit"],
-        "questions": quiz_data["questions"],
-        "created_by": quiz_data.get("created_by", "Anonymous"),
-        "created_date": datetime.now().isoformat(),
-        "attempts": 0,
-        "average_score": 0
-    }
-    
-    quizzes.append(new_quiz)
-    return {"message": "Quiz created successfully", "quiz_id": new_id}
+
+@app.post("/create-quiz")
+def create_quiz(quiz_data: dict, db: Session = Depends(get_db)):
+    validate_quiz_data(quiz_data)
+    new_quiz = Quiz(
+        title=quiz_data["title"],
+        description=quiz_data["description"],
+        category=quiz_data["category"],
+        difficulty=quiz_data["difficulty"],
+        time_limit=quiz_data["time_limit"],
+        created_by=quiz_data.get("created_by", "Anonymous"),
+    )
+    db.add(new_quiz)
+    questions = build_questions(quiz_data["questions"])
+    publish_quiz_version(db, new_quiz, questions)
+    near_duplicates = flag_near_duplicates(db, questions)
+    record_quiz_created(db, new_quiz.id, new_quiz.created_by)
+    db.commit()
+    return {"message": "Quiz created successfully", "quiz_id": new_quiz.id, "near_duplicates": near_duplicates}
+
+def get_editable_quiz(db: Session, quiz_id: int, user: User) -> Quiz:
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id, Quiz.deleted_at.is_(None)).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if quiz.created_by != user.username:
+        raise HTTPException(status_code=403, detail="Only the quiz's creator can edit it")
+    return quiz
+
+@app.put("/quizzes/{quiz_id}")
+def update_quiz(quiz_id: int, quiz_data: dict, current_user: User = Depends(get_current_user),
+                db: Session = Depends(get_db)):
+    """Publish edited quiz content as a new version; questions left unchanged are shared, not copied"""
+    validate_quiz_data(quiz_data)
+    quiz = get_editable_quiz(db, quiz_id, current_user)
+
+    current = version_questions(
+        db.query(Question).options(selectinload(Question.choices)), quiz.current_version_id
+    ).all()
+    unused = {}
+    for question in current:
+        unused.setdefault(question_signature(question), []).append(question)
+    questions = []
+    for question in build_questions(quiz_data["questions"]):
+        matches = unused.get(question_signature(question))
+        questions.append(matches.pop(0) if matches else question)
+
+    fields = {field: quiz_data[field] for field in ("title", "description", "category", "difficulty", "time_limit")}
+    if [q.id for q in questions] == [q.id for q in current] and all(getattr(quiz, k) == v for k, v in fields.items()):
+        return {"message": "Quiz unchanged", "quiz_id": quiz.id, "version": quiz.version}
+    category_changed = quiz.category != fields["category"]
+    for field, value in fields.items():
+        setattr(quiz, field, value)
+    try:
+        version = publish_quiz_version(db, quiz, questions)
+        near_duplicates = flag_near_duplicates(db, [q for q in questions if q not in current], ignore_quiz_id=quiz.id)
+        if category_changed:
+            db.query(QuizRatingStats).filter(QuizRatingStats.quiz_id == quiz.id).update(
+                {QuizRatingStats.category: quiz.category}, synchronize_session=False
+            )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="The quiz was updated concurrently, reload it and retry")
+    reused = sum(1 for q in questions if q in current)
+    return {"message": "Quiz updated", "quiz_id": quiz.id, "version": version.version,
+            "questions_reused": reused, "questions_added": len(questions) - reused, "near_duplicates": near_duplicates}
+
+@app.delete("/quizzes/{quiz_id}")
+def delete_quiz(quiz_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Remove a quiz from the catalog. Its versions and results are kept, and delta sync gets a tombstone.
+
+    Its questions leave every question bank, so later draws no longer include them.
+    """
+    quiz = get_editable_quiz(db, quiz_id, current_user)
+    quiz.deleted_at = datetime.utcnow()
+    bump_catalog_version(db, quiz.id, changelog.DELETE)
+    remove_from_banks(db, select(Question.id).where(Question.quiz_id == quiz.id))
+    db.commit()
+    versions.forget_quiz(quiz.id)
+    return {"message": "Quiz deleted", "quiz_id": quiz.id}
 
 @app.get("/categories")
-async def get_categories():
-    categories = list(set([quiz["category"] for quiz in quizzes]))
-    return {"categories": categories}
+def get_categories(request: Request, db: Session = Depends(get_db)):
+    catch_up_catalog_version(request, db)
+    validators = versions.catalog_validators("categories", settings.CATALOG_CACHE_CONTROL)
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    categories = [
+        category for (category,) in
+        db.query(Quiz.category).filter(Quiz.deleted_at.is_(None)).distinct().order_by(Quiz.category)
+    ]
+    return FastJSONResponse({"categories": categories}, headers=validators.headers() if validators else None)
 
 @app.get("/quizzes/category/{category}")
 async def get_quizzes_by_category(category: str):
@@ -419,96 +1696,635 @@ async def get_quizzes_by_category(category: str):
     return {"quizzes": filtered_quizzes}
 
 @app.get("/search")
-async def search_quizzes(q: str = ""):
-    if not q:
-        return {"quizzes": quizzes}
-    
-    search_term = q.lower()
-    filtered_quizzes = [
-        quiz for quiz in quizzes 
-        if search_term in quiz["title"].lower() or 
-           search_term in quiz["description"].lower() or 
-           search_term in quiz["category"].lower()
+def search_quizzes(q: str = "", limit: int = 50, db: Session = Depends(get_db)):
+    return FastJSONResponse({"quizzes": query_quiz_summaries(db, search=q or None, limit=limit)})
+
+# --- Question Banks ---
+bank_indexes = BankIndexCache(settings.BANK_INDEX_CACHE_SIZE)
+
+def add_bank_items(db: Session, bank_id: int, selection) -> int:
+    """Copy matching questions into a bank with one INSERT ... SELECT.
+
+    Near-duplicates are merged: one question per cluster (the oldest, see dedupe.py) goes in, and
+    clusters that already have a question in the bank are skipped.
+    """
+    filters = []
+    if selection.question_ids:
+        filters.append(Question.id.in_(selection.question_ids))
+    if selection.quiz_ids:
+        filters.append(Quiz.id.in_(selection.quiz_ids))
+    if selection.category:
+        filters.append(Quiz.category == selection.category)
+    if selection.difficulty:
+        filters.append(Quiz.difficulty == selection.difficulty)
+    if not filters:
+        raise HTTPException(status_code=400, detail="Select questions by question_ids, quiz_ids, category or difficulty")
+    cluster = func.coalesce(Question.duplicate_of, Question.id)
+    in_bank = aliased(Question)
+    clusters_in_bank = select(func.coalesce(in_bank.duplicate_of, in_bank.id)).join(
+        BankItem, BankItem.question_id == in_bank.id
+    ).where(BankItem.bank_id == bank_id)
+    matching = db.query(
+        Question.id.label("question_id"), Quiz.category, Quiz.difficulty,
+        func.coalesce(Question.points, 1).label("points"),
+        func.row_number().over(partition_by=cluster, order_by=Question.id).label("rank"),
+    ).join(QuizVersionQuestion, QuizVersionQuestion.question_id == Question.id).join(
+        # Only questions of current versions: superseded versions' rows are kept for old results
+        Quiz, Quiz.current_version_id == QuizVersionQuestion.version_id
+    ).filter(*filters, Quiz.deleted_at.is_(None), cluster.not_in(clusters_in_bank)).subquery()
+    source = select(
+        literal(bank_id, Integer), matching.c.question_id, matching.c.category, matching.c.difficulty, matching.c.points
+    ).where(matching.c.rank == 1)
+    result = db.execute(insert(BankItem).from_select(
+        ["bank_id", "question_id", "category", "difficulty", "points"], source
+    ))
+    db.query(QuestionBank).filter(QuestionBank.id == bank_id).update(
+        {QuestionBank.version: QuestionBank.version + 1}, synchronize_session=False
+    )
+    return result.rowcount
+
+def remove_from_banks(db: Session, question_ids):
+    """Delete bank items for the given questions, bumping the versions of the banks that held them"""
+    affected = select(BankItem.bank_id).where(BankItem.question_id.in_(question_ids)).distinct()
+    db.query(QuestionBank).filter(QuestionBank.id.in_(affected)).update(
+        {QuestionBank.version: QuestionBank.version + 1}, synchronize_session=False
+    )
+    db.query(BankItem).filter(BankItem.question_id.in_(question_ids)).delete(synchronize_session=False)
+
+def load_bank_index(db: Session, bank: QuestionBank) -> BankIndex:
+    index = bank_indexes.get(bank.id, bank.version)
+    if index is None:
+        items = db.query(BankItem.question_id, BankItem.category, BankItem.difficulty, BankItem.points).filter(
+            BankItem.bank_id == bank.id
+        ).order_by(BankItem.question_id)
+        index = BankIndex(items.yield_per(10000))
+        bank_indexes.put(bank.id, bank.version, index)
+    return index
+
+def get_bank_or_404(db: Session, bank_id: int) -> QuestionBank:
+    bank = db.query(QuestionBank).filter(QuestionBank.id == bank_id).first()
+    if not bank:
+        raise HTTPException(status_code=404, detail="Question bank not found")
+    return bank
+
+def bank_summary(bank: QuestionBank, index: BankIndex):
+    return {
+        "id": bank.id,
+        "name": bank.name,
+        "description": bank.description,
+        "created_by": bank.created_by,
+        "question_count": len(index),
+        "strata": [
+            {"category": category, "difficulty": difficulty, "points": points, "count": len(positions)}
+            for (category, difficulty, points), positions in sorted(index.strata.items())
+        ],
+    }
+
+@app.post("/question-banks")
+def create_question_bank(bank_data: QuestionBankCreate, db: Session = Depends(get_db)):
+    bank = QuestionBank(name=bank_data.name, description=bank_data.description,
+                        created_by=bank_data.created_by or "Anonymous")
+    db.add(bank)
+    db.flush()
+    added = add_bank_items(db, bank.id, bank_data)
+    db.commit()
+    return {"message": "Question bank created successfully", "bank_id": bank.id, "questions_added": added}
+
+@app.post("/question-banks/{bank_id}/items")
+def add_question_bank_items(bank_id: int, selection: BankItemsAdd, db: Session = Depends(get_db)):
+    get_bank_or_404(db, bank_id)
+    added = add_bank_items(db, bank_id, selection)
+    db.commit()
+    return {"bank_id": bank_id, "questions_added": added}
+
+@app.get("/question-banks/{bank_id}")
+def get_question_bank(bank_id: int, db: Session = Depends(get_db)):
+    bank = get_bank_or_404(db, bank_id)
+    return FastJSONResponse(bank_summary(bank, load_bank_index(db, bank)))
+
+@app.post("/question-banks/{bank_id}/draw")
+def draw_from_question_bank(bank_id: int, draw: BankDrawRequest, current_user: User = Depends(get_current_user),
+                            db: Session = Depends(get_db)):
+    """Assemble a randomized quiz from a bank, avoiding questions from the user's recent draws"""
+    bank = get_bank_or_404(db, bank_id)
+    index = load_bank_index(db, bank)
+    quotas = draw.strata or [
+        StratumQuota(category=draw.category, difficulty=draw.difficulty, points=draw.points, count=draw.count)
     ]
-    return {"quizzes": filtered_quizzes}
+    if sum(quota.count for quota in quotas) > settings.BANK_MAX_DRAW or any(quota.count < 1 for quota in quotas):
+        raise HTTPException(status_code=400, detail=f"Draw between 1 and {settings.BANK_MAX_DRAW} questions")
+
+    exclude_last = settings.BANK_EXCLUDE_LAST_ATTEMPTS if draw.exclude_last is None else draw.exclude_last
+    recent = db.query(BankDraw.question_ids).filter(
+        BankDraw.bank_id == bank_id, BankDraw.user_id == current_user.id
+    ).order_by(BankDraw.created_at.desc()).limit(max(0, exclude_last)).all()
+    excluded = index.exclusion(qid for (raw,) in recent for qid in json.loads(raw))
+    chosen = index.exclusion(())
+
+    rng = random.Random()
+    positions, repeats = [], 0
+    for quota in quotas:
+        strata = index.matching(quota.category, quota.difficulty, quota.points)
+        picked, reused = index.sample(strata, quota.count, excluded, chosen, rng)
+        positions.extend(picked)
+        repeats += reused
+    question_ids = [index.question_ids[p] for p in positions]
+
+    options_by_question = {}
+    option_rows = db.query(QuestionOption.question_id, QuestionOption.text).filter(
+        QuestionOption.question_id.in_(question_ids)
+    ).order_by(QuestionOption.question_id, QuestionOption.position)
+    for question_id, text in option_rows:
+        options_by_question.setdefault(question_id, []).append(text)
+    questions = {
+        q.id: q for q in db.query(
+            Question.id, Question.question_text, Question.question_type, Question.points
+        ).filter(Question.id.in_(question_ids))
+    }
+
+    record = BankDraw(bank_id=bank_id, user_id=current_user.id, question_ids=json.dumps(question_ids))
+    db.add(record)
+    db.commit()
+    return FastJSONResponse({
+        "draw_id": record.id,
+        "bank_id": bank_id,
+        "question_count": len(question_ids),
+        "repeated": repeats,
+        "questions": [
+            {
+                "id": qid,
+                "question_text": questions[qid].question_text,
+                "question_type": questions[qid].question_type,
+                "options": options_by_question.get(qid),
+                "points": questions[qid].points,
+            }
+            for qid in question_ids if qid in questions
+        ],
+    })
+
+# --- Calibration (IRT) ---
+def latest_calibration_run(db: Session):
+    run = db.query(CalibrationRun).filter(CalibrationRun.finished_at.isnot(None)).order_by(
+        CalibrationRun.id.desc()
+    ).first()
+    if not run:
+        return None
+    return {"run_id": run.id, "finished_at": run.finished_at, "responses": run.responses}
+
+@app.get("/api/quizzes/{quiz_id}/calibration")
+def get_quiz_calibration(quiz_id: int, db: Session = Depends(get_db)):
+    """Calibrated difficulty and discrimination of the current version's questions, from the latest irt.py run"""
+    quiz = db.query(Quiz.id, Quiz.current_version_id).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    rows = version_questions(db.query(
+        Question.id, QuestionCalibration.difficulty, QuestionCalibration.discrimination,
+        QuestionCalibration.responses, QuestionCalibration.p_correct
+    ).outerjoin(QuestionCalibration, QuestionCalibration.question_id == Question.id), quiz.current_version_id)
+    return FastJSONResponse({
+        "quiz_id": quiz_id,
+        "calibration": latest_calibration_run(db),
+        "questions": [
+            {"question_id": question_id, "difficulty": difficulty, "discrimination": discrimination,
+             "responses": responses or 0, "p_correct": p_correct}
+            for question_id, difficulty, discrimination, responses, p_correct in rows
+        ],
+    })
+
+@app.get("/users/{username}/ability")
+def get_user_ability(username: str, db: Session = Depends(get_db)):
+    user = db.query(User.id).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    ability = db.query(UserAbility).filter(UserAbility.user_id == user.id).first()
+    return FastJSONResponse({
+        "username": username,
+        "ability": ability.ability if ability else None,
+        "standard_error": ability.standard_error if ability else None,
+        "responses": ability.responses if ability else 0,
+        "calibration": latest_calibration_run(db),
+    })
+
+# --- Achievements ---
+def achievement_summary(rule: achievements.Rule):
+    return {"id": rule.id, "name": rule.name, "description": rule.description}
+
+def record_quiz_created(db: Session, quiz_id: int, created_by: Optional[str]):
+    """Count a new quiz towards its creator's achievements (resolved by the consumer, if registered)"""
+    if created_by:
+        publish_event(db, "quiz_created", {"quiz_id": quiz_id, "created_by": created_by})
+
+def load_achievement_counters(db: Session, username: str):
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    if not user_id:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_id, achievements.load_counters(db, user_id) or achievements.new_counters()
+
+def current_streak(counters: dict) -> int:
+    """The stored streak, or 0 once a whole day has passed without a completed quiz"""
+    last_day = counters["last_active_day"]
+    if last_day is None or (datetime.utcnow().date() - last_day).days > 1:
+        return 0
+    return counters["current_streak"]
+
+def achievements_view(db: Session, user_id: int, counters: dict) -> dict:
+    unlocked = db.query(UserAchievement.achievement_id, UserAchievement.unlocked_at).filter(
+        UserAchievement.user_id == user_id
+    ).order_by(UserAchievement.unlocked_at, UserAchievement.achievement_id).all()
+    return {
+        "unlocked": [
+            {**achievement_summary(achievements.RULES_BY_ID[achievement_id]),
+             "unlocked_at": unlocked_at.isoformat() if unlocked_at else None}
+            for achievement_id, unlocked_at in unlocked if achievement_id in achievements.RULES_BY_ID
+        ],
+        "progress": achievements.progress(counters),
+        "current_streak": current_streak(counters),
+        "longest_streak": counters["longest_streak"],
+    }
+
+@app.get("/users/{username}/achievements")
+def get_user_achievements(username: str, db: Session = Depends(get_db)):
+    user_id, counters = load_achievement_counters(db, username)
+    return FastJSONResponse({"username": username, **achievements_view(db, user_id, counters)})
+
+# --- Ratings ---
+def bayesian_average(rating_sum, rating_count):
+    """Mean rating shrunk towards the prior; works on numbers and on SQL column expressions"""
+    prior_total = settings.RATING_PRIOR_WEIGHT * settings.RATING_PRIOR_MEAN
+    return (prior_total + rating_sum) / (settings.RATING_PRIOR_WEIGHT + rating_count)
+
+def apply_rating_delta(db: Session, quiz_id: int, category: str, count_delta: int, sum_delta: int, now: datetime):
+    """Fold one rating write into the quiz's running totals in a single-row UPDATE"""
+    stats = QuizRatingStats.__table__
+    new_count, new_sum = stats.c.rating_count + count_delta, stats.c.rating_sum + sum_delta
+    updated = db.execute(stats.update().where(stats.c.quiz_id == quiz_id).values(
+        rating_count=new_count, rating_sum=new_sum, bayes_avg=bayesian_average(new_sum, new_count), updated_at=now
+    )).rowcount
+    if not updated:
+        db.execute(stats.insert().values(
+            quiz_id=quiz_id, category=category, rating_count=count_delta, rating_sum=sum_delta,
+            bayes_avg=bayesian_average(sum_delta, count_delta), updated_at=now
+        ))
+
+def rating_summary(stats: Optional[QuizRatingStats]):
+    count = stats.rating_count if stats else 0
+    return {
+        "rating_count": count,
+        "average_rating": round(stats.rating_sum / count, 2) if count else 0,
+        "bayesian_average": round(stats.bayes_avg if stats else settings.RATING_PRIOR_MEAN, 3),
+    }
+
+@app.post("/quizzes/{quiz_id}/ratings")
+def rate_quiz(quiz_id: int, rating: RatingCreate, current_user: User = Depends(get_current_user),
+              db: Session = Depends(get_db)):
+    """Rate a quiz, or change your earlier rating; the quiz's totals are adjusted by the difference"""
+    if not 1 <= rating.rating <= 5:
+        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
+    review = (rating.review or "").strip() or None
+    if review and len(review) > settings.RATING_REVIEW_MAX_LENGTH:
+        raise HTTPException(status_code=400,
+                            detail=f"Review must be at most {settings.RATING_REVIEW_MAX_LENGTH} characters")
+    quiz = db.query(Quiz.id, Quiz.category).filter(Quiz.id == quiz_id, Quiz.deleted_at.is_(None)).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    now = datetime.utcnow()
+    existing = db.query(QuizRating).filter(
+        QuizRating.quiz_id == quiz_id, QuizRating.user_id == current_user.id
+    ).first()
+    if existing:
+        count_delta, sum_delta = 0, rating.rating - existing.rating
+        existing.rating, existing.review, existing.updated_at = rating.rating, review, now
+    else:
+        count_delta, sum_delta = 1, rating.rating
+        db.add(QuizRating(quiz_id=quiz_id, user_id=current_user.id, rating=rating.rating, review=review,
+                          created_at=now, updated_at=now))
+    try:
+        db.flush()
+        apply_rating_delta(db, quiz.id, quiz.category, count_delta, sum_delta, now)
+        db.commit()
+    except IntegrityError:
+        # A concurrent first rating of the same quiz (or by the same user) won the insert
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Rating was updated concurrently, please retry")
+
+    stats = db.query(QuizRatingStats).filter(QuizRatingStats.quiz_id == quiz_id).first()
+    return {"quiz_id": quiz_id, "rating": rating.rating, "review": review, **rating_summary(stats)}
+
+@app.get("/quizzes/{quiz_id}/ratings")
+def get_quiz_ratings(quiz_id: int, limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
+    """Rating totals and the most recent reviews of a quiz"""
+    if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    stats = db.query(QuizRatingStats).filter(QuizRatingStats.quiz_id == quiz_id).first()
+    rows = db.query(User.username, QuizRating.rating, QuizRating.review, QuizRating.updated_at).join(
+        User, User.id == QuizRating.user_id
+    ).filter(QuizRating.quiz_id == quiz_id).order_by(QuizRating.updated_at.desc(), QuizRating.id.desc()).offset(
+        max(0, offset)
+    ).limit(max(1, min(limit, 100))).all()
+    return FastJSONResponse({
+        "quiz_id": quiz_id,
+        **rating_summary(stats),
+        "ratings": [
+            {"username": row.username, "rating": row.rating, "review": row.review,
+             "updated_at": row.updated_at.isoformat() if row.updated_at else None}
+            for row in rows
+        ],
+    })
+
+@app.get("/top-rated")
+def get_top_rated(category: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None,
+                  db: Session = Depends(get_db)):
+    """Quizzes by Bayesian average rating, best first.
+
+    Each page is one range scan of the (category, bayes_avg, quiz_id) index; pass the returned
+    ``next_cursor`` to continue after the last quiz of the previous page.
+    """
+    limit = max(1, min(limit, 100))
+    query = db.query(
+        QuizRatingStats.quiz_id, QuizRatingStats.bayes_avg, QuizRatingStats.rating_count, QuizRatingStats.rating_sum,
+        Quiz.title, Quiz.category, Quiz.difficulty
+    ).join(Quiz, Quiz.id == QuizRatingStats.quiz_id).filter(Quiz.deleted_at.is_(None))
+    if category:
+        query = query.filter(QuizRatingStats.category == category)
+    if cursor:
+        try:
+            after_avg, after_id = cursor.split(":")
+            after_avg, after_id = float(after_avg), int(after_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(or_(
+            QuizRatingStats.bayes_avg < after_avg,
+            and_(QuizRatingStats.bayes_avg == after_avg, QuizRatingStats.quiz_id < after_id),
+        ))
+    rows = query.order_by(QuizRatingStats.bayes_avg.desc(), QuizRatingStats.quiz_id.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    return FastJSONResponse({
+        "quizzes": [
+            {
+                "id": row.quiz_id,
+                "title": row.title,
+                "category": row.category,
+                "difficulty": row.difficulty,
+                "rating_count": row.rating_count,
+                "average_rating": round(row.rating_sum / row.rating_count, 2) if row.rating_count else 0,
+                "bayesian_average": round(row.bayes_avg, 3),
+            }
+            for row in page
+        ],
+        "next_cursor": f"{page[-1].bayes_avg!r}:{page[-1].quiz_id}" if len(rows) > limit else None,
+    })
 
 @app.post("/quiz-history")
 def submit_quiz_result(quiz_data: dict, db: Session = Depends(get_db)):
     """Submit quiz result to database"""
     try:
+        user_id = db.query(User.id).filter(User.username == quiz_data.get('username')).scalar()
+        quiz_id = quiz_data.get('quiz_id') or db.query(Quiz.id).filter(
+            Quiz.title == quiz_data.get('quiz_title')
+        ).order_by(Quiz.id).limit(1).scalar()
+        version_id = db.query(Quiz.current_version_id).filter(Quiz.id == (quiz_id or 1)).scalar()
         # Create a new quiz result entry
         quiz_result = QuizResult(
-            user_id=1,  # Default user for demo
-            quiz_id=1,  # We'll need to map from quiz_title to quiz_id later
+            user_id=user_id or 1,  # Default user for demo
+            quiz_id=quiz_id or 1,
+            quiz_version_id=version_id,
             score=quiz_data.get('score', 0),
             total_questions=quiz_data.get('total_questions', 0),
             time_taken=quiz_data.get('time_taken', 0),
-            answers=json.dumps(quiz_data.get('answers', {}))
+            completed_at=datetime.utcnow(),
         )
         
         db.add(quiz_result)
+        db.flush()
+        answers = parse_answers(quiz_data.get('answers') or {})
+        if answers:
+            keys, options = load_grading_keys(db, Question.id.in_(list(answers)))
+            store_graded_answers(db, quiz_result.id, answers, keys, options)
+        category = db.query(Quiz.category).filter(Quiz.id == quiz_result.quiz_id).scalar()
+        if user_id and category:
+            publish_event(db, "quiz_completed", achievements.completion_event(
+                quiz_result.id, user_id, category, quiz_result.score, quiz_result.time_taken, quiz_result.completed_at
+            ))
         db.commit()
         db.refresh(quiz_result)
+        if user_id:
+            dashboards.invalidate(user_id)  # other workers see the new stamp once the consumers have run
         
         return {"message": "Quiz result submitted successfully", "id": quiz_result.id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to submit quiz result: {str(e)}")
 
+def load_history(db: Session, user_id: Optional[int], username: str, limit: int, offset: int) -> List[dict]:
+    """A page of the user's results, newest first, continuing from the hot table into archived months"""
+    wanted = offset + limit
+    rows = []
+    if user_id is not None:
+        rows = db.query(
+            QuizResult.id, QuizResult.quiz_id, Quiz.title, QuizResult.score, QuizResult.total_questions,
+            QuizResult.time_taken, QuizResult.completed_at
+        ).join(Quiz, QuizResult.quiz_id == Quiz.id).filter(
+            QuizResult.user_id == user_id
+        ).order_by(QuizResult.completed_at.desc()).limit(wanted).all()
+        # Older pages continue into the retained archived months this user has results in, newest first
+        if len(rows) < wanted:
+            months = db.query(UserMonthlyStats.month).join(
+                ResultPartition, ResultPartition.month == UserMonthlyStats.month
+            ).filter(
+                UserMonthlyStats.user_id == user_id, ResultPartition.dropped_at.is_(None)
+            ).order_by(UserMonthlyStats.month.desc())
+            for (key,) in months:
+                archived = results_table(key)
+                rows.extend(db.query(
+                    archived.c.id, archived.c.quiz_id, Quiz.title, archived.c.score, archived.c.total_questions,
+                    archived.c.time_taken, archived.c.completed_at
+                ).join(Quiz, archived.c.quiz_id == Quiz.id).filter(
+                    archived.c.user_id == user_id
+                ).order_by(archived.c.completed_at.desc()).limit(wanted - len(rows)).all())
+                if len(rows) >= wanted:
+                    break
+    return [
+        {
+            "id": row.id,
+            "username": username,
+            "quiz_id": row.quiz_id,
+            "quiz_title": row.title,
+            "score": row.score,
+            "total_questions": row.total_questions,
+            "time_taken": row.time_taken,
+            "date": row.completed_at,
+        }
+        for row in rows[offset:wanted]
+    ]
+
 @app.get("/quiz-history/{username}")
-async def get_quiz_history(username: str):
-    user_history = [entry for entry in quiz_history if entry["username"] == username]
-    return {"history": user_history}
+def get_quiz_history(username: str, limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    return FastJSONResponse({"history": load_history(db, user_id, username, limit, offset)})
 
-@app.get("/user-stats/{username}")
-async def get_user_stats(username: str):
-    user_attempts = [entry for entry in quiz_history if entry["username"] == username]
-    
-    if not user_attempts:
-        return {
-            "quizzesCompleted": 0,
-            "averageScore": 0,
-            "perfectScores": 0,
-            "fastestTime": 0,
-            "categoriesExplored": 0,
-            "quizzesCreated": 0
-        }
-    
-    total_score = sum(attempt["score"] for attempt in user_attempts)
-    average_score = total_score / len(user_attempts)
-    perfect_scores = len([attempt for attempt in user_attempts if attempt["score"] == 100])
-    
-    # Get unique categories from user's quiz attempts
-    categories_explored = len(set([
-        next(q["category"] for q in quizzes if q["title"] == attempt["quiz_title"])
-        for attempt in user_attempts
-    ]))
-    
-    # Count quizzes created by user
-    quizzes_created = len([q for q in quizzes if q.get("created_by") == username])
-    
+def stats_view(counters: dict) -> dict:
+    completed = counters["quizzes_completed"]
     return {
-        "quizzesCompleted": len(user_attempts),
-        "averageScore": round(average_score, 1),
-        "perfectScores": perfect_scores,
-        "fastestTime": 95,  # Mock data for now
-        "categoriesExplored": categories_explored,
-        "quizzesCreated": quizzes_created
+        "quizzesCompleted": completed,
+        "averageScore": round(counters["score_sum"] / completed, 1) if completed else 0,
+        "perfectScores": counters["perfect_scores"],
+        "fastestTime": counters["fastest_time"] or 0,
+        "categoriesExplored": counters["categories_explored"],
+        "quizzesCreated": counters["quizzes_created"],
+        "currentStreak": current_streak(counters),
+        "longestStreak": counters["longest_streak"],
     }
 
+@app.get("/user-stats/{username}")
+def get_user_stats(username: str, db: Session = Depends(get_db)):
+    """Profile statistics, read from the achievement counters instead of the user's history"""
+    _, counters = load_achievement_counters(db, username)
+    return stats_view(counters)
+
+# --- User dashboard: the profile pages' data in one cached response ---
+DASHBOARD_FIELDS = ("profile", "history", "stats", "achievements", "rank", "recommendations")
+dashboards = StampedCache(settings.DASHBOARD_CACHE_SIZE, settings.DASHBOARD_CACHE_TTL)
+metrics.REGISTRY.callback_counter("quizmaster_dashboard_cache_hits_total",
+                                  "User dashboards served from the per-user cache",
+                                  lambda: dashboards.hits)
+
+def user_rank(db: Session, user: User) -> dict:
+    """Position on the leaderboard (total score desc, then id), counted with the total_score index"""
+    if not user.quizzes_taken:
+        return {"rank": None, "total_score": 0}
+    score = user.total_score or 0
+    ahead = db.query(func.count(User.id)).filter(User.quizzes_taken > 0, or_(
+        User.total_score > score, and_(User.total_score == score, User.id < user.id)
+    )).scalar()
+    return {"rank": ahead + 1, "total_score": score}
+
+def recommend_quizzes(db: Session, user_id: int, count: int) -> List[dict]:
+    """Best-rated quizzes the user has not taken, from the categories of their recent results first.
+
+    Each candidate query is a range scan of a rating index; quizzes nobody has rated fill the rest.
+    """
+    recent = db.query(Quiz.category, func.count()).join(QuizResult, QuizResult.quiz_id == Quiz.id).filter(
+        QuizResult.id.in_(
+            select(QuizResult.id).where(QuizResult.user_id == user_id)
+            .order_by(QuizResult.completed_at.desc()).limit(settings.DASHBOARD_RECENT_RESULTS)
+        )
+    ).group_by(Quiz.category).order_by(func.count().desc(), Quiz.category).all()
+    taken = select(QuizResult.id).where(QuizResult.user_id == user_id, QuizResult.quiz_id == Quiz.id).exists()
+    chosen = {}  # quiz id -> (confidence, reason), in recommendation order
+
+    def pick(query, confidence, reason):
+        if len(chosen) < count:
+            query = query.filter(Quiz.deleted_at.is_(None), ~taken)
+            if chosen:
+                query = query.filter(Quiz.id.notin_(list(chosen)))
+            for (quiz_id,) in query.limit(count - len(chosen)):
+                chosen[quiz_id] = (confidence, reason)
+
+    rated = db.query(Quiz.id).join(QuizRatingStats, QuizRatingStats.quiz_id == Quiz.id)
+    by_rating = (QuizRatingStats.bayes_avg.desc(), QuizRatingStats.quiz_id.desc())
+    for position, (category, _) in enumerate(recent[:3]):
+        pick(rated.filter(QuizRatingStats.category == category).order_by(*by_rating),
+             round(0.9 - 0.1 * position, 2), f"Top rated in {category}, a category you play often")
+    pick(rated.order_by(*by_rating), 0.6, "Highly rated by other players")
+    if recent:
+        pick(db.query(Quiz.id).filter(Quiz.category == recent[0][0]).order_by(Quiz.id.desc()), 0.6,
+             f"New in {recent[0][0]}")
+    pick(db.query(Quiz.id).order_by(Quiz.id.desc()), 0.5, "New in the catalog")
+
+    summaries = {quiz["id"]: quiz for quiz in query_quiz_summaries(db, ids=list(chosen))}
+    ratings = dict(db.query(QuizRatingStats.quiz_id, QuizRatingStats.rating_count).filter(
+        QuizRatingStats.quiz_id.in_(list(chosen))
+    ).all()) if chosen else {}
+    return [
+        {**summaries[quiz_id], "rating_count": ratings.get(quiz_id, 0),
+         "confidence_score": confidence, "recommendation_reason": reason}
+        for quiz_id, (confidence, reason) in chosen.items() if quiz_id in summaries
+    ]
+
+def dashboard_fields(fields: str) -> List[str]:
+    if not fields:
+        return list(DASHBOARD_FIELDS)
+    wanted = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(wanted) - set(DASHBOARD_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard fields: {', '.join(unknown)}")
+    return [field for field in DASHBOARD_FIELDS if field in wanted]
+
+def load_dashboard_user(db: Session, username: str):
+    """The one lookup every section shares: the user row (totals) and the achievement counters"""
+    user = db.query(User).filter(User.username == username).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db.expunge(user)
+    return user, achievements.load_counters(db, user.id) or achievements.new_counters()
+
+@app.get("/users/{username}/dashboard")
+async def get_user_dashboard(username: str, fields: str = "", limit: Optional[int] = None, offset: int = 0):
+    """Profile, history page, stats, achievements, rank and recommendations in one response.
+
+    ``fields`` is a comma-separated subset of DASHBOARD_FIELDS (default: all). After one shared lookup of
+    the user and their counters, the sections that need queries run concurrently, each in its own session.
+    Bodies are cached per user, keyed by a stamp of the totals and counters the outbox consumers update
+    with each of the user's results, so a new result invalidates them in every worker.
+    """
+    wanted = dashboard_fields(fields)
+    limit = max(1, min(limit or settings.DASHBOARD_HISTORY_LIMIT, 100))
+    offset = max(offset, 0)
+    user, counters = await run_in_session(lambda db: load_dashboard_user(db, username))
+    stamp = dashboards.stamp(user.id, user.total_score, user.quizzes_taken, counters["last_result_id"],
+                             counters["last_quiz_id"], counters["unlocked_mask"])
+    variant = (tuple(wanted), limit, offset)
+    body = dashboards.get(user.id, stamp, variant)
+    if body is not None:
+        return Response(body, media_type="application/json")
+
+    loaders = {
+        "history": lambda db: load_history(db, user.id, username, limit, offset),
+        "achievements": lambda db: achievements_view(db, user.id, counters),
+        "rank": lambda db: user_rank(db, user),
+        "recommendations": lambda db: recommend_quizzes(db, user.id, settings.DASHBOARD_RECOMMENDATIONS),
+    }
+    queried = [field for field in wanted if field in loaders]
+    results = dict(zip(queried, await asyncio.gather(*(run_in_session(loaders[field]) for field in queried))))
+    dashboard = {"username": username}
+    for field in wanted:
+        if field == "profile":
+            dashboard[field] = {"username": user.username, "created_at": user.created_at,
+                                "total_score": user.total_score or 0, "quizzes_taken": user.quizzes_taken or 0}
+        elif field == "stats":
+            dashboard[field] = stats_view(counters)
+        else:
+            dashboard[field] = results[field]
+    body = dump_json(dashboard)
+    dashboards.put(user.id, stamp, variant, body)
+    return Response(body, media_type="application/json")
 
 @app.get("/quiz-analytics/{quiz_id}")
-async def get_quiz_analytics(quiz_id: int):
-    # Get quiz details
-    quiz = next((q for q in quizzes if q["id"] == quiz_id), None)
+def get_quiz_analytics(quiz_id: int, version: Optional[int] = None, db: Session = Depends(get_db)):
+    """Attempt statistics of a quiz, with per-question rates for the current version's (or ``version``'s) questions"""
+    quiz = db.query(
+        Quiz.id, Quiz.title, Quiz.description, Quiz.category, Quiz.difficulty, Quiz.time_limit, Quiz.version
+    ).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Get quiz attempts from history
-    attempts = [h for h in quiz_history if h.get("quiz_id") == quiz_id or h["quiz_title"] == quiz["title"]]
-    
-    if not attempts:
+    quiz_info = dict(quiz._mapping)
+    version_id = db.query(QuizVersion.id).filter(
+        QuizVersion.quiz_id == quiz_id, QuizVersion.version == (version or quiz.version)
+    ).scalar()
+    if version_id is None:
+        raise HTTPException(status_code=404, detail="Quiz version not found")
+
+    # Hot results are aggregated over the (quiz_id, completed_at) index; archived months come from rollups
+    attempts = QuizResult.quiz_id == quiz_id
+    daily = db.query(QuizDailyStats).filter(QuizDailyStats.quiz_id == quiz_id).order_by(QuizDailyStats.day).all()
+    hot_attempts, hot_score_sum = db.query(func.count(QuizResult.id), func.sum(QuizResult.score)).filter(
+        attempts
+    ).one()
+    total_attempts = hot_attempts + sum(row.attempts for row in daily)
+    if not total_attempts:
         return {
-            "quiz": quiz,
+            "quiz": quiz_info,
             "total_attempts": 0,
             "average_score": 0,
             "completion_rate": 0,
@@ -516,61 +2332,111 @@ async def get_quiz_analytics(quiz_id: int):
             "attempts_over_time": [],
             "question_analytics": []
         }
-    
-    # Calculate analytics
-    total_attempts = len(attempts)
-    average_score = sum(a["score"] for a in attempts) / total_attempts
-    
-    # Score distribution
-    score_ranges = {"0-25": 0, "26-50": 0, "51-75": 0, "76-100": 0}
-    for attempt in attempts:
-        score = attempt["score"]
-        if score <= 25:
-            score_ranges["0-25"] += 1
-        elif score <= 50:
-            score_ranges["26-50"] += 1
-        elif score <= 75:
-            score_ranges["51-75"] += 1
-        else:
-            score_ranges["76-100"] += 1
-    
-    # Attempts over time (group by date)
-    from collections import defaultdict
-    attempts_by_date = defaultdict(int)
-    for attempt in attempts:
-        date = attempt["date"][:10]  # Get date part only
-        attempts_by_date[date] += 1
-    
-    attempts_over_time = [{"date": date, "count": count} for date, count in attempts_by_date.items()]
-    
-    # Question analytics
+    average_score = ((hot_score_sum or 0) + sum(row.score_sum for row in daily)) / total_attempts
+
+    score_range = case(
+        *[(QuizResult.score <= upper, label) for label, upper in SCORE_RANGES if upper is not None],
+        else_=SCORE_RANGES[-1][0]
+    )
+    range_counts = dict(db.query(score_range, func.count()).filter(attempts).group_by(score_range).all())
+    for row in daily:
+        for label, _ in SCORE_RANGES:
+            column = "scores_" + label.replace("-", "_")
+            range_counts[label] = range_counts.get(label, 0) + getattr(row, column)
+
+    attempts_by_date = {str(row.day): row.attempts for row in daily}
+    day = func.date(QuizResult.completed_at)
+    for date, count in db.query(day, func.count()).filter(attempts).group_by(day):
+        attempts_by_date[str(date)] = attempts_by_date.get(str(date), 0) + count
+    attempts_over_time = [{"date": date, "count": count} for date, count in sorted(attempts_by_date.items())]
+
+    # Per-question attempts and correct answers from the (question_id, is_correct) index plus monthly rollups.
+    # Question rows are immutable, so answers from every version sharing a question were graded by the same key.
+    answered = func.count(ResultAnswer.question_id)
+    correct = func.coalesce(func.sum(case((ResultAnswer.is_correct, 1), else_=0)), 0)
+    question_rows = version_questions(db.query(Question.id, Question.question_text, answered, correct).outerjoin(
+        ResultAnswer, ResultAnswer.question_id == Question.id
+    ), version_id).group_by(Question.id, Question.question_text, QuizVersionQuestion.position).all()
+    archived_counts = {
+        question_id: (archived_answered, archived_correct)
+        for question_id, archived_answered, archived_correct in db.query(
+            QuestionMonthlyStats.question_id, func.sum(QuestionMonthlyStats.answered),
+            func.sum(QuestionMonthlyStats.correct)
+        ).filter(QuestionMonthlyStats.question_id.in_(version_question_ids(version_id))).group_by(
+            QuestionMonthlyStats.question_id
+        )
+    }
     question_analytics = []
-    if attempts and "detailed_results" in attempts[0]:
-        for i, question in enumerate(quiz["questions"]):
-            correct_count = 0
-            total_count = 0
-            for attempt in attempts:
-                if "detailed_results" in attempt and i < len(attempt["detailed_results"]):
-                    total_count += 1
-                    if attempt["detailed_results"][i]["is_correct"]:
-                        correct_count += 1
-            
+    for question_id, question_text, total_count, correct_count in question_rows:
+        archived_answered, archived_correct = archived_counts.get(question_id, (0, 0))
+        total_count += archived_answered
+        correct_count += archived_correct
+        if total_count:
             question_analytics.append({
-                "question": question["question"],
-                "correct_rate": (correct_count / total_count * 100) if total_count > 0 else 0,
-                "total_attempts": total_count
+                "question_id": question_id,
+                "question": question_text,
+                "correct_rate": correct_count / total_count * 100,
+                "total_attempts": total_count,
             })
-    
+
     return {
-        "quiz": quiz,
+        "quiz": quiz_info,
         "total_attempts": total_attempts,
         "average_score": round(average_score, 1),
         "completion_rate": 100,  # Assuming all started quizzes are completed
-        "score_distribution": [{"range": k, "count": v} for k, v in score_ranges.items()],
-        "attempts_over_time": sorted(attempts_over_time, key=lambda x: x["date"]),
+        "score_distribution": [{"range": label, "count": range_counts.get(label, 0)} for label, _ in SCORE_RANGES],
+        "attempts_over_time": attempts_over_time,
         "question_analytics": question_analytics
     }
 
+class AnswerSimilarityScan(BaseModel):
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    margin: Optional[float] = None  # bits above log2(pairs compared); lower flags more pairs
+
+def get_analyzable_quiz(db: Session, quiz_id: int, user: User) -> Quiz:
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if quiz.created_by != user.username:
+        raise HTTPException(status_code=403, detail="Only the quiz's creator can see who took it")
+    return quiz
+
+@app.post("/quiz-analytics/{quiz_id}/answer-similarity", status_code=202)
+def scan_answer_similarity(quiz_id: int, scan: AnswerSimilarityScan, current_user: User = Depends(get_current_user),
+                           db: Session = Depends(get_db)):
+    """Start a job comparing the answers of the quiz's attempts completed in [since, until)"""
+    get_analyzable_quiz(db, quiz_id, current_user)
+    job = submit_job(db, "answer_similarity", {
+        "quiz_id": quiz_id,
+        "since": scan.since.isoformat() if scan.since else None,
+        "until": scan.until.isoformat() if scan.until else None,
+        "margin": settings.SIMILARITY_MARGIN_BITS if scan.margin is None else scan.margin,
+    }, current_user.id)
+    return FastJSONResponse(job_status(job), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+@app.get("/quiz-analytics/{quiz_id}/answer-similarity")
+def get_answer_similarity(quiz_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """The latest answer similarity report of the quiz"""
+    get_analyzable_quiz(db, quiz_id, current_user)
+    report = db.query(AnswerSimilarityReport).filter(AnswerSimilarityReport.quiz_id == quiz_id).order_by(
+        AnswerSimilarityReport.created_at.desc(), AnswerSimilarityReport.id.desc()
+    ).first()
+    if not report:
+        raise HTTPException(status_code=404, detail="No answer similarity report yet; POST to start a scan")
+    return {
+        "quiz_id": quiz_id,
+        "job_id": report.job_id,
+        "created_at": report.created_at,
+        "since": report.since,
+        "until": report.until,
+        "margin": report.margin,
+        "threshold_bits": report.threshold_bits,
+        "attempts": report.attempts,
+        "flagged": report.flagged,
+        "pairs": json.loads(report.pairs),
+    }
+
 @app.get("/creator-analytics/{username}")
 async def get_creator_analytics(username: str):
     # Get quizzes created by this user (mock data for now)
@@ -615,42 +2481,73 @@ async def get_creator_analytics(username: str):
     }
 
 @app.get("/recommendations/{username}")
-async def get_quiz_recommendations(username: str):
-    # Simple recommendation - just return available quizzes
-    return {
-        "recommendations": quizzes[:6],
-        "total_recommendations": min(6, len(quizzes))
-    }
+def get_quiz_recommendations(username: str, db: Session = Depends(get_db)):
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    recommendations = recommend_quizzes(db, user_id, settings.DASHBOARD_RECOMMENDATIONS)
+    return FastJSONResponse({"recommendations": recommendations, "total_recommendations": len(recommendations)})
 
-@app.get("/export-quiz/{quiz_id}")
-async def export_quiz(quiz_id: int):
-    quiz = next((q for q in quizzes if q["id"] == quiz_id), None)
+def quiz_export_entry(db: Session, quiz_id: int) -> Optional[dict]:
+    """A quiz in the import format, with attempt and rating statistics from the stored totals"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Get quiz statistics for export
-    quiz_attempts = [h for h in quiz_history if h["quiz_title"] == quiz["title"]]
-    quiz_ratings = [r for r in quiz_ratings_data if r["quiz_id"] == quiz_id]
-    
-    export_data = {
+        return None
+    questions = version_questions(
+        db.query(Question).options(selectinload(Question.choices)), quiz.current_version_id
+    ).all()
+
+    hot_attempts, hot_score_sum = db.query(func.count(QuizResult.id), func.sum(QuizResult.score)).filter(
+        QuizResult.quiz_id == quiz_id
+    ).one()
+    archived_attempts, archived_score_sum = db.query(
+        func.sum(QuizDailyStats.attempts), func.sum(QuizDailyStats.score_sum)
+    ).filter(QuizDailyStats.quiz_id == quiz_id).one()
+    attempts = hot_attempts + (archived_attempts or 0)
+    score_sum = (hot_score_sum or 0) + (archived_score_sum or 0)
+    ratings = rating_summary(db.query(QuizRatingStats).filter(QuizRatingStats.quiz_id == quiz_id).first())
+
+    return {
         "quiz_data": {
-            **quiz,
+            "id": quiz.id,
+            "title": quiz.title,
+            "description": quiz.description,
+            "category": quiz.category,
+            "difficulty": quiz.difficulty,
+            "time_limit": quiz.time_limit,
+            "created_by": quiz.created_by,
+            "version": quiz.version,
+            "questions": [
+                {
+                    "question": q.question_text,
+                    "type": q.question_type,
+                    "options": q.options or [],
+                    "correct": q.correct_answer,
+                    "points": q.points,
+                }
+                for q in questions
+            ],
             "export_date": datetime.now().isoformat(),
             "export_version": "1.0"
         },
         "statistics": {
-            "total_attempts": len(quiz_attempts),
-            "average_score": sum(a["score"] for a in quiz_attempts) / len(quiz_attempts) if quiz_attempts else 0,
-            "total_ratings": len(quiz_ratings),
-            "average_rating": sum(r["rating"] for r in quiz_ratings) / len(quiz_ratings) if quiz_ratings else 0
-        },
-        "metadata": {
-            "exported_by": "QuizMaster",
-            "format_version": "1.0",
-            "compatible_versions": ["1.0"]
+            "total_attempts": attempts,
+            "average_score": score_sum / attempts if attempts else 0,
+            "total_ratings": ratings["rating_count"],
+            "average_rating": ratings["average_rating"],
         }
     }
-    
+
+@app.get("/export-quiz/{quiz_id}")
+def export_quiz(quiz_id: int, db: Session = Depends(get_db)):
+    export_data = quiz_export_entry(db, quiz_id)
+    if not export_data:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    export_data["metadata"] = {
+        "exported_by": "QuizMaster",
+        "format_version": "1.0",
+        "compatible_versions": ["1.0"]
+    }
     return export_data
 
 class QuizImport(BaseModel):
@@ -658,7 +2555,7 @@ class QuizImport(BaseModel):
     import_options: dict = {}
 
 @app.post("/import-quiz")
-async def import_quiz(import_data: QuizImport):
+def import_quiz(import_data: QuizImport, db: Session = Depends(get_db)):
     try:
         quiz_data = import_data.quiz_data
         
@@ -681,38 +2578,42 @@ async def import_quiz(import_data: QuizImport):
             if not isinstance(question["options"], list) or len(question["options"]) < 2:
                 raise HTTPException(status_code=400, detail=f"Question {i+1} must have at least 2 options")
         
-        # Create new quiz with new ID
-        new_quiz = {
-            "id": len(quizzes) + 1,
-            "title": quiz_data["title"],
-            "description": quiz_data["description"],
-            "category": quiz_data["category"],
-            "difficulty": quiz_data["difficulty"],
-            "time_limit": quiz_data["time_limit"],
-            "questions": quiz_data["questions"],
-            "question_count": len(quiz_data["questions"]),
-            "created_by": import_data.import_options.get("created_by", "Imported"),
-            "created_date": datetime.now().isoformat(),
-            "imported": True,
-            "original_export_date": quiz_data.get("export_date"),
-            "ratings": [],
-            "average_rating": 0
-        }
-        
-        # Add to quizzes list
-        quizzes.append(new_quiz)
+        new_quiz = Quiz(
+            title=quiz_data["title"],
+            description=quiz_data["description"],
+            category=quiz_data["category"],
+            difficulty=quiz_data["difficulty"],
+            time_limit=quiz_data["time_limit"],
+            created_by=import_data.import_options.get("created_by", "Imported"),
+        )
+        db.add(new_quiz)
+        questions = build_questions(quiz_data["questions"])
+        publish_quiz_version(db, new_quiz, questions)
+        near_duplicates = flag_near_duplicates(db, questions)
+        record_quiz_created(db, new_quiz.id, new_quiz.created_by)
+        db.commit()
         
         return {
             "message": "Quiz imported successfully",
-            "quiz_id": new_quiz["id"],
-            "quiz_title": new_quiz["title"]
+            "quiz_id": new_quiz.id,
+            "quiz_title": new_quiz.title,
+            "near_duplicates": near_duplicates
         }
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Import failed: {str(e)}")
 
+def export_package_metadata(total_quizzes: int):
+    return {
+        "total_quizzes": total_quizzes,
+        "export_date": datetime.now().isoformat(),
+        "exported_by": "QuizMaster",
+        "format_version": "1.0",
+        "package_type": "multiple_quizzes"
+    }
+
 @app.get("/export-multiple-quizzes")
-async def export_multiple_quizzes(quiz_ids: str = ""):
+def export_multiple_quizzes(quiz_ids: str = "", db: Session = Depends(get_db)):
     if not quiz_ids:
         raise HTTPException(status_code=400, detail="No quiz IDs provided")
     
@@ -720,41 +2621,208 @@ async def export_multiple_quizzes(quiz_ids: str = ""):
         quiz_id_list = [int(id.strip()) for id in quiz_ids.split(",")]
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid quiz ID format")
+
+    if len(quiz_id_list) > settings.EXPORT_SYNC_MAX_QUIZZES:
+        # Too many to export within the request: the package is built by a job and downloaded from it
+        job = submit_job(db, "export_quizzes", {"quiz_ids": quiz_id_list})
+        return FastJSONResponse(job_status(job), status_code=202, headers={"Location": f"/jobs/{job.id}"})
     
     exported_quizzes = []
     for quiz_id in quiz_id_list:
-        quiz = next((q for q in quizzes if q["id"] == quiz_id), None)
-        if quiz:
-            quiz_attempts = [h for h in quiz_history if h["quiz_title"] == quiz["title"]]
-            quiz_ratings = [r for r in quiz_ratings_data if r["quiz_id"] == quiz_id]
-            
-            exported_quizzes.append({
-                "quiz_data": {
-                    **quiz,
-                    "export_date": datetime.now().isoformat(),
-                    "export_version": "1.0"
-                },
-                "statistics": {
-                    "total_attempts": len(quiz_attempts),
-                    "average_score": sum(a["score"] for a in quiz_attempts) / len(quiz_attempts) if quiz_attempts else 0,
-                    "total_ratings": len(quiz_ratings),
-                    "average_rating": sum(r["rating"] for r in quiz_ratings) / len(quiz_ratings) if quiz_ratings else 0
-                }
-            })
+        entry = quiz_export_entry(db, quiz_id)
+        if entry:
+            exported_quizzes.append(entry)
     
     export_package = {
         "quizzes": exported_quizzes,
-        "export_metadata": {
-            "total_quizzes": len(exported_quizzes),
-            "export_date": datetime.now().isoformat(),
-            "exported_by": "QuizMaster",
-            "format_version": "1.0",
-            "package_type": "multiple_quizzes"
-        }
+        "export_metadata": export_package_metadata(len(exported_quizzes))
     }
     
     return export_package
 
+# --- Background jobs ---
+class JobCreate(BaseModel):
+    kind: str
+    params: dict = {}
+
+def job_params(kind: str, params: dict) -> dict:
+    """Validated parameters for a job of ``kind``"""
+    if kind == "export_quizzes":
+        quiz_ids = params.get("quiz_ids")
+        if not isinstance(quiz_ids, list) or not quiz_ids or not all(type(quiz_id) is int for quiz_id in quiz_ids):
+            raise HTTPException(status_code=400, detail="quiz_ids must be a non-empty list of quiz IDs")
+        return {"quiz_ids": quiz_ids}
+    if kind == "rebuild_derived":
+        return {}
+    raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+
+def submit_job(db: Session, kind: str, params: dict, created_by: Optional[int] = None) -> Job:
+    job = Job(kind=kind, params=json.dumps(params), status=jobs.QUEUED, created_by=created_by)
+    db.add(job)
+    db.commit()
+    job_runner.notify()
+    return job
+
+def job_status(job: Job):
+    finished = job.status == jobs.SUCCEEDED
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "done": job.done,
+        "total": job.total,
+        "progress": 1.0 if finished else round(job.done / job.total, 4) if job.total else 0.0,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "artifact_url": f"/jobs/{job.id}/artifact" if finished and job.artifact_path else None,
+    }
+
+def get_job_or_404(db: Session, job_id: int, request: Request) -> Job:
+    """A job visible to the caller: its submitter's, or one submitted without signing in"""
+    job = db.get(Job, job_id)
+    if job is not None and job.created_by is not None:
+        username = username_from_scope(request.scope)
+        if not username or db.query(User.id).filter(User.username == username).scalar() != job.created_by:
+            job = None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs", status_code=202)
+def create_job(job_data: JobCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    job = submit_job(db, job_data.kind, job_params(job_data.kind, job_data.params), current_user.id)
+    return FastJSONResponse(job_status(job), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int, request: Request, db: Session = Depends(get_db)):
+    return job_status(get_job_or_404(db, job_id, request))
+
+@app.get("/jobs/{job_id}/artifact")
+def download_job_artifact(job_id: int, request: Request, db: Session = Depends(get_db)):
+    job = get_job_or_404(db, job_id, request)
+    if job.status != jobs.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=410, detail="Job has no artifact")
+    return FileResponse(job.artifact_path, media_type=job.artifact_type, filename=os.path.basename(job.artifact_path))
+
+@job_runner.handler("export_quizzes")
+def export_quizzes_job(ctx: jobs.JobContext):
+    """Write an /export-multiple-quizzes package to a file, checkpointing after every chunk of quizzes.
+
+    The checkpoint holds the file size after the last saved chunk; a resumed run truncates the
+    file there, so a chunk written after the checkpoint is not repeated.
+    """
+    quiz_ids = ctx.params["quiz_ids"]
+    path = ctx.artifact_path(".json")
+    position = ctx.checkpoint.get("position", 0)
+    exported = ctx.checkpoint.get("exported", 0)
+    offset = ctx.checkpoint.get("offset")
+    if offset is None or not os.path.exists(path):
+        position, exported = 0, 0
+        with open(path, "wb") as out:
+            offset = out.write(b'{"quizzes": [')
+    with open(path, "r+b") as out:
+        out.truncate(offset)
+        out.seek(offset)
+        while position < len(quiz_ids):
+            chunk = quiz_ids[position:position + settings.JOB_EXPORT_CHUNK]
+            db = SessionLocal()
+            try:
+                entries = [entry for entry in (quiz_export_entry(db, quiz_id) for quiz_id in chunk) if entry]
+            finally:
+                db.close()
+            for entry in entries:
+                out.write((b"," if exported else b"") + dump_json(entry))
+                exported += 1
+            position += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+            ctx.save({"position": position, "exported": exported, "offset": out.tell()}, position, len(quiz_ids))
+        out.write(b'], "export_metadata": ' + dump_json(export_package_metadata(exported)) + b"}")
+    return path, "application/json"
+
+def rebuild_rating_stats(conn):
+    """Recompute quiz_rating_stats from quiz_ratings"""
+    stats = QuizRatingStats.__table__
+    rating_count, rating_sum = func.count(QuizRating.id), func.sum(QuizRating.rating)
+    conn.execute(stats.delete())
+    conn.execute(insert(stats).from_select(
+        ["quiz_id", "category", "rating_count", "rating_sum", "bayes_avg", "updated_at"],
+        select(QuizRating.quiz_id, Quiz.category, rating_count, rating_sum,
+               bayesian_average(rating_sum, rating_count), literal(datetime.utcnow()))
+        .join(Quiz, Quiz.id == QuizRating.quiz_id).group_by(QuizRating.quiz_id, Quiz.category)
+    ))
+
+@job_runner.handler("rebuild_derived")
+def rebuild_derived_job(ctx: jobs.JobContext):
+    """Recompute analytics and derived data from stored results and ratings.
+
+    In order: the rollups of each retained month, user totals, achievements (in ranges of user
+    ids) and rating statistics. Each step commits together with the checkpoint naming it, so a
+    resumed run starts with the step after the last one committed.
+    """
+    with ctx.engine.connect() as conn:
+        months = sorted(archived_months(conn))
+        max_user_id = conn.execute(select(func.max(User.id))).scalar() or 0
+    user_chunk = settings.JOB_REBUILD_USER_CHUNK
+    user_steps = -(-max_user_id // user_chunk)
+    total = len(months) + 1 + user_steps + 1
+    phase = ctx.checkpoint.get("phase", "rollups")
+    after = ctx.checkpoint.get("after")
+
+    if phase == "rollups":
+        for done, key in enumerate(months, 1):
+            if after is None or key > after:
+                with ctx.engine.begin() as conn:
+                    rebuild_rollups(conn, key)
+                    ctx.save({"phase": "rollups", "after": key}, done, total, conn=conn)
+        phase = "totals"
+    if phase == "totals":
+        with ctx.engine.begin() as conn:
+            reset_user_totals(conn)
+            ctx.save({"phase": "achievements", "after": 0}, len(months) + 1, total, conn=conn)
+        phase, after = "achievements", 0
+    if phase == "achievements":
+        while after < max_user_id:
+            last = after + user_chunk
+            with ctx.engine.begin() as conn:
+                achievements.rebuild(conn, after + 1, last)
+                ctx.save({"phase": "achievements", "after": last}, len(months) + 1 + -(-last // user_chunk), total,
+                         conn=conn)
+            after = last
+        phase = "ratings"
+    if phase == "ratings":
+        with ctx.engine.begin() as conn:
+            rebuild_rating_stats(conn)
+            ctx.save({"phase": "finished"}, total, total, conn=conn)
+
+@job_runner.handler("answer_similarity")
+def answer_similarity_job(ctx: jobs.JobContext):
+    """Compare the answers of every pair of attempts at a quiz (answer_similarity.py) and store the report"""
+    params = ctx.params
+    since, until = (datetime.fromisoformat(params[key]) if params.get(key) else None for key in ("since", "until"))
+    import answer_similarity  # numpy: worker processes load it when a scan runs
+
+    with ctx.engine.connect() as conn:
+        attempts = answer_similarity.load_attempts(conn, params["quiz_id"], since, until)
+    report = answer_similarity.similar_pairs(
+        attempts, params["margin"], settings.SIMILARITY_COPY_RATE, settings.SIMILARITY_WRONG_WEIGHT,
+        settings.SIMILARITY_MAX_PAIRS,
+    )
+    with ctx.engine.begin() as conn:
+        usernames = answer_similarity.user_names(conn, [user_id for pair in report["pairs"] for user_id in pair["user_ids"]])
+        for pair in report["pairs"]:
+            pair["usernames"] = [usernames.get(user_id) for user_id in pair["user_ids"]]
+        conn.execute(insert(AnswerSimilarityReport).values(
+            quiz_id=params["quiz_id"], job_id=ctx.job_id, since=since, until=until, margin=params["margin"],
+            threshold_bits=report["threshold_bits"], attempts=report["attempts"], flagged=report["flagged"],
+            pairs=json.dumps(report["pairs"]), created_at=datetime.utcnow(),
+        ))
+        ctx.save({"phase": "finished"}, 1, 1, conn=conn)
+
 # Quiz collaboration data structures
 quiz_collaborators = []  # [{quiz_id, username, role, status, invited_by, invited_at}]
 collaboration_invitations = []  # [{id, quiz_id, inviter, invitee, role, status, created_at}]
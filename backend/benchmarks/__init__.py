@@ -0,0 +1,73 @@
+"""
+Benchmark scripts for the QuizMaster backend.
+
+Run them from the backend directory, e.g. ``python -m benchmarks.serialization``.
+"""
+
+import os
+import tempfile
+
+
+def use_temp_database(name="benchmark.db"):
+    """Point the app at a throwaway SQLite file unless DATABASE_URL is already set.
+
+    Must be called before ``app`` is imported, since the engine is created at import time.
+    """
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="quizmaster-bench-"), name)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+
+def prepare_environment(name="benchmark.db"):
+    """Settings every benchmark runs under: a throwaway database and no admission rate limits.
+
+    Must be called before ``app`` is imported. Benchmarks override further settings after it.
+    """
+    os.environ["RATE_LIMITS_ENABLED"] = "false"
+    return use_temp_database(name)
+
+
+def free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class serve_app:
+    """Run the API under uvicorn in a subprocess for the duration of a ``with`` block.
+
+    Yields the base URL. ``env`` adds settings overrides for the server process.
+    """
+
+    def __init__(self, env=None, port=None):
+        self.env = env or {}
+        self.port = port or free_port()
+        self.process = None
+
+    def __enter__(self):
+        import subprocess
+        import sys
+        import time
+        import urllib.request
+
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=backend_dir, env={**os.environ, **self.env},
+        )
+        url = f"http://127.0.0.1:{self.port}"
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url + "/api/quizzes", timeout=1)
+                return url
+            except OSError:
+                time.sleep(0.1)
+        self.process.terminate()
+        raise RuntimeError("server did not start")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
@@ -0,0 +1,140 @@
+"""
+Answer similarity benchmark: scanning 50k attempts at one quiz for copied answers.
+
+Seeds a throwaway database with one quiz and ``--attempts`` results of
+independent users (ability varies, wrong answers favour a popular
+distractor), plus ``--rings`` groups of 2-4 users copying most answers
+from one of them. Times loading and the blocked scan, reports precision
+and recall against the copying pairs, and estimates what a plain Python
+pairwise loop would take from a sample. Last, runs the same scan as a
+job through the API and times it end to end.
+
+    python -m benchmarks.answer_similarity [--attempts 50000] [--questions 40] [--rings 40] [--copy 0.9]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+os.environ.setdefault("JOB_POLL_INTERVAL", "0.2")
+
+
+def seed_attempts(rng, attempts, question_count, rings, copy_share):
+    """Results for quiz 1 by users 1..attempts; returns the set of (result id, result id) copying pairs"""
+    from app import Question, QuestionOption, Quiz, QuizResult, ResultAnswer, engine
+    from datagen import generate, insert_batches
+
+    generate(users=attempts, quizzes=0, results=0)
+    questions = {}  # question id -> [(option id, correct)]
+    with engine.begin() as conn:
+        conn.execute(Quiz.__table__.insert(), [{"id": 1, "title": "Exam", "description": "", "category": "Science",
+                                                "difficulty": "Medium", "time_limit": 3600, "created_by": "user1"}])
+        for question_id in range(1, question_count + 1):
+            questions[question_id] = [(question_id * 4 + position, position == 0) for position in range(4)]
+            conn.execute(Question.__table__.insert(), [{"id": question_id, "quiz_id": 1, "question_type": "multiple_choice",
+                                                        "question_text": f"Question {question_id}?",
+                                                        "correct_answer": "right", "order": question_id}])
+            conn.execute(QuestionOption.__table__.insert(), [
+                {"id": option_id, "question_id": question_id, "position": position,
+                 "text": "right" if correct else f"wrong {position}"}
+                for position, (option_id, correct) in enumerate(questions[question_id])
+            ])
+
+    def independent(skill):
+        answers = {}
+        for question_id, options in questions.items():
+            if rng.random() < 0.05:
+                continue  # skipped
+            right = [option_id for option_id, correct in options if correct][0]
+            wrong = [option_id for option_id, correct in options if not correct]
+            # The first distractor is the popular one
+            answers[question_id] = right if rng.random() < skill else rng.choices(wrong, [4] + [1] * (len(wrong) - 1))[0]
+        return answers
+
+    sheets = [independent(min(0.95, max(0.2, rng.gauss(0.65, 0.15)))) for _ in range(attempts)]
+    copying = set()
+    members = rng.sample(range(attempts), rings * 4)
+    for ring in range(rings):
+        group = members[ring * 4:ring * 4 + rng.randint(2, 4)]
+        source = sheets[group[0]]
+        for member in group[1:]:
+            sheets[member] = {question_id: source[question_id] if question_id in source and rng.random() < copy_share
+                              else answer for question_id, answer in sheets[member].items()}
+        copying.update((a + 1, b + 1) for a, b in itertools.combinations(sorted(group), 2))
+
+    correct_option = {question_id: [o for o, c in options if c][0] for question_id, options in questions.items()}
+    with engine.begin() as conn:
+        insert_batches(conn, QuizResult.__table__, (
+            {"id": i + 1, "user_id": i + 1, "quiz_id": 1, "quiz_version_id": 1,
+             "score": sum(correct_option[q] == o for q, o in sheet.items()), "total_questions": len(questions),
+             "time_taken": 600, "completed_at": None}
+            for i, sheet in enumerate(sheets)
+        ), 10000)
+        insert_batches(conn, ResultAnswer.__table__, (
+            {"result_id": i + 1, "question_id": q, "option_id": o, "is_correct": correct_option[q] == o,
+             "points": int(correct_option[q] == o)}
+            for i, sheet in enumerate(sheets) for q, o in sheet.items()
+        ), 20000)
+    return copying
+
+
+def naive_seconds_per_pair(attempts, sample=600):
+    """A Python loop over pairs, comparing answer lists: the approach the scan replaces"""
+    rows = [list(row) for row in attempts.codes[:sample].tolist()]
+    start = time.perf_counter()
+    for a, b in itertools.combinations(rows, 2):
+        sum(1 for x, y in zip(a, b) if x == y and x >= 0)
+    return (time.perf_counter() - start) / (sample * (sample - 1) / 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--rings", type=int, default=40, help="groups of users copying answers")
+    parser.add_argument("--copy", type=float, default=0.9, help="share of answers a copier takes from the source")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    import answer_similarity
+    from app import app, create_access_token, engine, settings
+
+    rng = random.Random(7)
+    copying = seed_attempts(rng, args.attempts, args.questions, args.rings, args.copy)
+    print(f"{args.attempts} attempts at a {args.questions}-question quiz, {len(copying)} copying pairs")
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        attempts = answer_similarity.load_attempts(conn, 1)
+    loaded = time.perf_counter()
+    report = answer_similarity.similar_pairs(attempts, settings.SIMILARITY_MARGIN_BITS, settings.SIMILARITY_COPY_RATE,
+                                             settings.SIMILARITY_WRONG_WEIGHT, max_pairs=10 ** 6)
+    scanned = time.perf_counter()
+    flagged = {tuple(pair["result_ids"]) for pair in report["pairs"]}
+    found = len(flagged & copying)
+    print(f"load {loaded - start:.2f} s, scan of {report['pairs_compared']:,} pairs {scanned - loaded:.2f} s")
+    print(f"flagged {len(flagged)} pairs: precision {found / max(len(flagged), 1):.3f}, "
+          f"recall {found / max(len(copying), 1):.3f}")
+    naive = naive_seconds_per_pair(attempts) * report["pairs_compared"]
+    print(f"plain Python pairwise loop, extrapolated: {naive:.0f} s ({naive / (scanned - loaded):.0f}x slower)")
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user1'})}"}
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        job = client.post("/quiz-analytics/1/answer-similarity", json={}, headers=headers).json()
+        while job["status"] not in ("succeeded", "failed"):
+            time.sleep(0.1)
+            job = client.get(f"/jobs/{job['id']}", headers=headers).json()
+        report = client.get("/quiz-analytics/1/answer-similarity", headers=headers).json()
+        print(f"job through the API: {job['status']} in {time.perf_counter() - start:.2f} s, "
+              f"{report.get('flagged')} pairs flagged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Question bank draw benchmark.
+
+Seeds a throwaway database, builds banks of increasing size from the
+generated questions and times ``POST /question-banks/{id}/draw`` for one
+user (so exclusion of recent draws is exercised), plus the in-memory
+sampling step on its own. Draw time should stay flat as the bank grows.
+
+    python -m benchmarks.bank_draw [--questions 50000] [--draws 200] [--count 20]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app, create_access_token, get_bank_or_404, load_bank_index, SessionLocal, Question  # noqa: E402
+from benchmarks.loadtest import percentile  # noqa: E402
+from datagen import generate  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50000, help="approximate questions in the largest bank")
+    parser.add_argument("--draws", type=int, default=200)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+
+    # datagen averages about 14 questions per quiz
+    generate(users=10, quizzes=max(10, args.questions // 14), results=0)
+    db = SessionLocal()
+    max_question = db.query(Question.id).order_by(Question.id.desc()).first()[0]
+    db.close()
+
+    token = create_access_token({"sub": "user1"})
+    headers = {"Authorization": f"Bearer {token}"}
+    with TestClient(app) as client:
+        print(f"{'bank size':>10}{'build ms':>10}{'draw p50 ms':>13}{'draw p99 ms':>13}{'sample p50 ms':>15}")
+        for size in sorted({min(size, max_question) for size in (1000, 10000, max_question)}):
+            start = time.perf_counter()
+            bank_id = client.post("/question-banks", json={
+                "name": f"bank {size}", "question_ids": list(range(1, size + 1)),
+            }).json()["bank_id"]
+            summary = client.get(f"/question-banks/{bank_id}").json()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            def draw():
+                response = client.post(f"/question-banks/{bank_id}/draw", json={"count": args.count}, headers=headers)
+                assert response.status_code == 200, response.text
+
+            db = SessionLocal()
+            index = load_bank_index(db, get_bank_or_404(db, bank_id))
+            db.close()
+            strata = list(index.strata)
+            rng = random.Random(1)
+
+            def sample():
+                index.sample(strata, args.count, index.exclusion(()), index.exclusion(()), rng)
+
+            draw_p50, draw_p99 = timed(draw, args.draws)
+            sample_p50, _ = timed(sample, args.draws)
+            print(f"{summary['question_count']:>10}{build_ms:>10.1f}{draw_p50:>13.2f}{draw_p99:>13.2f}{sample_p50:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
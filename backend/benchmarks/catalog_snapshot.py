@@ -0,0 +1,149 @@
+"""
+Catalog snapshot benchmark: build time, worker startup, memory per worker and latency.
+
+Seeds a throwaway catalog and times a full snapshot build and an
+incremental one after a single quiz edit. Then starts ``--workers``
+processes that each get every quiz detail body ready to serve, either by
+mapping the snapshot or by rendering the bodies from the database into
+their own memory (what a per-worker cache holds once warm), and reports
+the time that took plus the RSS and PSS each worker gained. PSS splits
+shared pages between the processes mapping them, so it shows the
+snapshot being paid for once. Last, ``/quizzes`` and ``/api/quizzes/{id}``
+latency in-process, served from the snapshot and from the database.
+Memory figures need Linux (/proc/self/smaps_rollup).
+
+    python -m benchmarks.catalog_snapshot [--quizzes 5000] [--workers 4] [--requests 300]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import zlib
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+
+def memory_kb():
+    """Rss and Pss of this process in kB, or None where /proc/self/smaps_rollup is not available"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return {name: int(fields[name].split()[0]) for name in ("Rss", "Pss")}
+
+
+def worker(mode, barrier, results):
+    import app
+    from snapshot import CatalogSnapshot
+
+    before = memory_kb()
+    start = time.perf_counter()
+    if mode == "mmap":
+        catalog = CatalogSnapshot(app.catalog_snapshots.path)
+        bodies = [catalog.detail_body(entry) for entry in catalog.entries()]
+    else:
+        db = app.SessionLocal()
+        try:
+            version_ids = [version_id for (version_id,) in db.query(app.Quiz.current_version_id).filter(
+                app.Quiz.deleted_at.is_(None), app.Quiz.current_version_id.isnot(None))]
+            rendered = {}
+            for start_index in range(0, len(version_ids), 500):
+                rendered.update(app.render_quiz_versions(db, version_ids[start_index:start_index + 500]))
+            bodies = list(rendered.values())
+        finally:
+            db.close()
+    # Read every body once, as serving each quiz would
+    checksum = sum(zlib.crc32(body) for body in bodies)
+    elapsed = time.perf_counter() - start
+    barrier.wait()  # measure while every worker holds its bodies, so shared pages are split between them
+    after = memory_kb()
+    results.put((mode, elapsed, before, after, checksum))
+    barrier.wait()
+
+
+def run_workers(mode, count):
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(count), context.Queue()
+    processes = [context.Process(target=worker, args=(mode, barrier, results)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports
+
+
+def latency(client, urls):
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        client.get(url, headers={"Accept-Encoding": "identity"})
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quizzes", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    import app
+    from datagen import generate
+
+    generate(users=200, quizzes=args.quizzes, results=args.quizzes)
+    app.on_startup()
+
+    start = time.perf_counter()
+    app.build_catalog_snapshot()
+    full_build = time.perf_counter() - start
+    size = os.path.getsize(app.catalog_snapshots.path)
+
+    db = app.SessionLocal()
+    try:
+        quiz = db.query(app.Quiz).filter(app.Quiz.id == 1).first()
+        quiz.title += " (revised)"
+        questions = app.version_questions(db.query(app.Question), quiz.current_version_id).all()
+        app.publish_quiz_version(db, quiz, questions)
+        db.commit()
+    finally:
+        db.close()
+    start = time.perf_counter()
+    app.build_catalog_snapshot()
+    incremental_build = time.perf_counter() - start
+    print(f"snapshot of {args.quizzes} quizzes: {size / 1e6:.1f} MB, full build {full_build:.2f} s, "
+          f"rebuild after one edit {incremental_build:.2f} s")
+
+    print(f"\n{args.workers} workers{'':<9}{'ready ms':>10}{'RSS +MB':>10}{'PSS +MB':>10}")
+    for mode, label in (("mmap", "mapped snapshot"), ("heap", "rendered into heap")):
+        reports = run_workers(mode, args.workers)
+        ready = statistics.mean(elapsed for _, elapsed, _, _, _ in reports) * 1000
+        if reports[0][2] is None:
+            print(f"{label:<22}{ready:>10.1f}{'n/a':>10}{'n/a':>10}")
+            continue
+        rss = statistics.mean(after["Rss"] - before["Rss"] for _, _, before, after, _ in reports) / 1024
+        pss = statistics.mean(after["Pss"] - before["Pss"] for _, _, before, after, _ in reports) / 1024
+        print(f"{label:<22}{ready:>10.1f}{rss:>10.1f}{pss:>10.1f}")
+
+    rng = random.Random(1)
+    quiz_urls = [f"/api/quizzes/{rng.randint(1, args.quizzes)}" for _ in range(args.requests)]
+    print(f"\n{'p50 ms':<22}{'/quizzes':>10}{'detail':>10}")
+    with TestClient(app.app) as client:
+        for enabled, label in ((True, "snapshot"), (False, "database")):
+            app.settings.CATALOG_SNAPSHOT_ENABLED = enabled
+            app.quiz_details.clear()
+            detail = latency(client, quiz_urls)
+            print(f"{label:<22}{latency(client, ['/quizzes'] * (args.requests // 10)):>10.2f}{detail:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Catalog delta-sync benchmark: bytes transferred per sync for typical churn.
+
+Seeds a throwaway catalog, then simulates days of churn through the API
+(a share of quizzes edited, created and deleted each day). After each day
+it compares refetching the whole ``/quizzes`` list with
+``/quizzes/changes?since=<last version>`` for a client that syncs daily,
+and at the end for one that synced only on the first day. Sizes are the
+Content-Length on the wire, uncompressed and gzip. Exits non-zero if the
+catalog rebuilt from deltas differs from the full list, or if a client
+behind a compacted tombstone is not sent a full snapshot.
+
+    python -m benchmarks.catalog_sync [--quizzes 2000] [--days 7] [--edit 0.01] [--create 0.005] [--delete 0.001]
+"""
+
+import argparse
+import random
+import sys
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import changelog  # noqa: E402
+from app import app, create_access_token, engine  # noqa: E402
+from datagen import generate  # noqa: E402
+
+
+def wire_bytes(client, url):
+    sizes = []
+    for encoding in ("identity", "gzip"):
+        response = client.get(url, headers={"Accept-Encoding": encoding})
+        response.raise_for_status()
+        sizes.append(int(response.headers["content-length"]))
+    return sizes
+
+
+def sync(client, catalog, since):
+    """Apply the changes since ``since`` to ``catalog`` (quiz id -> summary); returns the new version"""
+    response = client.get(f"/quizzes/changes?since={since}")
+    response.raise_for_status()
+    delta = response.json()
+    if delta["reset"]:
+        catalog.clear()
+    catalog.update((quiz["id"], quiz) for quiz in delta["upserts"])
+    for quiz_id in delta["deletes"]:
+        catalog.pop(quiz_id, None)
+    return delta["version"]
+
+
+def churn(client, rng, quiz_ids, edits, creates, deletes):
+    """Edit, create and delete quizzes through the API as their creators"""
+    for quiz_id in rng.sample(sorted(quiz_ids), edits + deletes)[:edits]:
+        quiz_data = client.get(f"/export-quiz/{quiz_id}").json()["quiz_data"]
+        quiz_data["title"] += " (revised)"
+        for question in quiz_data["questions"]:  # exports carry the answer text, edits take its letter
+            question["correct"] = "ABCD"[question["options"].index(question["correct"])]
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': quiz_data['created_by']})}"}
+        client.put(f"/quizzes/{quiz_id}", json=quiz_data, headers=headers).raise_for_status()
+    for quiz_id in rng.sample(sorted(quiz_ids), deletes):
+        creator = client.get(f"/export-quiz/{quiz_id}").json()["quiz_data"]["created_by"]
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': creator})}"}
+        client.delete(f"/quizzes/{quiz_id}", headers=headers).raise_for_status()
+        quiz_ids.discard(quiz_id)
+    for i in range(creates):
+        response = client.post("/create-quiz", json={
+            "title": f"New quiz {rng.randrange(10 ** 6)}", "description": "Added during the benchmark",
+            "category": rng.choice(["Science", "History", "Programming"]), "difficulty": "Medium",
+            "time_limit": 600, "created_by": "user1",
+            "questions": [{"question": f"Question {n}?", "options": ["A1", "B1", "C1", "D1"], "correct": "A"}
+                          for n in range(10)],
+        })
+        response.raise_for_status()
+        quiz_ids.add(response.json()["quiz_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--edit", type=float, default=0.01, help="share of quizzes edited per day")
+    parser.add_argument("--create", type=float, default=0.005, help="new quizzes per day, as a share of the catalog")
+    parser.add_argument("--delete", type=float, default=0.001, help="share of quizzes deleted per day")
+    args = parser.parse_args()
+
+    generate(users=200, quizzes=args.quizzes, results=args.quizzes)
+    rng = random.Random(1)
+    with TestClient(app) as client:
+        quiz_ids = {quiz["id"] for quiz in client.get("/quizzes").json()["quizzes"]}
+        catalog = {}
+        first_version = daily_version = sync(client, catalog, 0)
+        full_total, delta_total = [0, 0], [0, 0]
+        print(f"{'':<18}{'full bytes':>12}{'full gzip':>12}{'delta bytes':>13}{'delta gzip':>12}")
+        for day in range(1, args.days + 1):
+            churn(client, rng, quiz_ids, max(1, round(len(quiz_ids) * args.edit)),
+                  max(1, round(len(quiz_ids) * args.create)), max(1, round(len(quiz_ids) * args.delete)))
+            full = wire_bytes(client, "/quizzes")
+            delta = wire_bytes(client, f"/quizzes/changes?since={daily_version}")
+            daily_version = sync(client, catalog, daily_version)
+            full_total = [a + b for a, b in zip(full_total, full)]
+            delta_total = [a + b for a, b in zip(delta_total, delta)]
+            print(f"{f'day {day}':<18}{full[0]:>12}{full[1]:>12}{delta[0]:>13}{delta[1]:>12}")
+        print(f"{'daily, total':<18}{full_total[0]:>12}{full_total[1]:>12}{delta_total[0]:>13}{delta_total[1]:>12}"
+              f"   ({full_total[1] / max(delta_total[1], 1):.0f}x less gzip)")
+        weekly = wire_bytes(client, f"/quizzes/changes?since={first_version}")
+        print(f"{f'{args.days} days at once':<18}{full[0]:>12}{full[1]:>12}{weekly[0]:>13}{weekly[1]:>12}")
+        if catalog != {quiz["id"]: quiz for quiz in client.get("/quizzes").json()["quizzes"]}:
+            print("FAIL: the catalog rebuilt from deltas differs from /quizzes")
+            sys.exit(1)
+
+        summary = changelog.compact(engine, tombstone_retention_days=0)
+        print(f"compaction dropped {summary['superseded']} superseded changes and {summary['tombstones']} tombstones")
+        if not client.get(f"/quizzes/changes?since={first_version}").json()["reset"]:
+            print("FAIL: a client behind the compacted tombstones was sent a delta")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
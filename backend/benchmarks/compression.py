@@ -0,0 +1,81 @@
+"""
+Compression benchmark: bytes on the wire and CPU per request by encoding.
+
+Seeds a throwaway catalog, then requests ``/quizzes`` and a large quiz
+detail with each Accept-Encoding. "cached" is the served path, where the
+versioned body is compressed once and reused; "per-request" is the CPU that
+compressing on every request would cost at the dynamic level.
+
+    python -m benchmarks.compression [--quizzes 2000] [--questions 200] [--requests 200]
+"""
+
+import argparse
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import Base, Question, QuestionOption, Quiz, app, engine  # noqa: E402
+from compression import _DYNAMIC_LEVELS, available_encodings, compress  # noqa: E402
+
+
+def seed(quiz_count, question_count):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Quiz.__table__.insert(), [
+            {"id": i, "title": f"Quiz {i}", "description": f"Practice set number {i} for the benchmark catalog",
+             "category": ["Programming", "Mathematics", "Science", "History"][i % 4],
+             "difficulty": ["Easy", "Medium", "Hard"][i % 3], "time_limit": 600, "version": 1}
+            for i in range(1, quiz_count + 1)
+        ])
+        conn.execute(Question.__table__.insert(), [
+            {"id": i, "quiz_id": 1, "question_text": f"Question {i}: which statement is correct?",
+             "question_type": "multiple_choice", "correct_answer": "A", "points": 1, "order": i}
+            for i in range(1, question_count + 1)
+        ])
+        conn.execute(QuestionOption.__table__.insert(), [
+            {"question_id": i, "position": p, "text": f"Option {c} for question {i}"}
+            for i in range(1, question_count + 1) for p, c in enumerate("ABCD")
+        ])
+
+
+def measure(client, url, encoding, requests):
+    headers = {"Accept-Encoding": encoding or "identity"}
+    client.get(url, headers=headers)  # warm the precompressed cache
+    sizes = 0
+    start = time.process_time()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+        sizes += int(response.headers["content-length"])
+    return sizes // requests, (time.process_time() - start) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    seed(args.quizzes, args.questions)
+    with TestClient(app) as client:
+        print(f"{'url':<18}{'encoding':<10}{'bytes':>10}{'cpu ms/req':>12}{'per-request ms':>16}")
+        for url in ("/quizzes", "/api/quizzes/1"):
+            identity = client.get(url, headers={"Accept-Encoding": "identity"}).content
+            for encoding in [""] + available_encodings():
+                size, cpu_ms = measure(client, url, encoding, args.requests)
+                if encoding:
+                    start = time.process_time()
+                    for _ in range(10):
+                        compress(identity, encoding, _DYNAMIC_LEVELS[encoding])
+                    dynamic_ms = f"{(time.process_time() - start) * 100:.3f}"
+                else:
+                    dynamic_ms = "-"
+                print(f"{url:<18}{encoding or 'identity':<10}{size:>10}{cpu_ms:>12.3f}{dynamic_ms:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+User dashboard benchmark: one aggregated request against the separate profile page calls.
+
+Seeds a throwaway database with ``datagen`` (users, quizzes, results and
+the derived totals and achievement counters), then for a sample of users
+times the four calls the profile pages used to make one after another
+(history, stats, achievements, recommendations) against
+``/users/{name}/dashboard`` uncached and cached. Last, submits a result
+for each user and checks that their next dashboard is recomputed and
+shows it.
+
+    python -m benchmarks.dashboard [--users 20000] [--quizzes 2000] [--results 400000] [--sample 300]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+
+def timed(calls):
+    start = time.perf_counter()
+    responses = [call() for call in calls]
+    for response in responses:
+        assert response.status_code == 200, (response.status_code, response.text)
+    return (time.perf_counter() - start) * 1000, responses
+
+
+def summary(name, samples):
+    samples = sorted(samples)
+    print(f"{name:34s} p50 {statistics.median(samples):7.2f} ms   p95 {samples[int(len(samples) * 0.95)]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--results", type=int, default=400000)
+    parser.add_argument("--sample", type=int, default=300, help="users whose pages are loaded")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    from app import app, dispatcher, engine, settings
+    from datagen import generate
+    from partitions import maintain
+
+    start = time.perf_counter()
+    generate(users=args.users, quizzes=args.quizzes, results=args.results)
+    # Archive the seeded months now, as after any bulk load; left to the app's startup task, it would hold
+    # the write lock while the submissions below run
+    maintain(engine, settings.RESULTS_HOT_MONTHS, settings.RESULTS_RETENTION_MONTHS)
+    print(f"seeded {args.users} users, {args.quizzes} quizzes, {args.results} results "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    rng = random.Random(3)
+    names = [f"user{user_id}" for user_id in rng.sample(range(1, args.users + 1), args.sample)]
+    separate, cold, warm = [], [], []
+    with TestClient(app) as client:
+        for name in names:
+            elapsed, _ = timed([
+                lambda: client.get(f"/quiz-history/{name}?limit=20"),
+                lambda: client.get(f"/user-stats/{name}"),
+                lambda: client.get(f"/users/{name}/achievements"),
+                lambda: client.get(f"/recommendations/{name}"),
+            ])
+            separate.append(elapsed)
+        for samples in (cold, warm):
+            for name in names:
+                elapsed, _ = timed([lambda: client.get(f"/users/{name}/dashboard")])
+                samples.append(elapsed)
+        summary("4 separate calls", separate)
+        summary("dashboard, uncached", cold)
+        summary("dashboard, cached", warm)
+
+        fresh = 0
+        for name in names:
+            client.get(f"/users/{name}/dashboard?fields=history,stats")  # cached before the submission
+            submitted = client.post("/quiz-history", json={
+                "username": name, "quiz_id": 1, "score": 80, "total_questions": 10, "time_taken": 60,
+            }).json()
+            after = client.get(f"/users/{name}/dashboard?fields=history,stats").json()
+            fresh += any(row["id"] == submitted["id"] for row in after["history"])
+        deadline = time.monotonic() + 30
+        while dispatcher.backlog() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        counted = sum(
+            client.get(f"/users/{name}/dashboard?fields=history,stats").json()["stats"]["quizzesCompleted"]
+            == client.get(f"/user-stats/{name}").json()["quizzesCompleted"]
+            for name in names
+        )
+        print(f"after a new result: {fresh}/{len(names)} dashboards showed it at once, "
+              f"{counted}/{len(names)} stats matched once the outbox consumers ran")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Near-duplicate detection benchmark: bulk dedupe time and accuracy, and per-question import cost.
+
+Seeds a throwaway question bank of random questions (a vocabulary of a
+few thousand words, 4 options each), a share of which are near-copies of
+an earlier question: case, punctuation and option order changed, or one
+word added or replaced at the end. Another share are related questions
+that reuse half of an earlier question's words and must not be merged.
+Times ``dedupe.run`` over the whole bank and reports precision (flagged
+duplicates that are injected copies of the right question) and recall
+(injected copies that were flagged). Then times ``flag_near_duplicates``
+for batches of new questions against the index the run built.
+
+    python -m benchmarks.dedupe [--questions 200000] [--copies 0.1] [--related 0.05] [--batch 50]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+SYLLABLES = "ka lo mi ne ru sa ti vo pe da zu fi go he ja".split()
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def random_question(rng, words):
+    text = " ".join(rng.choice(words) for _ in range(rng.randint(8, 16))) + "?"
+    return text, [" ".join(rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(4)]
+
+
+def near_copy(rng, words, text, options):
+    """A copy an importer would produce: reformatted, options shuffled, or one word changed at the end"""
+    options = list(options)
+    rng.shuffle(options)
+    tokens = text.rstrip("?").split()
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text.upper().replace(" ", rng.choice([" ", ", ", "  "]), 2).rstrip("?") + " ?", options
+    if kind == 1:
+        return " ".join(tokens + [rng.choice(words)]) + "?", options
+    return " ".join(tokens[:-1] + [rng.choice(words)]) + "?", options
+
+
+def related(rng, words, text, options):
+    """Same topic, different question: every other word replaced and two options changed"""
+    tokens = [token if i % 2 else rng.choice(words) for i, token in enumerate(text.rstrip("?").split())]
+    return " ".join(tokens) + "?", options[:2] + [rng.choice(words), rng.choice(words)]
+
+
+def seed_bank(rng, count, copy_share, related_share):
+    """Insert ``count`` questions into one quiz; returns {copy id: id of the question it copies}"""
+    from app import Base, Question, QuestionOption, Quiz, engine
+    from datagen import insert_batches
+
+    Base.metadata.create_all(bind=engine)
+    words = vocabulary(rng, 5000)
+    questions, copies = [], {}
+    for question_id in range(1, count + 1):
+        roll = rng.random()
+        if questions and roll < copy_share:
+            original = rng.randrange(len(questions))
+            copies[question_id] = original + 1
+            questions.append(near_copy(rng, words, *questions[original]))
+        elif questions and roll < copy_share + related_share:
+            questions.append(related(rng, words, *questions[rng.randrange(len(questions))]))
+        else:
+            questions.append(random_question(rng, words))
+    with engine.begin() as conn:
+        conn.execute(Quiz.__table__.insert(), [{"id": 1, "title": "Bank", "description": "", "category": "Science",
+                                                "difficulty": "Medium", "time_limit": 600}])
+        insert_batches(conn, Question.__table__, (
+            {"id": i, "quiz_id": 1, "question_text": text, "question_type": "multiple_choice",
+             "correct_answer": options[0], "points": 1, "order": i}
+            for i, (text, options) in enumerate(questions, 1)
+        ), 20000)
+        insert_batches(conn, QuestionOption.__table__, (
+            {"question_id": i, "position": position, "text": option}
+            for i, (_, options) in enumerate(questions, 1) for position, option in enumerate(options)
+        ), 20000)
+    return words, questions, copies
+
+
+def accuracy(copies):
+    from sqlalchemy import text
+
+    from app import engine
+
+    with engine.connect() as conn:
+        flagged = dict(conn.execute(text("SELECT id, duplicate_of FROM questions WHERE duplicate_of IS NOT NULL")).all())
+
+    def root(question_id):
+        while question_id in copies:
+            question_id = copies[question_id]
+        return question_id
+
+    correct = sum(1 for question_id, canonical in flagged.items()
+                  if question_id in copies and root(question_id) == root(canonical))
+    return correct / max(len(flagged), 1), correct / max(len(copies), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=200000)
+    parser.add_argument("--copies", type=float, default=0.1, help="share of questions that are near-copies")
+    parser.add_argument("--related", type=float, default=0.05, help="share of similar but distinct questions")
+    parser.add_argument("--batch", type=int, default=50, help="questions per import in the incremental test")
+    args = parser.parse_args()
+
+    import app
+    import dedupe
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    words, questions, copies = seed_bank(rng, args.questions, args.copies, args.related)
+    print(f"seeded {args.questions} questions ({len(copies)} near-copies) in {time.perf_counter() - start:.1f} s")
+    app.on_startup()
+
+    start = time.perf_counter()
+    summary = dedupe.run(app.engine, app.settings.DEDUPE_THRESHOLD)
+    elapsed = time.perf_counter() - start
+    precision, recall = accuracy(copies)
+    print(f"bulk dedupe: {elapsed:.1f} s ({summary['seconds']}), {summary['candidate_pairs']} candidate pairs, "
+          f"{summary['duplicates']} duplicates in {summary['clusters']} clusters")
+    print(f"precision {precision:.3f}, recall {recall:.3f}")
+
+    db = app.SessionLocal()
+    try:
+        quiz = db.query(app.Quiz).filter(app.Quiz.id == 1).one()
+        timings, flagged, expected = [], 0, 0
+        for _ in range(20):
+            batch = []
+            for _ in range(args.batch):
+                if rng.random() < 0.5:
+                    text, options = near_copy(rng, words, *questions[rng.randrange(len(questions))])
+                    expected += 1
+                else:
+                    text, options = random_question(rng, words)
+                batch.append(app.Question(quiz=quiz, question_text=text, question_type="multiple_choice",
+                                          options=options, correct_answer=options[0]))
+            db.add_all(batch)
+            db.flush()
+            start = time.perf_counter()
+            flagged += len(app.flag_near_duplicates(db, batch))
+            timings.append(time.perf_counter() - start)
+        per_question = sum(timings) / (len(timings) * args.batch) * 1000
+        print(f"import lookup: {per_question:.3f} ms per question in batches of {args.batch}, "
+              f"{flagged} of {expected} near-copies flagged")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
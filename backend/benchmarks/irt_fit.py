@@ -0,0 +1,71 @@
+"""
+IRT calibration benchmark.
+
+Simulates responses from known 2PL parameters, fits them cold with
+``irt.fit_2pl``, then adds a batch of new responses and refits warm from
+the first fit's estimates, the way the nightly job runs. Reports wall time,
+iterations, and how well the true parameters were recovered.
+
+    python -m benchmarks.irt_fit [--responses 10000000] [--users 200000] [--questions 20000]
+"""
+
+import argparse
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+import numpy as np  # noqa: E402
+
+from irt import Responses, fit_2pl  # noqa: E402
+
+
+def simulate(rng, theta, b, a, n):
+    u = np.sort(rng.integers(0, len(theta), n, dtype=np.int32))  # grouped by user, as irt.load_responses does
+    j = rng.integers(0, len(b), n, dtype=np.int32)
+    p = 1.0 / (1.0 + np.exp(-a[j] * (theta[u] - b[j])))
+    return u, j, (rng.random(n) < p).astype(np.float64)
+
+
+def report(name, seconds, calibration, theta, b, a):
+    corr = lambda x, y: np.corrcoef(x, y)[0, 1]  # noqa: E731
+    print(f"{name:<6}{seconds:>9.2f} s{calibration.iterations:>7} it"
+          f"   r(ability) {corr(calibration.ability, theta):.3f}"
+          f"   r(difficulty) {corr(calibration.difficulty, b):.3f}"
+          f"   r(discrimination) {corr(calibration.discrimination, a):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--responses", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--questions", type=int, default=20_000)
+    parser.add_argument("--new-fraction", type=float, default=0.05, help="responses added before the warm refit")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    theta = rng.normal(0.0, 1.0, args.users)
+    b = rng.normal(0.0, 1.0, args.questions)
+    a = np.exp(rng.normal(0.0, 0.3, args.questions))
+
+    start = time.perf_counter()
+    u, j, y = simulate(rng, theta, b, a, args.responses)
+    print(f"simulated {args.responses:,} responses in {time.perf_counter() - start:.2f} s")
+    responses = Responses(u, j, y, np.arange(args.users), np.arange(args.questions))
+
+    start = time.perf_counter()
+    cold = fit_2pl(responses)
+    report("cold", time.perf_counter() - start, cold, theta, b, a)
+
+    nu, nj, ny = simulate(rng, theta, b, a, int(args.responses * args.new_fraction))
+    responses = Responses(np.concatenate([u, nu]), np.concatenate([j, nj]), np.concatenate([y, ny]),
+                          responses.user_ids, responses.question_ids)
+    start = time.perf_counter()
+    warm = fit_2pl(responses, cold.ability, cold.difficulty, cold.discrimination)
+    report("warm", time.perf_counter() - start, warm, theta, b, a)
+
+
+if __name__ == "__main__":
+    main()
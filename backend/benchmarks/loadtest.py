@@ -0,0 +1,209 @@
+"""
+End-to-end load test against a running QuizMaster server.
+
+Drives the real endpoints with a weighted request mix and a fixed number of
+concurrent clients, then appends throughput and p50/p95/p99 latency per
+endpoint to a JSON-lines results file tagged with the current git commit,
+so runs can be compared across commits.
+
+Seed the database with ``python datagen.py`` first, start the server with
+the admission rate limits off (``RATE_LIMITS_ENABLED=false python main.py``;
+every client here shares one address, so the per-user buckets would turn
+most ``/search`` and ``/quiz-history`` requests into 429s), then:
+
+    python -m benchmarks.loadtest --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --compare            # last two runs
+    python -m benchmarks.loadtest --compare abc123 def456
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import random
+import subprocess
+import time
+from datetime import datetime
+
+import httpx
+
+SEARCH_TERMS = ["python", "data", "history", "matrix", "graph", "science", "planet", "query"]
+
+# (name, weight, path template)
+SCENARIOS = [
+    ("catalog", 20, "/api/quizzes"),
+    ("quiz_detail", 35, "/api/quizzes/{quiz_id}"),
+    ("quiz_history", 20, "/quiz-history/{username}"),
+    ("leaderboard", 10, "/leaderboard"),
+    ("search", 15, "/search?q={term}"),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Workload:
+    def __init__(self, quiz_ids, usernames, seed):
+        self.rng = random.Random(seed)
+        self.quiz_ids = quiz_ids
+        self.usernames = usernames
+        weights = list(itertools.accumulate(weight for _, weight, _ in SCENARIOS))
+        self._scenario_cumulative = weights
+        # Popular quizzes and active users get most of the traffic
+        self._quiz_cumulative = list(itertools.accumulate(1.0 / r ** 1.1 for r in range(1, len(quiz_ids) + 1)))
+
+    def next_request(self):
+        scenario = SCENARIOS[bisect.bisect(self._scenario_cumulative, self.rng.random() * self._scenario_cumulative[-1])]
+        name, _, template = scenario
+        quiz_index = min(bisect.bisect(self._quiz_cumulative, self.rng.random() * self._quiz_cumulative[-1]),
+                         len(self.quiz_ids) - 1)
+        path = template.format(
+            quiz_id=self.quiz_ids[quiz_index],
+            username=self.rng.choice(self.usernames),
+            term=self.rng.choice(SEARCH_TERMS),
+        )
+        return name, path
+
+
+async def run_client(client, workload, deadline, samples, errors, limited, headers):
+    while time.perf_counter() < deadline:
+        name, path = workload.next_request()
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = None
+        elapsed = (time.perf_counter() - start) * 1000
+        if status is not None and status < 400:
+            samples.setdefault(name, []).append(elapsed)
+        elif status == 429:
+            limited[name] = limited.get(name, 0) + 1
+        else:
+            errors[name] = errors.get(name, 0) + 1
+
+
+async def run(base_url, concurrency, duration, users, seed, warmup, accept_encoding):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Accept-Encoding": accept_encoding}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        catalog = (await client.get("/api/quizzes")).json()
+        quiz_ids = [quiz["id"] for quiz in catalog] or [1]
+        usernames = [f"user{i}" for i in range(1, users + 1)]
+        workload = Workload(quiz_ids, usernames, seed)
+
+        if warmup:
+            await asyncio.gather(*(run_client(client, workload, time.perf_counter() + warmup, {}, {}, {}, headers)
+                                   for _ in range(concurrency)))
+
+        samples, errors, limited = {}, {}, {}
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(client, workload, start + duration, samples, errors, limited, headers)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name, _, _ in SCENARIOS:
+        latencies = sorted(samples.get(name, []))
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors.get(name, 0),
+            "rate_limited": limited.get(name, 0),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+    everything = sorted(itertools.chain.from_iterable(samples.values()))
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "config": {"base_url": base_url, "concurrency": concurrency, "duration": duration,
+                   "users": users, "seed": seed, "accept_encoding": accept_encoding},
+        "total": {
+            "requests": len(everything),
+            "errors": sum(errors.values()),
+            "rate_limited": sum(limited.values()),
+            "rps": round(len(everything) / elapsed, 1),
+            "p50_ms": round(percentile(everything, 0.50), 2),
+            "p95_ms": round(percentile(everything, 0.95), 2),
+            "p99_ms": round(percentile(everything, 0.99), 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_run(run_result):
+    print(f"commit {run_result['commit']} at {run_result['timestamp']} {run_result['config']}")
+    print(f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'429s':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}")
+    rows = list(run_result["endpoints"].items()) + [("total", run_result["total"])]
+    for name, row in rows:
+        print(f"{name:<14}{row['requests']:>10}{row['errors']:>8}{row.get('rate_limited', 0):>8}{row['rps']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    if run_result["total"].get("rate_limited"):
+        print("warning: the server rate-limited this run; restart it with RATE_LIMITS_ENABLED=false "
+              "so the numbers measure request handling rather than 429s")
+
+
+def compare(results_path, commits):
+    with open(results_path) as results_file:
+        runs = [json.loads(line) for line in results_file if line.strip()]
+    if commits:
+        selected = [next(r for r in reversed(runs) if r["commit"].startswith(c)) for c in commits]
+    else:
+        selected = runs[-2:]
+    if len(selected) < 2:
+        raise SystemExit("need at least two runs to compare")
+    base, head = selected[0], selected[-1]
+    print(f"{base['commit']} -> {head['commit']}")
+    print(f"{'endpoint':<14}{'rps':>22}{'p50 ms':>22}{'p99 ms':>22}")
+    names = list(base["endpoints"]) + ["total"]
+    for name in names:
+        old = base["total"] if name == "total" else base["endpoints"].get(name)
+        new = head["total"] if name == "total" else head["endpoints"].get(name)
+        if not old or not new:
+            continue
+        cells = [f"{old[k]:>9} -> {new[k]:<9}" for k in ("rps", "p50_ms", "p99_ms")]
+        print(f"{name:<14}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QuizMaster end-to-end load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--users", type=int, default=10000, help="usernames user1..userN to sample from")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--accept-encoding", default="identity")
+    parser.add_argument("--output", default="loadtest_results.jsonl")
+    parser.add_argument("--compare", nargs="*", metavar="COMMIT",
+                        help="compare two runs from the results file instead of running")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(args.output, args.compare)
+        return
+
+    result = asyncio.run(run(args.base_url, args.concurrency, args.duration, args.users, args.seed,
+                             args.warmup, args.accept_encoding))
+    with open(args.output, "a") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+    print_run(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Login throughput and collateral latency benchmark.
+
+Starts the API in a subprocess on a throwaway database, measures the
+latency of an unrelated endpoint (``/api/quizzes/{id}``) on its own, then
+again while a flood of concurrent logins hits ``/token``. Reports login
+throughput, login latency, 503 sheds, and p50/p99 of the unrelated endpoint
+in both phases.
+
+    python -m benchmarks.login [--login-clients 64] [--duration 10] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks import prepare_environment, serve_app
+
+prepare_environment()
+
+import httpx  # noqa: E402
+
+from benchmarks.loadtest import percentile  # noqa: E402
+from datagen import generate  # noqa: E402
+
+
+async def hammer(client, deadline, make_request, latencies, statuses):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await make_request(client)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = "error"
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    return f"p50 {percentile(latencies, 0.5):8.2f} ms  p99 {percentile(latencies, 0.99):8.2f} ms"
+
+
+async def run(base_url, login_clients, background_clients, duration, users):
+    limits = httpx.Limits(max_connections=login_clients + background_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        def quiz_detail(c):
+            return c.get("/api/quizzes/1")
+
+        def login_factory():
+            counter = iter(range(10 ** 9))
+
+            def login(c):
+                user = next(counter) % users + 1
+                return c.post("/token", data={"username": f"user{user}", "password": "password"})
+            return login
+
+        quiet, quiet_status = [], {}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(hammer(client, deadline, quiz_detail, quiet, quiet_status)
+                               for _ in range(background_clients)))
+
+        busy, busy_status, logins, login_status = [], {}, [], {}
+        login = login_factory()
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(
+            *(hammer(client, deadline, quiz_detail, busy, busy_status) for _ in range(background_clients)),
+            *(hammer(client, deadline, login, logins, login_status) for _ in range(login_clients)),
+        )
+        elapsed = time.perf_counter() - start
+
+    successful = login_status.get(200, 0)
+    print(f"logins: {successful / elapsed:8.1f}/s ok, statuses {login_status}, {summary(logins)}")
+    print(f"/api/quizzes/1 alone:        {summary(quiet)}  ({len(quiet) / duration:.0f} req/s)")
+    print(f"/api/quizzes/1 during flood: {summary(busy)}  ({len(busy) / elapsed:.0f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--login-clients", type=int, default=64)
+    parser.add_argument("--background-clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="PASSWORD_HASH_WORKERS for the server")
+    parser.add_argument("--executor", default="thread", choices=["thread", "process"])
+    args = parser.parse_args()
+
+    generate(users=args.users, quizzes=20, results=1000)
+    env = {"PASSWORD_HASH_WORKERS": str(args.workers), "PASSWORD_HASH_EXECUTOR": args.executor}
+    with serve_app(env) as base_url:
+        asyncio.run(run(base_url, args.login_clients, args.background_clients, args.duration, args.users))
+
+
+if __name__ == "__main__":
+    main()
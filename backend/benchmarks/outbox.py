@@ -0,0 +1,120 @@
+"""
+Outbox delivery benchmark.
+
+Seeds a throwaway database and submits quizzes to the ASGI app in-process
+at a fixed rate, first with the outbox dispatcher paused (the write path
+alone) and then running as it does in the server. Reports submission
+latency for both and the delivery lag of the derived data (time from an
+event's commit to the end of the consumer transaction that applied it).
+Exits non-zero if the lag p99 exceeds ``--max-lag-ms``.
+
+    python -m benchmarks.outbox [--rate 50] [--duration 10] [--users 1000]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+import httpx  # noqa: E402
+
+from app import app, create_access_token, dispatcher, on_startup, Question, SessionLocal  # noqa: E402
+from benchmarks.loadtest import percentile  # noqa: E402
+from datagen import generate  # noqa: E402
+
+lags = []
+
+
+@dispatcher.consumer("benchmark_probe", "quiz_completed")
+def record_lag(conn, events):
+    now = datetime.utcnow()
+    lags.extend((now - event.created_at).total_seconds() * 1000 for event in events)
+
+
+def answer_keys(quizzes):
+    db = SessionLocal()
+    try:
+        keys = {}
+        for quiz_id, question_id, correct in db.query(Question.quiz_id, Question.id, Question.correct_answer).filter(
+            Question.quiz_id <= quizzes
+        ):
+            keys.setdefault(quiz_id, []).append({"question_id": question_id, "answer": correct})
+        return keys
+    finally:
+        db.close()
+
+
+async def submit_load(rate, duration, users, keys):
+    rng = random.Random(1)
+    tokens = [create_access_token({"sub": f"user{i + 1}"}) for i in range(users)]
+    quiz_ids = sorted(keys)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+        latencies, statuses = [], {}
+
+        async def submit(token, quiz_id):
+            answers = [answer for answer in keys[quiz_id] if rng.random() < 0.7]
+            start = time.perf_counter()
+            response = await client.post("/submit-quiz", json={"quiz_id": quiz_id, "answers": answers, "time_taken": 90},
+                                         headers={"Authorization": f"Bearer {token}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        tasks = []
+        start = time.perf_counter()
+        for n in range(int(rate * duration)):
+            delay = start + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(submit(rng.choice(tokens), rng.choice(quiz_ids))))
+        await asyncio.gather(*tasks)
+    latencies.sort()
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=50.0, help="submissions per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--max-lag-ms", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    generate(users=args.users, quizzes=200, results=20000)
+    on_startup()
+    keys = answer_keys(200)
+
+    def report(name, latencies, statuses):
+        print(f"{name:<20} p50 {percentile(latencies, 0.5):8.2f} ms  p99 {percentile(latencies, 0.99):8.2f} ms  "
+              f"statuses {statuses}")
+
+    report("submit (paused)", *asyncio.run(submit_load(args.rate, args.duration, args.users, keys)))
+    dispatcher.drain(timeout=120)
+    lags.clear()
+
+    dispatcher.start()
+    try:
+        report("submit (dispatching)", *asyncio.run(submit_load(args.rate, args.duration, args.users, keys)))
+        start = time.perf_counter()
+        while dispatcher.backlog() and time.perf_counter() - start < 60:
+            time.sleep(0.05)
+        catch_up = time.perf_counter() - start
+    finally:
+        dispatcher.stop()
+
+    lags.sort()
+    print(f"{'delivery lag':<20} p50 {percentile(lags, 0.5):8.2f} ms  p99 {percentile(lags, 0.99):8.2f} ms  "
+          f"max {lags[-1] if lags else 0:.2f} ms  (caught up {catch_up:.2f} s after the last submission)")
+    if percentile(lags, 0.99) > args.max_lag_ms:
+        print(f"FAIL: delivery lag p99 exceeds {args.max_lag_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Overload benchmark for admission control.
+
+Seeds a throwaway database and drives the ASGI app in-process, so requests
+queue inside the app (in the threadpool behind the sync endpoints) rather
+than in the load generator's TCP stack. ``/search`` and
+``/quiz-history/{user}`` arrive at a fixed rate well above what the server
+can serve, once through ``AdmissionControlMiddleware`` and once without it.
+Reports p50/p99 of admitted (200) requests and how many were rejected with
+429/503. Exits non-zero if the admitted p99 with admission control exceeds
+``--max-p99-ms``, or if one user flooding a route past their own limit gets
+other users rejected by the shared route bucket.
+
+    python -m benchmarks.overload [--rate 600] [--duration 10] [--max-concurrency 16]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+# The app's own admission middleware is switched off; the benchmark wraps the app itself
+os.environ["MAX_CONCURRENT_REQUESTS"] = "1000000"
+
+import httpx  # noqa: E402
+
+from app import app  # noqa: E402
+from benchmarks.loadtest import SEARCH_TERMS, percentile  # noqa: E402
+from datagen import generate  # noqa: E402
+from ratelimit import AdmissionControlMiddleware  # noqa: E402
+
+
+async def timed_get(client, path, latencies, statuses):
+    start = time.perf_counter()
+    try:
+        response = await client.get(path)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = "error"
+    if status == 200:
+        latencies.append((time.perf_counter() - start) * 1000)
+    statuses[status] = statuses.get(status, 0) + 1
+
+
+async def flood(asgi_app, rate, duration, users):
+    """Open-loop load: requests arrive at ``rate`` per second whether or not earlier ones finished"""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+        latencies, statuses, tasks = [], {}, []
+        start = time.perf_counter()
+        for n in range(int(rate * duration)):
+            delay = start + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if n % 2:
+                path = f"/search?q={SEARCH_TERMS[n % len(SEARCH_TERMS)]}"
+            else:
+                path = f"/quiz-history/user{n % users + 1}"
+            tasks.append(asyncio.ensure_future(timed_get(client, path, latencies, statuses)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "admitted_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+    }
+
+
+async def noisy_user_statuses(burst=5, flood=50):
+    """Statuses of ``flood`` requests from one user, then of one request from another user"""
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    rules = {"/submit-quiz": {"per_user": [0.01, burst], "total": [0.01, burst * 2]}}
+    limited = AdmissionControlMiddleware(ok, identify=lambda scope: dict(scope["headers"]).get(b"x-user"),
+                                         rules=rules)
+    transport = httpx.ASGITransport(app=limited)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        noisy = [(await client.post("/submit-quiz", headers={"x-user": "noisy"})).status_code
+                 for _ in range(flood)]
+        other = (await client.post("/submit-quiz", headers={"x-user": "other"})).status_code
+    return noisy, other
+
+
+def check_noisy_user():
+    noisy, other = asyncio.run(noisy_user_statuses())
+    allowed = noisy.count(200)
+    print(f"noisy user: {allowed}/{len(noisy)} allowed, next request from another user: {other}")
+    if allowed != 5 or other != 200:
+        print("FAIL: a user over their own limit drained the shared route bucket")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=600.0, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=0.05)
+    parser.add_argument("--route-rate", type=float, default=400.0, help="requests/second allowed per route")
+    parser.add_argument("--max-p99-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    check_noisy_user()
+    generate(users=args.users, quizzes=500, results=50000)
+    # Every in-process request comes from the same address, so per-user buckets are left out;
+    # the route-wide buckets and the concurrency cap are what bound latency here
+    rules = {prefix: {"total": [args.route_rate, args.route_rate]} for prefix in ("/search", "/quiz-history")}
+    configs = {
+        "admission control": AdmissionControlMiddleware(app, identify=lambda scope: None, rules=rules,
+                                                        max_concurrency=args.max_concurrency,
+                                                        queue_timeout=args.queue_timeout),
+        "unlimited": app,
+    }
+    results = {}
+    for name, asgi_app in configs.items():
+        results[name] = row = asyncio.run(flood(asgi_app, args.rate, args.duration, args.users))
+        print(f"{name:<18} admitted {row['admitted_rps']:8.1f}/s  p50 {row['p50_ms']:8.2f} ms  "
+              f"p99 {row['p99_ms']:8.2f} ms  statuses {row['statuses']}")
+
+    p99 = results["admission control"]["p99_ms"]
+    if p99 > args.max_p99_ms:
+        print(f"FAIL: admitted p99 {p99} ms exceeds {args.max_p99_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
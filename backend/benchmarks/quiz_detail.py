@@ -0,0 +1,128 @@
+"""
+Quiz detail latency benchmark for large quizzes.
+
+Seeds a throwaway database with one quiz whose options live in
+question_options and one whose options are legacy JSON text, then times the
+current read path (rendering a quiz version, and serving it from the
+snapshot cache) against the old ORM + ``json.loads`` path.
+
+    python -m benchmarks.quiz_detail [--questions 200] [--requests 500]
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks import prepare_environment
+
+prepare_environment()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import (  # noqa: E402
+    Base, Question, QuestionPublic, Quiz, QuizDetail, SessionLocal, app, engine, publish_quiz_version,
+    quiz_details, quiz_version_body,
+)
+
+
+def seed(question_count):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        quizzes = []
+        for legacy in (False, True):
+            quiz = Quiz(title=f"Benchmark quiz (legacy={legacy})", description="Large quiz",
+                        category="Benchmark", difficulty="Hard", time_limit=3600)
+            db.add(quiz)
+            db.flush()
+            questions = []
+            for i in range(question_count):
+                options = [f"Option {c} for question {i + 1}" for c in "ABCD"]
+                question = Question(quiz_id=quiz.id, question_text=f"Question {i + 1}?",
+                                    question_type="multiple_choice", correct_answer=options[0],
+                                    points=1, order=i + 1)
+                if legacy:
+                    question.legacy_options = json.dumps(options)
+                    db.add(question)
+                else:
+                    question.options = options
+                questions.append(question)
+            if not legacy:
+                publish_quiz_version(db, quiz, questions)
+            quizzes.append(quiz.id)
+        db.commit()
+        return quizzes
+    finally:
+        db.close()
+
+
+def legacy_get_quiz(quiz_id, db):
+    """The read path before options moved into question_options"""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    questions_public = [
+        QuestionPublic(id=q.id, question_text=q.question_text, question_type=q.question_type,
+                       options=json.loads(q.legacy_options) if q.legacy_options else None, points=q.points)
+        for q in sorted(quiz.questions, key=lambda x: x.order)
+    ]
+    detail = QuizDetail(id=quiz.id, title=quiz.title, description=quiz.description, category=quiz.category,
+                        difficulty=quiz.difficulty, time_limit=quiz.time_limit, version=quiz.version,
+                        question_count=len(quiz.questions), questions=questions_public)
+    return json.dumps(jsonable_encoder(detail)).encode("utf-8")
+
+
+def render_quiz_version(quiz_id, db):
+    quiz_details.clear()
+    return cached_quiz_version(quiz_id, db)
+
+
+def cached_quiz_version(quiz_id, db):
+    version_id = db.query(Quiz.current_version_id).filter(Quiz.id == quiz_id).scalar()
+    return quiz_version_body(db, version_id)
+
+
+def time_calls(fn, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def in_session(fn, quiz_id):
+    def call():
+        db = SessionLocal()
+        try:
+            fn(quiz_id, db)
+        finally:
+            db.close()
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    structured_id, legacy_id = seed(args.questions)
+    client = TestClient(app)
+
+    results = [
+        ("legacy ORM + json.loads", time_calls(in_session(legacy_get_quiz, legacy_id), args.requests)),
+        ("render quiz version", time_calls(in_session(render_quiz_version, structured_id), args.requests)),
+        ("cached quiz version", time_calls(in_session(cached_quiz_version, structured_id), args.requests)),
+        ("HTTP GET /api/quizzes/{id}",
+         time_calls(lambda: client.get(f"/api/quizzes/{structured_id}"), args.requests)),
+    ]
+    print(f"quiz detail, {args.questions} questions, {args.requests} requests")
+    print(f"{'path':<30}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, (p50, p95) in results:
+        print(f"{label:<30}{p50:>10.3f}{p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Serialization benchmark for the catalog and quiz detail payloads.
+
+Compares the previous path (Pydantic validation, jsonable_encoder and the
+stdlib json module) with the direct dict-to-bytes path used by
+FastJSONResponse, over catalog sizes we expect in production.
+
+    python -m benchmarks.serialization [--sizes 100 1000 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app import QuizDetail, QuizPublic
+from serialization import BACKEND, dumps
+
+CATEGORIES = ["Programming", "Data Science", "Mathematics", "History", "Science", "Languages"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+
+def make_catalog(size, rng):
+    return [
+        {
+            "id": i + 1,
+            "title": f"Quiz {i + 1}: {rng.choice(CATEGORIES)} practice",
+            "description": "A realistic description of moderate length " * rng.randint(1, 4),
+            "category": rng.choice(CATEGORIES),
+            "difficulty": rng.choice(DIFFICULTIES),
+            "time_limit": rng.choice([300, 600, 900]),
+            "question_count": rng.randint(3, 40),
+        }
+        for i in range(size)
+    ]
+
+
+def make_detail(question_count, rng):
+    quiz = make_catalog(1, rng)[0]
+    quiz["question_count"] = question_count
+    quiz["questions"] = [
+        {
+            "id": i + 1,
+            "question_text": f"Question {i + 1}: which of these statements is correct?",
+            "question_type": "multiple_choice",
+            "options": [f"Option {c} for question {i + 1}" for c in "ABCD"],
+            "points": rng.randint(1, 3),
+        }
+        for i in range(question_count)
+    ]
+    return quiz
+
+
+def stdlib_catalog(rows):
+    models = [QuizPublic(**row) for row in rows]
+    return json.dumps({"quizzes": jsonable_encoder(models)}).encode("utf-8")
+
+
+def fast_catalog(rows):
+    return dumps({"quizzes": rows})
+
+
+def stdlib_detail(quiz):
+    return json.dumps(jsonable_encoder(QuizDetail(**quiz))).encode("utf-8")
+
+
+def fast_detail(quiz):
+    return dumps(quiz)
+
+
+def best_of(fn, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--questions", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"encoder backend: {BACKEND}")
+    print(f"{'payload':<28}{'bytes':>12}{'stdlib ms':>12}{'fast ms':>12}{'speedup':>10}")
+
+    cases = [(f"/quizzes x{n}", stdlib_catalog, fast_catalog, make_catalog(n, rng)) for n in args.sizes]
+    cases += [(f"/api/quizzes/{{id}} q={n}", stdlib_detail, fast_detail, make_detail(n, rng)) for n in args.questions]
+
+    for label, slow, fast, payload in cases:
+        slow_s = best_of(slow, payload, args.repeat)
+        fast_s = best_of(fast, payload, args.repeat)
+        size = len(fast(payload))
+        print(f"{label:<28}{size:>12}{slow_s * 1000:>12.3f}{fast_s * 1000:>12.3f}{slow_s / fast_s:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Startup benchmark: time from process start to /healthz and /readyz.
+
+Seeds a throwaway database with ``datagen``, then boots the API under
+uvicorn several times in each mode and reports the median time until the
+process answers /healthz (serving) and /readyz (warmed up), plus the
+first request to the most taken quiz's detail after readiness:
+
+* ``upgrade``: SCHEMA_CHECK_ENABLED=false, DDL, inspection and data
+  migrations run on every boot, as before;
+* ``checked``: the schema fingerprint matches, so startup skips them;
+* ``checked, no warm-up``: same, with WARMUP_ENABLED=false.
+
+Also times ``import app`` alone in a fresh interpreter.
+
+    python -m benchmarks.startup [--users 20000] [--quizzes 2000] [--results 300000] [--boots 3]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import free_port, prepare_environment
+
+prepare_environment()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.monotonic()
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} not ready")
+
+
+def boot(env, quiz_id):
+    """Seconds to /healthz and /readyz, and milliseconds of the first quiz detail request"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+    )
+    try:
+        healthy = wait_for(url + "/healthz", start + 300)
+        ready = wait_for(url + "/readyz", start + 300)
+        request_start = time.perf_counter()
+        urllib.request.urlopen(f"{url}/api/quizzes/{quiz_id}", timeout=10).read()
+        first = (time.perf_counter() - request_start) * 1000
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return healthy - start, ready - start, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--results", type=int, default=300000)
+    parser.add_argument("--boots", type=int, default=3, help="boots per mode")
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+
+    from app import engine
+    from datagen import generate
+
+    start = time.perf_counter()
+    generate(users=args.users, quizzes=args.quizzes, results=args.results)
+    print(f"seeded {args.users} users, {args.quizzes} quizzes, {args.results} results "
+          f"in {time.perf_counter() - start:.1f} s")
+    with engine.connect() as conn:
+        quiz_id = conn.execute(text(
+            "SELECT quiz_id FROM quiz_results GROUP BY quiz_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )).scalar()
+    engine.dispose()
+
+    imports = []
+    for _ in range(args.boots):
+        output = subprocess.run(
+            [sys.executable, "-c", "import time; start = time.perf_counter(); import app; "
+                                   "print(time.perf_counter() - start)"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        imports.append(float(output.split()[-1]))
+    print(f"import app: {statistics.median(imports) * 1000:.0f} ms")
+
+    boot({}, quiz_id)  # the first boot upgrades the schema and records its fingerprint
+    modes = [
+        ("upgrade", {"SCHEMA_CHECK_ENABLED": "false"}),
+        ("checked", {}),
+        ("checked, no warm-up", {"WARMUP_ENABLED": "false"}),
+    ]
+    # Catalog snapshot off so the first quiz detail comes from the warmed (or cold) cache
+    for name, env in modes:
+        runs = [boot({**env, "CATALOG_SNAPSHOT_ENABLED": "false"}, quiz_id) for _ in range(args.boots)]
+        healthy, ready, first = (statistics.median(values) for values in zip(*runs))
+        print(f"{name:22s} /healthz {healthy:6.2f} s   /readyz {ready:6.2f} s   first quiz detail {first:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
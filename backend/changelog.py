@@ -0,0 +1,66 @@
+"""
+Catalog change log for delta sync.
+
+Every write that changes what the catalog lists (a quiz created, edited
+or deleted) adds a ``catalog_changes`` row in the same transaction,
+stamped with the catalog version that transaction committed as. Version
+bumps are serialized by the ``catalog_version`` row lock, so versions
+commit in order and "changes with version > V" is exactly what a client
+holding version V has not seen.
+
+Deletes are recorded as tombstones. Compaction keeps the log small: a row
+followed by a later row for the same quiz is dropped (the later one
+carries the quiz's current state), and tombstones older than the
+retention are dropped after raising ``catalog_version.changes_floor``
+to their version. A client whose version is below the floor may have
+missed a delete and has to take a full snapshot instead of a delta.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def record(conn, version: int, quiz_id: int, op: str = UPSERT):
+    """Log a change to one quiz inside the caller's transaction (a Connection or Session)"""
+    conn.execute(text(
+        "INSERT INTO catalog_changes (version, quiz_id, op, changed_at) VALUES (:version, :quiz_id, :op, :now)"
+    ), {"version": version, "quiz_id": quiz_id, "op": op, "now": datetime.utcnow()})
+
+
+def changes_since(conn, since: int, until: int) -> Optional[Dict[int, str]]:
+    """Latest op per quiz changed in ``(since, until]``, or None when the log no longer covers ``since``"""
+    rows = conn.execute(text(
+        "SELECT quiz_id, op FROM catalog_changes WHERE version > :since AND version <= :until ORDER BY version"
+    ), {"since": since, "until": until}).all()
+    # Read after the changes: a compaction that dropped a tombstone from them has raised the floor
+    floor = conn.execute(text("SELECT changes_floor FROM catalog_version WHERE id = 1")).scalar() or 0
+    if since < floor:
+        return None
+    return {quiz_id: op for quiz_id, op in rows}
+
+
+def compact(engine, tombstone_retention_days: int, now: datetime = None) -> dict:
+    """Drop superseded changes and expired tombstones; returns counts"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=tombstone_retention_days)
+    with engine.begin() as conn:
+        superseded = conn.execute(text(
+            "DELETE FROM catalog_changes WHERE EXISTS (SELECT 1 FROM catalog_changes later "
+            "WHERE later.quiz_id = catalog_changes.quiz_id AND later.version > catalog_changes.version)"
+        )).rowcount
+        expired_version = conn.execute(text(
+            "SELECT MAX(version) FROM catalog_changes WHERE op = :op AND changed_at < :cutoff"
+        ), {"op": DELETE, "cutoff": cutoff}).scalar()
+        tombstones = 0
+        if expired_version is not None:
+            conn.execute(text(
+                "UPDATE catalog_version SET changes_floor = :version WHERE id = 1 AND changes_floor < :version"
+            ), {"version": expired_version})
+            tombstones = conn.execute(text(
+                "DELETE FROM catalog_changes WHERE op = :op AND version <= :version"
+            ), {"op": DELETE, "version": expired_version}).rowcount
+    return {"superseded": superseded, "tombstones": tombstones}
@@ -0,0 +1,226 @@
+"""
+Response compression for QuizMaster.
+
+Negotiates zstd, brotli or gzip from ``Accept-Encoding`` and compresses
+responses above a minimum size. Responses that carry an ETag are versioned,
+so their compressed bodies are kept in a small LRU and reused until the
+version changes: compression is paid once per version and encoding.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+# Dynamic responses favour speed; cached ones are compressed once, so they can afford more effort
+_DYNAMIC_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+_CACHED_LEVELS = {"zstd": 12, "br": 9, "gzip": 9}
+
+# Bodies larger than this are compressed off the event loop
+_THREADPOOL_THRESHOLD = 64 * 1024
+
+
+def available_encodings():
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def negotiate(accept_encoding: str, supported) -> str:
+    """Pick the server-preferred encoding the client accepts, or '' for identity"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in supported:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return ""
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (url, etag, encoding), bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses buffered responses above ``minimum_size`` bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024, cache: CompressedBodyCache = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+        self.cache = cache if cache is not None else CompressedBodyCache(32 * 1024 * 1024)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, self.encodings) if accept_encoding else ""
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                if len(body_parts) == 1:
+                    # Streaming responses are passed through untouched
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                return
+            # A single part (the usual case) is passed on as is, which keeps memory-mapped bodies uncopied
+            body = body_parts[0] if len(body_parts) == 1 else b"".join(body_parts)
+            await self._send_compressed(scope, encoding, start_message, body, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _compress(self, body, encoding, level):
+        if len(body) > _THREADPOOL_THRESHOLD:
+            return await run_in_threadpool(compress, body, encoding, level)
+        return compress(body, encoding, level)
+
+    async def _send_compressed(self, scope, encoding, start_message, body, send):
+        headers = list(start_message.get("headers", []))
+        lookup = {name.lower(): value for name, value in headers}
+        content_type = lookup.get(b"content-type", b"").decode("latin-1")
+        compressible = (
+            start_message["status"] not in (204, 304)
+            and b"content-encoding" not in lookup
+            and len(body) >= self.minimum_size
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+        if not compressible:
+            if b"etag" in lookup:
+                # Validators must agree with the compressed 200 that a 304 (or a small body) stands in for
+                start_message = {**start_message, "headers": _negotiated_headers(headers, lookup)}
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = lookup.get(b"etag")
+        if etag is not None:
+            key = (scope["path"], scope.get("query_string", b""), etag, encoding)
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = await self._compress(body, encoding, _CACHED_LEVELS[encoding])
+                self.cache.put(key, compressed)
+        else:
+            compressed = await self._compress(body, encoding, _DYNAMIC_LEVELS[encoding])
+
+        rewritten = [(name, value) for name, value in _negotiated_headers(headers, lookup)
+                     if name.lower() != b"content-length"]
+        rewritten.append((b"content-encoding", encoding.encode("latin-1")))
+        rewritten.append((b"content-length", str(len(compressed)).encode("latin-1")))
+
+        await send({**start_message, "headers": rewritten})
+        await send({"type": "http.response.body", "body": compressed})
+
+
+def _negotiated_headers(headers, lookup):
+    """Headers with a weak ETag and ``Vary: Accept-Encoding``, as sent for a request that negotiated an encoding.
+
+    A compressed body is a different representation, so its ETag is kept weakly equal to the original;
+    304s and uncompressed bodies for the same request carry the same form so caches pair them up.
+    """
+    rewritten = []
+    for name, value in headers:
+        lower = name.lower()
+        if lower == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        elif lower == b"vary" and b"accept-encoding" not in value.lower():
+            value += b", Accept-Encoding"
+        rewritten.append((name, value))
+    if b"vary" not in lookup:
+        rewritten.append((b"vary", b"Accept-Encoding"))
+    return rewritten
@@ -2,6 +2,8 @@
 Configuration settings for QuizMaster application using Pydantic.
 """
 
+import os
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -14,6 +16,123 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
 
+    # Password hashing (scrypt); stored hashes with other parameters are upgraded on login
+    SCRYPT_LOG_N: int = 14
+    SCRYPT_R: int = 8
+    SCRYPT_P: int = 1
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = max(1, (os.cpu_count() or 2) // 2)  # leave cores for request handling
+    PASSWORD_HASH_NICENESS: int = 10  # process executor only: hashing runs at lower CPU priority
+    PASSWORD_HASH_MAX_PENDING: int = 64  # hashes running or queued; beyond this callers wait up to the timeout
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0  # seconds, then 503 with Retry-After
+
+    # Startup: a database whose recorded schema fingerprint matches this release skips DDL and data
+    # migrations (False always runs them). Warm-up fills hot caches in the background before /readyz passes
+    SCHEMA_CHECK_ENABLED: bool = True
+    WARMUP_ENABLED: bool = True
+    WARMUP_TOP_QUIZZES: int = 200  # most taken quizzes whose details and answer keys are preloaded
+    WARMUP_WINDOW_DAYS: int = 7  # "most taken" counts results of this many recent days
+
+    # HTTP caching: browsers always revalidate (cheap 304s), a local reverse proxy may reuse for s-maxage
+    CATALOG_CACHE_CONTROL: str = "public, max-age=0, s-maxage=30, stale-while-revalidate=60"
+    QUIZ_CACHE_CONTROL: str = "public, max-age=0, s-maxage=300, stale-while-revalidate=600"
+    QUIZ_VERSION_CACHE_CONTROL: str = "public, max-age=31536000, immutable"  # published versions never change
+
+    # Immutable quiz versions: rendered quiz details and answer keys are kept per version, never invalidated
+    QUIZ_DETAIL_CACHE_SIZE: int = 2048
+    ANSWER_KEY_CACHE_SIZE: int = 2048
+
+    # Catalog delta sync (GET /quizzes/changes): the change log is compacted every interval; clients
+    # that last synced before the oldest dropped tombstone get a full snapshot
+    CATALOG_COMPACTION_INTERVAL: int = 3600  # seconds
+    CATALOG_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Catalog snapshot: /quizzes and quiz details are served from a prebuilt file every worker maps,
+    # rebuilt in the background after catalog writes (empty path: next to the SQLite database)
+    CATALOG_SNAPSHOT_ENABLED: bool = True
+    CATALOG_SNAPSHOT_PATH: str = ""
+    CATALOG_SNAPSHOT_CHECK_INTERVAL: float = 1.0  # seconds between checks for a snapshot published by another worker
+    CATALOG_SNAPSHOT_PUBLISH_DELAY: float = 0.5  # seconds to wait after a write so a burst leads to one build
+
+    # Response compression (gzip/br/zstd, negotiated via Accept-Encoding)
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes
+    COMPRESSION_CACHE_BYTES: int = 32 * 1024 * 1024  # precompressed bodies of versioned responses
+
+    # Admission control: token buckets per route prefix ([requests/second, burst]) and a global in-flight cap
+    RATE_LIMITS_ENABLED: bool = True
+    RATE_LIMITS: dict = {
+        "/submit-quiz": {"per_user": [1, 5], "total": [100, 200]},
+        "/quiz-history": {"per_user": [5, 20], "total": [500, 1000]},
+        "/search": {"per_user": [5, 20], "total": [300, 600]},
+    }
+    MAX_CONCURRENT_REQUESTS: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 0.05  # seconds a request may wait for a slot before a 503
+
+    # Quiz results partitioning: closed months move out of the hot tables and are rolled up
+    RESULTS_PARTITIONING_ENABLED: bool = True
+    RESULTS_HOT_MONTHS: int = 2  # the current month plus this many - 1 stay in quiz_results
+    RESULTS_RETENTION_MONTHS: int = 24  # raw rows of older months are dropped (0 keeps them forever)
+    RESULTS_MAINTENANCE_INTERVAL: int = 3600  # seconds between archive/retention runs
+
+    # Outbox: derived data (user totals, achievements) is updated by a background dispatcher
+    OUTBOX_BATCH_SIZE: int = 500  # events per consumer transaction
+    OUTBOX_BATCH_DELAY: float = 0.05  # seconds to let events accumulate after a wakeup (bounds added lag)
+    OUTBOX_POLL_INTERVAL: float = 0.5  # seconds between polls when no commit has woken the dispatcher
+    OUTBOX_MAX_ATTEMPTS: int = 5  # failures before a batch is split, or an event is dead-lettered
+    OUTBOX_RETRY_BACKOFF: float = 0.5  # seconds, doubled after each failed attempt
+    OUTBOX_RETENTION: int = 3600  # seconds delivered events are kept for inspection
+
+    # Background jobs (bulk exports, rebuilds of derived data) run in worker processes, see jobs.py
+    JOB_WORKERS: int = 1  # jobs running at once
+    JOB_ARTIFACT_DIR: str = "job_artifacts"
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between queue polls when no submission has woken the runner
+    JOB_STALE_AFTER: int = 120  # seconds without a heartbeat before a running job is requeued
+    JOB_MAX_ATTEMPTS: int = 3  # failed runs before a job is marked failed
+    JOB_RETENTION: int = 7 * 86400  # seconds finished jobs and their artifacts are kept
+    JOB_NICENESS: int = 10  # jobs run at lower CPU priority than request handling
+    JOB_EXPORT_CHUNK: int = 200  # quizzes exported between checkpoints
+    JOB_REBUILD_USER_CHUNK: int = 5000  # users whose achievements are rebuilt between checkpoints
+    EXPORT_SYNC_MAX_QUIZZES: int = 100  # larger /export-multiple-quizzes requests are turned into a job
+
+    # Answer similarity scans (answer_similarity.py): a pair of attempts is flagged when copying explains its
+    # shared answers at least 2^SIMILARITY_MARGIN_BITS times better than chance, after allowing for the
+    # number of pairs compared. A copier is assumed to take SIMILARITY_COPY_RATE of the answers;
+    # SIMILARITY_WRONG_WEIGHT > 1 counts shared wrong answers for more than their rarity alone
+    SIMILARITY_MARGIN_BITS: float = 2.0
+    SIMILARITY_COPY_RATE: float = 0.5
+    SIMILARITY_WRONG_WEIGHT: float = 1.0
+    SIMILARITY_MAX_PAIRS: int = 500  # most similar pairs kept in a report
+
+    # Quiz ratings: quizzes are ranked by a Bayesian average that starts at the prior mean and
+    # moves towards the quiz's own mean as ratings arrive (the prior counts as this many ratings)
+    RATING_PRIOR_MEAN: float = 3.0
+    RATING_PRIOR_WEIGHT: int = 5
+    RATING_REVIEW_MAX_LENGTH: int = 500
+
+    # Question banks
+    BANK_EXCLUDE_LAST_ATTEMPTS: int = 5  # questions from a user's last N draws are not repeated when avoidable
+    BANK_MAX_DRAW: int = 200
+    BANK_INDEX_CACHE_SIZE: int = 32  # banks whose sampling index is kept in memory
+
+    # User dashboards (GET /users/{name}/dashboard): bodies are cached per user until the user's totals or
+    # achievement counters change; rank and recommendations also depend on other users, so entries expire
+    DASHBOARD_CACHE_SIZE: int = 10000  # users whose dashboards are kept in memory
+    DASHBOARD_CACHE_TTL: float = 30.0  # seconds
+    DASHBOARD_HISTORY_LIMIT: int = 20  # history rows per page by default
+    DASHBOARD_RECOMMENDATIONS: int = 6
+    DASHBOARD_RECENT_RESULTS: int = 50  # recent results whose categories steer recommendations
+
+    # Near-duplicate questions (dedupe.py): new questions whose shingle sets overlap a stored question's
+    # by at least this Jaccard similarity are marked as its duplicates, and banks take one per cluster
+    DEDUPE_ENABLED: bool = True
+    DEDUPE_THRESHOLD: float = 0.8
+
+    # Profiling: requests sending "X-Profile: 1" (or a random sample) write folded stacks to PROFILE_DIR
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: int = 5
+
     class Config:
         env_file = ".env"
 
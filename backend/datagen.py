@@ -0,0 +1,253 @@
+"""
+Synthetic dataset generator for QuizMaster load and scale testing.
+
+Bulk-loads users, quizzes, questions (with options) and quiz results with
+skewed, realistic distributions: a few very popular quizzes, a long tail of
+occasional users, difficulty-dependent scores and daily activity cycles.
+Rows are written with executemany inserts in large batches, so millions of
+rows load in minutes.
+
+    python datagen.py --users 100000 --quizzes 20000 --results 2000000
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import achievements
+from app import (
+    Base, Question, QuestionOption, Quiz, QuizResult, QuizVersion, QuizVersionQuestion, ResultAnswer, User, engine,
+)
+from config import settings
+from security import hash_password
+
+CATEGORIES = {
+    "Programming": 30, "Mathematics": 18, "Science": 15, "Data Science": 12,
+    "History": 10, "Geography": 7, "Languages": 5, "Music": 3,
+}
+DIFFICULTIES = {"Easy": 45, "Medium": 35, "Hard": 20}
+# Mean fraction of questions answered correctly per difficulty
+DIFFICULTY_SKILL = {"Easy": 0.8, "Medium": 0.65, "Hard": 0.45}
+TIME_LIMITS = [300, 600, 900, 1200]
+WORDS = (
+    "python data model function loop array graph theory history empire river "
+    "capital ocean planet energy cell atom algebra vector matrix language verb "
+    "melody rhythm network protocol memory cache index query sort search tree"
+).split()
+
+
+def weighted_picker(rng, weights):
+    values = list(weights)
+    cumulative = list(itertools.accumulate(weights[v] for v in values))
+    total = cumulative[-1]
+    return lambda: values[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def zipf_picker(rng, n, s=1.1):
+    """Pick 0..n-1 with Zipf-like popularity (rank r has weight 1 / r**s)"""
+    cumulative = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+    total = cumulative[-1]
+    return lambda: min(bisect.bisect(cumulative, rng.random() * total), n - 1)
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def next_id(conn, table):
+    return (conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar() or 0) + 1
+
+
+def insert_batches(conn, table, rows, batch_size):
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def generate(users, quizzes, results, seed=42, days=365, batch_size=10000, with_answers=True):
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    timings = {}
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(text("PRAGMA synchronous=OFF"))
+
+        first_user = next_id(conn, "users")
+        first_quiz = next_id(conn, "quizzes")
+        first_version = next_id(conn, "quiz_versions")
+        first_question = next_id(conn, "questions")
+        first_option = next_id(conn, "question_options")
+        first_result = next_id(conn, "quiz_results")
+        now = datetime.utcnow()
+
+        # Every synthetic user signs in with "password"; one hash keeps the load fast
+        password_hash = hash_password("password", settings.SCRYPT_LOG_N, settings.SCRYPT_R, settings.SCRYPT_P)
+        start = time.perf_counter()
+        insert_batches(conn, User.__table__, (
+            {"id": first_user + i, "username": f"user{first_user + i}", "email": f"user{first_user + i}@example.com",
+             "password": password_hash, "created_at": now - timedelta(days=rng.uniform(0, days)),
+             "total_score": 0, "quizzes_taken": 0}
+            for i in range(users)
+        ), batch_size)
+        timings["users"] = time.perf_counter() - start
+
+        # Quizzes and their questions: question counts are log-normal, 3..60 per quiz
+        pick_category = weighted_picker(rng, CATEGORIES)
+        pick_difficulty = weighted_picker(rng, DIFFICULTIES)
+        quiz_meta = []  # (quiz_id, difficulty, time_limit, [(question_id, options, option_ids, correct, points)])
+        quiz_rows, version_rows, version_question_rows, question_rows, option_rows = [], [], [], [], []
+        question_id = first_question
+        option_id = first_option
+        for i in range(quizzes):
+            quiz_id, version_id = first_quiz + i, first_version + i
+            category, difficulty = pick_category(), pick_difficulty()
+            time_limit = rng.choice(TIME_LIMITS)
+            quiz_rows.append({
+                "id": quiz_id, "title": f"{category}: {sentence(rng, 3).title()}",
+                "description": sentence(rng, rng.randint(6, 20)), "category": category,
+                "difficulty": difficulty, "time_limit": time_limit, "created_by": f"user{first_user + rng.randrange(users)}" if users else None,
+                "created_at": now - timedelta(days=rng.uniform(0, days)), "version": 1, "updated_at": now,
+                "current_version_id": version_id,
+            })
+            version_rows.append({
+                key: quiz_rows[-1][key] for key in ("title", "description", "category", "difficulty", "time_limit")
+            })
+            version_rows[-1].update(id=version_id, quiz_id=quiz_id, version=1, created_at=quiz_rows[-1]["created_at"])
+            questions = []
+            for order in range(1, max(3, min(60, int(rng.lognormvariate(2.5, 0.5)))) + 1):
+                options = [sentence(rng, rng.randint(1, 4)) for _ in range(4)]
+                correct = options[rng.randrange(4)]
+                points = rng.choice((1, 1, 1, 2, 3))
+                question_rows.append({
+                    "id": question_id, "quiz_id": quiz_id, "question_text": sentence(rng, rng.randint(6, 15)) + "?",
+                    "question_type": "multiple_choice", "correct_answer": correct,
+                    "points": points, "order": order,
+                })
+                version_question_rows.append({"version_id": version_id, "question_id": question_id, "position": order})
+                option_ids = list(range(option_id, option_id + len(options)))
+                option_rows.extend(
+                    {"id": option_ids[position], "question_id": question_id, "position": position, "text": option}
+                    for position, option in enumerate(options)
+                )
+                questions.append((question_id, options, option_ids, correct, points))
+                question_id += 1
+                option_id += len(options)
+            version_rows[-1]["question_count"] = len(questions)
+            quiz_meta.append((quiz_id, version_id, difficulty, time_limit, questions))
+
+        start = time.perf_counter()
+        insert_batches(conn, Quiz.__table__, quiz_rows, batch_size)
+        insert_batches(conn, Question.__table__, question_rows, batch_size)
+        insert_batches(conn, QuestionOption.__table__, option_rows, batch_size)
+        insert_batches(conn, QuizVersion.__table__, version_rows, batch_size)
+        insert_batches(conn, QuizVersionQuestion.__table__, version_question_rows, batch_size)
+        timings["quizzes"] = time.perf_counter() - start
+        question_count = len(question_rows)
+        del quiz_rows, version_rows, version_question_rows, question_rows, option_rows
+
+        # Results: Zipf quiz popularity and user activity; completions cluster in the afternoon/evening
+        if users and quizzes and results:
+            pick_quiz = zipf_picker(rng, quizzes)
+            pick_user = zipf_picker(rng, users, s=0.8)
+            user_order = list(range(users))
+            rng.shuffle(user_order)
+            user_skill = [rng.gauss(0, 0.12) for _ in range(users)]
+
+            answer_batch = []
+
+            def result_rows():
+                for i in range(results):
+                    result_id = first_result + i
+                    quiz_id, version_id, difficulty, time_limit, questions = quiz_meta[pick_quiz()]
+                    user_index = user_order[pick_user()]
+                    p_correct = min(0.98, max(0.05, DIFFICULTY_SKILL[difficulty] + user_skill[user_index]))
+                    correct_count = 0
+                    for qid, options, option_ids, correct, points in questions:
+                        if rng.random() < p_correct:
+                            choice = options.index(correct)
+                        else:
+                            choice = rng.randrange(len(options))
+                        is_correct = options[choice] == correct
+                        correct_count += is_correct
+                        if with_answers:
+                            answer_batch.append({
+                                "result_id": result_id, "question_id": qid, "option_id": option_ids[choice],
+                                "answer_hash": None, "is_correct": is_correct, "points": points if is_correct else 0,
+                            })
+                    day = now - timedelta(days=days * (1 - math.sqrt(rng.random())))
+                    completed_at = day.replace(hour=min(23, max(0, int(rng.gauss(17, 4)))),
+                                               minute=rng.randrange(60), second=rng.randrange(60))
+                    yield {
+                        "id": result_id, "user_id": first_user + user_index, "quiz_id": quiz_id, "quiz_version_id": version_id,
+                        "score": round(correct_count * 100 / len(questions)),
+                        "total_questions": len(questions),
+                        "time_taken": int(time_limit * min(1.0, max(0.1, rng.betavariate(2, 3)))),
+                        "completed_at": completed_at,
+                    }
+
+            def flushing_answers(rows):
+                # Answer rows pile up as results are generated; write them after each batch of their results
+                for n, row in enumerate(rows, 1):
+                    yield row
+                    if n % batch_size == 0:
+                        insert_batches(conn, ResultAnswer.__table__, answer_batch, batch_size)
+                        answer_batch.clear()
+
+            start = time.perf_counter()
+            insert_batches(conn, QuizResult.__table__, flushing_answers(result_rows()), batch_size)
+            insert_batches(conn, ResultAnswer.__table__, answer_batch, batch_size)
+            conn.execute(text(
+                "UPDATE users SET "
+                "total_score = COALESCE((SELECT SUM(score) FROM quiz_results r WHERE r.user_id = users.id), 0), "
+                "quizzes_taken = (SELECT COUNT(*) FROM quiz_results r WHERE r.user_id = users.id) "
+                "WHERE id >= :first"
+            ), {"first": first_user})
+            timings["results"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        achievements.rebuild(conn, first_user)
+        timings["achievements"] = time.perf_counter() - start
+
+        # The bulk inserts bypass the change log, so clients that synced before them need a full snapshot
+        conn.execute(text("UPDATE catalog_version SET version = version + 1, changes_floor = version + 1"))
+
+    return {"users": users, "quizzes": quizzes, "questions": question_count, "results": results,
+            "seconds": {k: round(v, 2) for k, v in timings.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic QuizMaster data")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--results", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365, help="spread results over this many past days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--no-answers", action="store_true", help="skip per-question result_answers rows")
+    args = parser.parse_args()
+
+    summary = generate(args.users, args.quizzes, args.results, seed=args.seed, days=args.days,
+                       batch_size=args.batch_size, with_answers=not args.no_answers)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
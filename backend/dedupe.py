@@ -0,0 +1,265 @@
+"""
+Near-duplicate question detection for QuizMaster (MinHash + LSH).
+
+A question is reduced to a set of shingles: word bigrams of its
+normalized text (case, accents and punctuation dropped) plus one shingle
+per normalized option, so reordered options or changed punctuation do
+not make a copy look new. Its MinHash signature holds, for NUM_PERM
+random hash permutations, the smallest hashed shingle; two signatures
+agree in about the fraction of positions equal to the Jaccard similarity
+of the shingle sets. Signatures are cut into BANDS bands of ROWS values
+and questions sharing any band are candidates: pairs at 0.8 similarity
+share one with probability ~0.998, pairs at 0.5 with ~0.65 and unrelated
+questions almost never, so each question is compared with a handful of
+others instead of the whole bank.
+
+The index is the ``question_lsh_buckets`` table, one row per band of each
+canonical question (one that is not marked as a duplicate). New questions
+are looked up and added as they are created (``app.flag_near_duplicates``);
+``python dedupe.py`` recomputes the clusters and the index for the whole
+database in bulk, and should be run once on databases from before the index.
+
+    python dedupe.py [--threshold 0.8] [--batch 20000] [--prune-banks]
+"""
+
+import re
+import time
+import unicodedata
+import zlib
+from typing import Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from sqlalchemy import bindparam, text
+
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+WRITE_BATCH = 50000
+VERIFY_BATCH = 200000
+
+# Permutations h(x) = (a * x + b) mod p over 32-bit shingle hashes. The seed is fixed: signatures
+# stored by one process are compared with those computed by another.
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+# Odd multipliers mixing a band's ROWS values into one key, and a salt per band so that equal
+# values in different bands do not share a bucket
+_BAND_MIX = _rng.integers(1, 1 << 63, ROWS, dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.integers(0, 1 << 63, BANDS, dtype=np.uint64)
+del _rng
+
+_WORD = re.compile(r"\w+")
+_OPTION = "\x1f"  # marks option shingles, so an option never matches a bigram of the text
+
+
+def words(value) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", str(value or "")).casefold()
+    return _WORD.findall("".join(ch for ch in decomposed if not unicodedata.combining(ch)).replace("_", " "))
+
+
+def shingles(question_text: str, options: Optional[Sequence[str]]) -> Set[str]:
+    tokens = words(question_text)
+    found = {f"{a} {b}" for a, b in zip(tokens, tokens[1:])} or set(tokens)
+    found.update(_OPTION + " ".join(words(option)) for option in options or ())
+    return found
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+
+def hash_shingles(found: Set[str]) -> np.ndarray:
+    return np.fromiter((zlib.crc32(s.encode()) for s in found or ("",)), dtype=np.uint64)
+
+
+def signatures(hashed: Sequence[np.ndarray]) -> np.ndarray:
+    """MinHash signatures (len(hashed) x NUM_PERM, uint32) of non-empty arrays of shingle hashes"""
+    values = np.concatenate(hashed)
+    starts = np.zeros(len(hashed), dtype=np.int64)
+    np.cumsum([len(h) for h in hashed[:-1]], out=starts[1:])
+    out = np.empty((len(hashed), NUM_PERM), dtype=np.uint32)
+    for p in range(NUM_PERM):
+        out[:, p] = np.minimum.reduceat((_A[p] * values + _B[p]) % _PRIME, starts)
+    return out
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """One 63-bit bucket key per band (len(sigs) x BANDS, int64)"""
+    rows = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        mixed = (rows * _BAND_MIX).sum(axis=2, dtype=np.uint64) ^ _BAND_SALT
+    return (mixed >> np.uint64(1)).astype(np.int64)
+
+
+def question_keys(question_text: str, options: Optional[Sequence[str]]) -> np.ndarray:
+    return band_keys(signatures([hash_shingles(shingles(question_text, options))]))[0]
+
+
+def _cluster_roots(size: int, edges: Iterable[tuple]) -> np.ndarray:
+    """Union-find over row indexes; each row's root is the smallest row (the oldest question) of its cluster"""
+    parent = list(range(size))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in edges:
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    roots = np.array(parent, dtype=np.int64)
+    while True:  # pointer jumping, so every row points at its root directly
+        jumped = roots[roots]
+        if np.array_equal(jumped, roots):
+            return roots
+        roots = jumped
+
+
+def _read_questions(engine, batch_size: int) -> Iterable[tuple]:
+    """(ids, signatures) per batch of questions, in id order, with their options merged in"""
+    with engine.connect() as qconn, engine.connect() as oconn:
+        questions = qconn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            text("SELECT id, question_text FROM questions ORDER BY id"))
+        options = oconn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            text("SELECT question_id, text FROM question_options ORDER BY question_id, position"))
+        pending = next(options, None)
+        ids, hashed = [], []
+        for question_id, question_text in questions:
+            question_options = []
+            while pending is not None and pending[0] <= question_id:
+                if pending[0] == question_id:
+                    question_options.append(pending[1])
+                pending = next(options, None)
+            ids.append(question_id)
+            hashed.append(hash_shingles(shingles(question_text, question_options)))
+            if len(ids) == batch_size:
+                yield np.array(ids, dtype=np.int64), signatures(hashed)
+                ids, hashed = [], []
+        if ids:
+            yield np.array(ids, dtype=np.int64), signatures(hashed)
+
+
+def candidate_pairs(keys: np.ndarray) -> np.ndarray:
+    """(i, j) row pairs sharing a bucket, i < j, each pair once. A bucket's members are paired with its first
+    member only, so a bucket of n questions costs n - 1 comparisons rather than n^2 / 2; duplicates in it
+    that differ from the first member usually share another band with each other."""
+    n = len(keys)
+    flat = keys.ravel()
+    rows = np.repeat(np.arange(n, dtype=np.int64), BANDS)
+    order = np.lexsort((rows, flat))
+    flat, rows = flat[order], rows[order]
+    starts = np.ones(len(flat), dtype=bool)
+    starts[1:] = flat[1:] != flat[:-1]
+    first = rows[np.maximum.accumulate(np.where(starts, np.arange(len(flat)), 0))]
+    pairs = np.stack([first[~starts], rows[~starts]], axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+
+def run(engine, threshold: float = 0.8, batch_size: int = 20000, prune_banks: bool = False) -> dict:
+    """Recompute near-duplicate clusters for every question and rebuild the LSH index.
+
+    The oldest question of a cluster is canonical; the others get ``duplicate_of`` pointing at it.
+    With ``prune_banks``, banks keep only one question of each cluster.
+    """
+    started = time.perf_counter()
+    id_parts, sig_parts = [], []
+    for ids, sigs in _read_questions(engine, batch_size):
+        id_parts.append(ids)
+        sig_parts.append(sigs)
+    if not id_parts:
+        return {"questions": 0, "candidate_pairs": 0, "duplicates": 0, "clusters": 0, "bank_items_removed": 0}
+    ids, sigs = np.concatenate(id_parts), np.concatenate(sig_parts)
+    del id_parts, sig_parts
+    keys = band_keys(sigs)
+    loaded = time.perf_counter()
+
+    pairs = candidate_pairs(keys)
+    verified = []
+    for start in range(0, len(pairs), VERIFY_BATCH):
+        chunk = pairs[start:start + VERIFY_BATCH]
+        agreement = (sigs[chunk[:, 0]] == sigs[chunk[:, 1]]).mean(axis=1)
+        verified.extend(chunk[agreement >= threshold].tolist())
+    roots = _cluster_roots(len(ids), verified)
+    duplicates = np.flatnonzero(roots != np.arange(len(ids)))
+    canonical = np.flatnonzero(roots == np.arange(len(ids)))
+    clustered = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE questions SET duplicate_of = NULL WHERE duplicate_of IS NOT NULL"))
+        update = text("UPDATE questions SET duplicate_of = :canonical WHERE id = :id")
+        for start in range(0, len(duplicates), WRITE_BATCH):
+            rows = duplicates[start:start + WRITE_BATCH]
+            conn.execute(update, [{"id": i, "canonical": c}
+                                  for i, c in zip(ids[rows].tolist(), ids[roots[rows]].tolist())])
+        conn.execute(text("DELETE FROM question_lsh_buckets"))
+        # Millions of rows: sorted by bucket, so the primary key index is appended to rather than updated
+        # at random pages, and handed as tuples straight to the DB-API's executemany, skipping SQLAlchemy's
+        # per-row parameter processing
+        buckets = keys[canonical].ravel()
+        owners = np.repeat(ids[canonical], BANDS)
+        order = np.lexsort((owners, buckets))
+        rows = np.stack([buckets[order], owners[order]], axis=1)
+        rows = rows[np.concatenate([[True], (rows[1:] != rows[:-1]).any(axis=1)])]  # a question repeating a key
+        del buckets, owners, order
+        marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+        insert = f"INSERT INTO question_lsh_buckets (bucket, question_id) VALUES ({marker}, {marker})"
+        for start in range(0, len(rows), WRITE_BATCH):
+            conn.exec_driver_sql(insert, list(map(tuple, rows[start:start + WRITE_BATCH].tolist())))
+        removed = prune_bank_duplicates(conn) if prune_banks else 0
+    return {
+        "questions": len(ids),
+        "candidate_pairs": len(pairs),
+        "duplicates": len(duplicates),
+        "clusters": len(np.unique(roots[duplicates])),
+        "bank_items_removed": removed,
+        "seconds": {"signatures": round(loaded - started, 2), "clustering": round(clustered - loaded, 2),
+                    "writing": round(time.perf_counter() - clustered, 2)},
+    }
+
+
+def prune_bank_duplicates(conn) -> int:
+    """Keep one question of each near-duplicate cluster per bank (the one added first)"""
+    doomed = conn.execute(text("""
+        SELECT id, bank_id FROM (
+            SELECT i.id, i.bank_id, ROW_NUMBER() OVER (
+                PARTITION BY i.bank_id, COALESCE(q.duplicate_of, q.id) ORDER BY i.id
+            ) AS n
+            FROM question_bank_items i JOIN questions q ON q.id = i.question_id
+        ) ranked WHERE n > 1
+    """)).all()
+    for start in range(0, len(doomed), WRITE_BATCH):
+        conn.execute(text("DELETE FROM question_bank_items WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)), {"ids": [item_id for item_id, _ in doomed[start:start + WRITE_BATCH]]})
+    banks = sorted({bank_id for _, bank_id in doomed})
+    if banks:
+        conn.execute(text("UPDATE question_banks SET version = version + 1 WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)), {"ids": banks})
+    return len(doomed)
+
+
+def main():
+    import argparse
+    import json
+
+    from app import Base, engine
+    from config import settings
+    from migrations import add_missing_columns
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions and rebuild the LSH index")
+    parser.add_argument("--threshold", type=float, default=settings.DEDUPE_THRESHOLD,
+                        help="estimated Jaccard similarity above which questions are duplicates")
+    parser.add_argument("--batch", type=int, default=20000, help="questions read and hashed per batch")
+    parser.add_argument("--prune-banks", action="store_true", help="remove all but one question per cluster from banks")
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine, "questions", {"duplicate_of": "INTEGER"})
+    print(json.dumps(run(engine, args.threshold, args.batch, args.prune_banks), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Grading of submitted answers into ``result_answers`` rows.
+
+Each answered question becomes one compact row: the chosen option's id
+when the answer matches one of the question's options, otherwise a 32-bit
+hash of the answer text, plus whether it was correct and the points it
+earned. Shared by quiz submission, the backfill migration and the
+synthetic data generator.
+"""
+
+import json
+import zlib
+from typing import Dict, List, Mapping, Tuple
+
+
+def answer_hash(answer: str) -> int:
+    """Stable signed 32-bit hash of an answer's text (fits an INTEGER column everywhere)"""
+    value = zlib.crc32(answer.encode("utf-8"))
+    return value - 2 ** 32 if value >= 2 ** 31 else value
+
+
+def parse_answers(raw) -> Dict[int, str]:
+    """``{question_id: answer}`` from a legacy ``quiz_results.answers`` JSON blob; unusable entries are dropped"""
+    try:
+        answers = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+    parsed = {}
+    for key, answer in answers.items():
+        try:
+            parsed[int(key)] = str(answer)
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+def grade(result_id: int, answers: Mapping[int, str], questions: Mapping[int, Tuple[str, int]],
+          options: Mapping[Tuple[int, str], int]) -> List[dict]:
+    """Rows for ``result_answers``.
+
+    ``questions`` maps question id to (correct answer, points) and ``options`` maps
+    (question id, option text) to the option's id. Answers to unknown questions are skipped.
+    """
+    rows = []
+    for question_id, answer in answers.items():
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        correct_answer, points = question
+        option_id = options.get((question_id, answer))
+        is_correct = answer == correct_answer
+        rows.append({
+            "result_id": result_id,
+            "question_id": question_id,
+            "option_id": option_id,
+            "answer_hash": None if option_id is not None else answer_hash(answer),
+            "is_correct": is_correct,
+            "points": (points or 1) if is_correct else 0,
+        })
+    return rows
@@ -0,0 +1,231 @@
+"""
+HTTP conditional request support (ETag / Last-Modified) for QuizMaster.
+
+Versions are persisted in the database and mirrored in an in-process
+registry, so a matching ``If-None-Match`` can be answered with 304 before a
+session ever touches the database or the payload is serialized.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+
+class Validators:
+    """ETag, Last-Modified and Cache-Control for one representation"""
+
+    __slots__ = ("etag", "last_modified", "cache_control")
+
+    def __init__(self, etag: str, last_modified: Optional[datetime], cache_control: str):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = http_date(self.last_modified)
+        return headers
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, validators: Optional[Validators]) -> Optional[Response]:
+    """Return a 304 response when the client's cached copy is still current"""
+    if validators is None:
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, validators.etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or validators.last_modified is None:
+            return None
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        modified = validators.last_modified
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        fresh = modified.replace(microsecond=0) <= since
+    if not fresh:
+        return None
+    return Response(status_code=304, headers=validators.headers())
+
+
+class VersionRegistry:
+    """In-memory mirror of the catalog version and per-quiz versions.
+
+    The database is the source of truth; this registry is updated after each
+    commit that bumps a version and learns quiz versions lazily as quizzes are
+    read. Each worker process keeps its own copy, so commits made by other
+    workers or scripts only reach it through ``catch_up``; since every quiz
+    change bumps the catalog version, advancing past versions this worker did
+    not commit drops the quiz versions it had learned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.catalog_version: Optional[int] = None
+        self.catalog_modified: Optional[datetime] = None
+        self._quizzes: Dict[int, tuple] = {}
+
+    def set_catalog(self, version: int, modified: Optional[datetime]):
+        with self._lock:
+            if self.catalog_version is None or version >= self.catalog_version:
+                if self.catalog_version is not None and version > self.catalog_version + 1:
+                    self._quizzes.clear()  # the versions in between were committed elsewhere
+                self.catalog_version = version
+                self.catalog_modified = modified
+
+    def catch_up(self, version: int, modified: Optional[datetime]):
+        """Advance to a catalog version read from the database, which may include other processes' changes"""
+        with self._lock:
+            if self.catalog_version is None or version > self.catalog_version:
+                self.catalog_version = version
+                self.catalog_modified = modified
+                self._quizzes.clear()
+
+    def set_quiz(self, quiz_id: int, version: int, modified: Optional[datetime]):
+        with self._lock:
+            current = self._quizzes.get(quiz_id)
+            if current is None or version >= current[0]:
+                self._quizzes[quiz_id] = (version, modified)
+
+    def forget_quiz(self, quiz_id: int):
+        with self._lock:
+            self._quizzes.pop(quiz_id, None)
+
+    def catalog_validators(self, name: str, cache_control: str) -> Optional[Validators]:
+        if self.catalog_version is None:
+            return None
+        return Validators(f'"{name}-c{self.catalog_version}"', self.catalog_modified, cache_control)
+
+    def quiz_validators(self, quiz_id: int, cache_control: str) -> Optional[Validators]:
+        entry = self._quizzes.get(quiz_id)
+        if entry is None:
+            return None
+        return quiz_validators(quiz_id, entry[0], entry[1], cache_control)
+
+
+def quiz_validators(quiz_id: int, version: int, modified: Optional[datetime], cache_control: str) -> Validators:
+    return Validators(f'"quiz{quiz_id}-v{version}"', modified, cache_control)
+
+
+class SnapshotCache:
+    """LRU of values derived from immutable quiz versions, keyed by version id.
+
+    A version never changes, so entries are only ever evicted for space, never invalidated.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version_id: int):
+        with self._lock:
+            value = self._entries.get(version_id)
+            if value is not None:
+                self._entries.move_to_end(version_id)
+            return value
+
+    def put(self, version_id: int, value):
+        with self._lock:
+            self._entries[version_id] = value
+            self._entries.move_to_end(version_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class StampedCache:
+    """LRU of rendered bodies per owner (e.g. a user), valid while the owner's stamp is unchanged.
+
+    The stamp is whatever the caller reads cheaply and every relevant write changes (counters, totals),
+    so a write made by another process invalidates the entry too. ``invalidate`` additionally bumps a
+    local generation that is part of the stamp: a body computed before the invalidation is never stored
+    over it. Entries also expire after ``ttl`` seconds for data that depends on other owners.
+
+    Generations come from one cache-wide clock and live in the owners' LRU entries, so they are evicted
+    with them. Owners without an entry get the highest generation evicted so far, which is above any
+    generation a stamp taken before the eviction can carry.
+    """
+
+    def __init__(self, max_owners: int = 10000, ttl: float = 30.0):
+        self.max_owners = max_owners
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()  # owner -> (stamp, expires, {variant: body})
+        self._clock = 0  # last generation handed out by ``invalidate``
+        self._floor = 0  # generation of owners without an entry
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _generation(self, owner) -> int:
+        entry = self._entries.get(owner)
+        return entry[0][0] if entry is not None else self._floor
+
+    def stamp(self, owner, *parts) -> tuple:
+        with self._lock:
+            return (self._generation(owner),) + parts
+
+    def get(self, owner, stamp: tuple, variant):
+        with self._lock:
+            entry = self._entries.get(owner)
+            if entry is None or entry[0] != stamp or entry[1] < time.monotonic():
+                return None
+            self._entries.move_to_end(owner)
+            body = entry[2].get(variant)
+            self.hits += body is not None
+            return body
+
+    def put(self, owner, stamp: tuple, variant, body):
+        with self._lock:
+            if stamp[0] != self._generation(owner):
+                return
+            entry = self._entries.get(owner)
+            if entry is None or entry[0] != stamp or entry[1] < time.monotonic():
+                entry = (stamp, time.monotonic() + self.ttl, {})
+                self._entries[owner] = entry
+            entry[2][variant] = body
+            self._entries.move_to_end(owner)
+            self._evict()
+
+    def invalidate(self, owner):
+        with self._lock:
+            self._clock += 1
+            # An empty entry that only carries the new generation; no caller's stamp equals it
+            self._entries[owner] = ((self._clock,), 0.0, {})
+            self._entries.move_to_end(owner)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_owners:
+            _, (stamp, _, _) = self._entries.popitem(last=False)
+            self._floor = max(self._floor, stamp[0])
@@ -0,0 +1,268 @@
+"""
+Item response theory calibration for QuizMaster.
+
+Fits a two-parameter logistic (2PL) model to every graded answer in
+``result_answers`` and its retained monthly partitions:
+
+    P(user i answers question j correctly) = 1 / (1 + exp(-a_j * (theta_i - b_j)))
+
+where ``theta`` is user ability, ``b`` question difficulty and ``a``
+discrimination. Responses are held as a sparse user x question matrix in
+coordinate form (three flat arrays), and the fit alternates vectorized
+Newton steps on abilities and on question parameters; every gradient and
+curvature sum is one ``np.bincount`` over the responses, so an iteration is
+O(responses). Weak normal priors keep estimates finite for users or
+questions with all-correct or all-wrong answers (MAP estimation).
+
+Previous results are used as starting values (warm start), so refits after
+new results arrive converge in a few iterations. Results are written to
+``question_calibration`` and ``user_abilities`` for the API to serve.
+
+    python irt.py [--cold] [--max-iter 50] [--tol 1e-6]
+"""
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from sqlalchemy import func
+
+from app import Base, CalibrationRun, QuestionCalibration, QuizResult, SessionLocal, UserAbility, engine
+from migrations import migrate_result_answers
+from partitions import answers_table, archived_months, results_table
+
+# Prior standard deviations for ability, difficulty and log-discrimination
+THETA_PRIOR_SD = 1.0
+DIFFICULTY_PRIOR_SD = 2.0
+LOG_DISCRIMINATION_PRIOR_SD = 0.5
+MAX_STEP = 1.0  # largest Newton step per iteration, in logits
+LOAD_BATCH = 20000
+WRITE_BATCH = 10000
+
+
+@dataclass
+class Responses:
+    """Sparse user x question response matrix in coordinate form"""
+    user_index: np.ndarray  # int32, row of each response
+    item_index: np.ndarray  # int32, column of each response
+    correct: np.ndarray  # float64, 1.0 or 0.0
+    user_ids: np.ndarray  # row -> users.id
+    question_ids: np.ndarray  # column -> questions.id
+    last_result_id: int = 0
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    @property
+    def n_items(self):
+        return len(self.question_ids)
+
+
+@dataclass
+class Calibration:
+    ability: np.ndarray
+    ability_se: np.ndarray
+    difficulty: np.ndarray
+    discrimination: np.ndarray
+    iterations: int
+    log_likelihood: float
+
+
+def _sigmoid(z):
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def _log_likelihood(p, y):
+    return float(np.log(np.clip(np.where(y > 0, p, 1.0 - p), 1e-300, None)).sum())
+
+
+def _newton_step(gradient, curvature):
+    return np.clip(gradient / curvature, -MAX_STEP, MAX_STEP)
+
+
+def fit_2pl(responses: Responses, ability: Optional[np.ndarray] = None, difficulty: Optional[np.ndarray] = None,
+            discrimination: Optional[np.ndarray] = None, max_iter: int = 50, tol: float = 1e-6) -> Calibration:
+    """Joint MAP fit of abilities and question parameters by alternating diagonal Newton steps.
+
+    Stops when the log-likelihood improves by less than ``tol`` (relative) in an iteration.
+    """
+    u, j, y = responses.user_index, responses.item_index, responses.correct
+    n_users, n_items = responses.n_users, responses.n_items
+    theta = np.zeros(n_users) if ability is None else ability.astype(np.float64, copy=True)
+    b = np.zeros(n_items) if difficulty is None else difficulty.astype(np.float64, copy=True)
+    log_a = np.zeros(n_items) if discrimination is None else np.log(np.maximum(discrimination, 1e-3))
+
+    iterations = 0
+    previous = None
+    for iterations in range(1, max_iter + 1):
+        # Abilities, with question parameters fixed
+        a = np.exp(log_a)
+        a_r = a[j]
+        p = _sigmoid(a_r * (theta[u] - b[j]))
+        log_likelihood = _log_likelihood(p, y)
+        if previous is not None and abs(log_likelihood - previous) <= tol * abs(previous):
+            break
+        previous = log_likelihood
+        residual = y - p
+        info = p * (1.0 - p)
+        gradient = np.bincount(u, a_r * residual, n_users) - theta / THETA_PRIOR_SD ** 2
+        curvature = np.bincount(u, a_r * a_r * info, n_users) + 1.0 / THETA_PRIOR_SD ** 2
+        theta += _newton_step(gradient, curvature)
+
+        # Difficulty and discrimination, with the new abilities fixed
+        distance = theta[u] - b[j]
+        p = _sigmoid(a_r * distance)
+        residual = y - p
+        info = p * (1.0 - p)
+        gradient = -np.bincount(j, a_r * residual, n_items) - b / DIFFICULTY_PRIOR_SD ** 2
+        curvature = np.bincount(j, a_r * a_r * info, n_items) + 1.0 / DIFFICULTY_PRIOR_SD ** 2
+        b_step = _newton_step(gradient, curvature)
+        b += b_step
+
+        scaled = a_r * (distance - b_step[j])
+        p = _sigmoid(scaled)
+        gradient = np.bincount(j, scaled * (y - p), n_items) - log_a / LOG_DISCRIMINATION_PRIOR_SD ** 2
+        curvature = np.bincount(j, scaled * scaled * p * (1.0 - p), n_items) + 1.0 / LOG_DISCRIMINATION_PRIOR_SD ** 2
+        log_a += _newton_step(gradient, curvature)
+
+    a = np.exp(log_a)
+    a_r = a[j]
+    p = _sigmoid(a_r * (theta[u] - b[j]))
+    info = np.bincount(u, a_r * a_r * p * (1.0 - p), n_users) + 1.0 / THETA_PRIOR_SD ** 2
+    log_likelihood = _log_likelihood(p, y)
+    return Calibration(theta, 1.0 / np.sqrt(info), b, a, iterations, log_likelihood)
+
+
+def load_responses(db) -> Responses:
+    """Every graded answer, hot and in retained monthly partitions, as (user, question, correct) triples"""
+    tables = [("quiz_results", "result_answers")] + [
+        (results_table(key).name, answers_table(key).name) for key in archived_months(db.connection())
+    ]
+    # A plain DB-API cursor: ORM rows and type processing would cost more than the fit itself
+    cursor = db.connection().connection.cursor()
+    chunks = []
+    for results, answers in tables:
+        cursor.execute(
+            f"SELECT r.user_id, a.question_id, a.is_correct FROM {answers} a JOIN {results} r ON r.id = a.result_id"
+        )
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    cursor.close()
+    data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    last_id = db.query(func.max(QuizResult.id)).scalar() or 0
+
+    user_ids, user_index = np.unique(data[:, 0], return_inverse=True)
+    question_ids, item_index = np.unique(data[:, 1], return_inverse=True)
+    # Grouping responses by user keeps the ability gathers and sums cache-friendly
+    order = np.argsort(user_index, kind="stable")
+    return Responses(user_index[order].astype(np.int32), item_index[order].astype(np.int32),
+                     data[order, 2].astype(np.float64), user_ids, question_ids, last_id)
+
+
+def load_previous(db, responses: Responses):
+    """Stored parameters aligned to the response matrix; new users and questions start at the prior mean"""
+    ability = np.zeros(responses.n_users)
+    difficulty = np.zeros(responses.n_items)
+    discrimination = np.ones(responses.n_items)
+    user_rows = {row: i for i, row in enumerate(responses.user_ids.tolist())}
+    item_rows = {row: i for i, row in enumerate(responses.question_ids.tolist())}
+    for user_id, value in db.query(UserAbility.user_id, UserAbility.ability):
+        if user_id in user_rows:
+            ability[user_rows[user_id]] = value
+    for question_id, b, a in db.query(QuestionCalibration.question_id, QuestionCalibration.difficulty,
+                                      QuestionCalibration.discrimination):
+        if question_id in item_rows:
+            difficulty[item_rows[question_id]] = b
+            discrimination[item_rows[question_id]] = a
+    return ability, difficulty, discrimination
+
+
+def write_calibration(run_id: int, responses: Responses, calibration: Calibration):
+    now = datetime.utcnow()
+    user_counts = np.bincount(responses.user_index, minlength=responses.n_users)
+    item_counts = np.bincount(responses.item_index, minlength=responses.n_items)
+    item_correct = np.bincount(responses.item_index, responses.correct, responses.n_items)
+
+    def batches(rows):
+        for start in range(0, len(rows), WRITE_BATCH):
+            yield rows[start:start + WRITE_BATCH]
+
+    # Replace the whole calibration in one transaction so readers never see a mix of runs
+    with engine.begin() as conn:
+        conn.execute(UserAbility.__table__.delete())
+        conn.execute(QuestionCalibration.__table__.delete())
+        for chunk in batches(list(zip(responses.user_ids.tolist(), calibration.ability.tolist(),
+                                      calibration.ability_se.tolist(), user_counts.tolist()))):
+            conn.execute(UserAbility.__table__.insert(), [
+                {"user_id": user_id, "ability": ability, "standard_error": se, "responses": count,
+                 "run_id": run_id, "updated_at": now}
+                for user_id, ability, se, count in chunk
+            ])
+        for chunk in batches(list(zip(responses.question_ids.tolist(), calibration.difficulty.tolist(),
+                                      calibration.discrimination.tolist(), item_counts.tolist(),
+                                      item_correct.tolist()))):
+            conn.execute(QuestionCalibration.__table__.insert(), [
+                {"question_id": question_id, "difficulty": b, "discrimination": a, "responses": count,
+                 "p_correct": correct / count if count else None, "run_id": run_id, "updated_at": now}
+                for question_id, b, a, count, correct in chunk
+            ])
+
+
+def calibrate(warm_start: bool = True, max_iter: int = 50, tol: float = 1e-6):
+    Base.metadata.create_all(bind=engine)
+    migrate_result_answers(engine)  # answers stored as JSON by older releases
+    db = SessionLocal()
+    try:
+        run = CalibrationRun(started_at=datetime.utcnow(), warm_start=warm_start)
+        db.add(run)
+        db.commit()
+        timings = {}
+
+        start = time.perf_counter()
+        responses = load_responses(db)
+        timings["load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        initial = load_previous(db, responses) if warm_start else (None, None, None)
+        calibration = fit_2pl(responses, *initial, max_iter=max_iter, tol=tol)
+        timings["fit"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_calibration(run.id, responses, calibration)
+        timings["write"] = time.perf_counter() - start
+
+        run.finished_at = datetime.utcnow()
+        run.responses = len(responses.correct)
+        run.users = responses.n_users
+        run.questions = responses.n_items
+        run.iterations = calibration.iterations
+        run.log_likelihood = calibration.log_likelihood
+        run.last_result_id = responses.last_result_id
+        db.commit()
+        return {"run_id": run.id, "responses": run.responses, "users": run.users, "questions": run.questions,
+                "iterations": run.iterations, "log_likelihood": round(run.log_likelihood, 2),
+                "seconds": {k: round(v, 2) for k, v in timings.items()}}
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit 2PL IRT parameters from stored quiz answers")
+    parser.add_argument("--cold", action="store_true", help="ignore the previous calibration's estimates")
+    parser.add_argument("--max-iter", type=int, default=50)
+    parser.add_argument("--tol", type=float, default=1e-6, help="relative log-likelihood change to stop at")
+    args = parser.parse_args()
+    print(json.dumps(calibrate(warm_start=not args.cold, max_iter=args.max_iter, tol=args.tol), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Background jobs for QuizMaster.
+
+Work too heavy for a request (exporting thousands of quizzes, rebuilding
+derived data) is submitted as a row in ``jobs`` and run by a ``JobRunner``
+in a pool of worker processes, at most ``workers`` at a time, so it neither
+ties up a request worker nor competes with the event loop for the GIL.
+Handlers are registered with ``@runner.handler(kind)`` and receive a
+``JobContext``. They work in steps and call ``ctx.save`` after each one,
+recording progress and a checkpoint (pass the step's connection to commit
+both together). A job is retried from its last checkpoint when its handler
+fails, up to ``max_attempts`` failures, and when the process running it
+dies, so whatever a step did after the saved checkpoint must be safe to
+redo.
+
+On shutdown running jobs stop at their next checkpoint and go back to the
+queue. A job belongs to the server process that claimed it, which refreshes
+its heartbeat while it runs. On start a runner requeues jobs of dead processes
+on the same host; jobs whose heartbeat is older than ``stale_after`` are
+requeued by any runner. Each claim increments ``jobs.runs`` and every
+write from a handler is conditional on it, so a run that lost its job
+stops at its next checkpoint instead of racing the new one.
+"""
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobLost(Exception):
+    """The job was requeued and claimed by another run; the handler must stop"""
+
+
+class JobInterrupted(Exception):
+    """The server is shutting down; the job goes back to the queue at its last checkpoint"""
+
+
+_shutting_down = None  # multiprocessing.Event shared with the parent, in worker processes
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _init_worker(niceness: int, shutting_down):
+    global _shutting_down
+    _shutting_down = shutting_down
+    if niceness:
+        os.nice(niceness)
+
+
+def _execute(module: str, name: str, job_id: int, run: int):
+    """Worker process entry point: the runner (and its handlers) come from importing ``module``"""
+    runner = getattr(importlib.import_module(module), name)
+    runner.execute(job_id, run)
+
+
+class JobContext:
+    def __init__(self, runner: "JobRunner", job_id: int, run: int, params: dict, checkpoint: dict):
+        self.runner = runner
+        self.job_id = job_id
+        self.run = run
+        self.params = params
+        self.checkpoint = checkpoint
+
+    @property
+    def engine(self):
+        return self.runner.engine
+
+    def artifact_path(self, suffix: str = "") -> str:
+        os.makedirs(self.runner.artifact_dir, exist_ok=True)
+        return os.path.join(self.runner.artifact_dir, f"job-{self.job_id}{suffix}")
+
+    def save(self, checkpoint: dict, done: int, total: Optional[int] = None, conn=None):
+        """Record progress and the checkpoint to resume from; with ``conn``, inside that transaction.
+
+        During a shutdown this raises ``JobInterrupted`` instead, so a step saved with ``conn`` is
+        rolled back and redone by the next run.
+        """
+        if _shutting_down is not None and _shutting_down.is_set():
+            raise JobInterrupted()
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.save(checkpoint, done, total, conn)
+        saved = conn.execute(text(
+            "UPDATE jobs SET checkpoint = :checkpoint, done = :done, total = COALESCE(:total, total), "
+            "updated_at = :now WHERE id = :id AND runs = :run AND status = :running"
+        ), {"checkpoint": json.dumps(checkpoint), "done": done, "total": total, "now": datetime.utcnow(),
+            "id": self.job_id, "run": self.run, "running": RUNNING}).rowcount
+        if not saved:
+            raise JobLost()
+        self.checkpoint = checkpoint
+
+
+class JobRunner:
+    def __init__(self, engine, module: str, name: str, workers: int = 1, artifact_dir: str = "job_artifacts",
+                 poll_interval: float = 1.0, heartbeat_interval: float = 10.0, stale_after: float = 120.0,
+                 max_attempts: int = 3, retention: float = 7 * 86400, niceness: int = 0):
+        self.engine = engine
+        self.module = module  # module defining this runner, imported by worker processes
+        self.name = name
+        self.workers = max(1, workers)
+        self.artifact_dir = os.path.abspath(artifact_dir)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.niceness = niceness
+        self.handlers: Dict[str, Callable] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._active: Dict[int, object] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._shutting_down = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_maintenance = 0.0
+
+    def handler(self, kind: str):
+        """Decorator registering ``handler(ctx)`` for jobs of ``kind``; it may return (artifact path, media type)"""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def notify(self):
+        """Wake the runner; called after a job is submitted"""
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self.recover()
+            self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop claiming jobs and ask running ones to stop at their next checkpoint.
+
+        They go back to the queue and resume from it on the next start. Workers still busy after
+        ``timeout`` are terminated; their jobs are recovered the same way as after a crash.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._shutting_down.set()
+            with self._lock:
+                running = list(self._active.values())
+            wait(running, timeout)
+            # ProcessPoolExecutor has no public way to stop a running call
+            processes = list((self._executor._processes or {}).values())
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: the server has threads (dispatcher, threadpool) whose locks a fork would copy
+            context = multiprocessing.get_context("spawn")
+            self._shutting_down = context.Event()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_init_worker, initargs=(self.niceness, self._shutting_down),
+            )
+        return self._executor
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                now = time.monotonic()
+                if now >= self._next_maintenance:
+                    self._next_maintenance = now + self.heartbeat_interval
+                    self._heartbeat()
+                    self.requeue_stale()
+                    self.prune()
+                self._dispatch()
+            except Exception:
+                logger.exception("Job runner failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _dispatch(self):
+        while len(self._active) < self.workers and not self._stopping.is_set():
+            claimed = self.claim()
+            if claimed is None:
+                return
+            job_id, run = claimed
+            future = self._pool().submit(_execute, self.module, self.name, job_id, run)
+            with self._lock:
+                self._active[job_id] = future
+            future.add_done_callback(lambda f, job_id=job_id, run=run: self._finished(job_id, run, f))
+
+    def _finished(self, job_id: int, run: int, future):
+        with self._lock:
+            self._active.pop(job_id, None)
+        exc = None if future.cancelled() else future.exception()
+        if exc is not None:
+            # The worker process died or could not run the handler at all; execute() reports handler errors itself
+            if isinstance(exc, BrokenProcessPool):
+                self._executor = None
+            if not self._stopping.is_set():
+                logger.error("Job %s run %s crashed: %r", job_id, run, exc)
+                self._release(job_id, run, repr(exc))
+        self._wake.set()
+
+    def claim(self):
+        """Mark the oldest queued job as running for this process; returns (job id, run) or None"""
+        with self.engine.begin() as conn:
+            while True:
+                row = conn.execute(text(
+                    "SELECT id, runs FROM jobs WHERE status = :queued ORDER BY id LIMIT 1"
+                ), {"queued": QUEUED}).first()
+                if row is None:
+                    return None
+                now = datetime.utcnow()
+                claimed = conn.execute(text(
+                    "UPDATE jobs SET status = :running, runs = runs + 1, owner = :owner, heartbeat_at = :now, "
+                    "started_at = COALESCE(started_at, :now), updated_at = :now "
+                    "WHERE id = :id AND status = :queued AND runs = :runs"
+                ), {"running": RUNNING, "queued": QUEUED, "owner": self.owner, "now": now,
+                    "id": row[0], "runs": row[1]}).rowcount
+                if claimed:
+                    return row[0], row[1] + 1
+
+    def execute(self, job_id: int, run: int):
+        """Run one job's handler in this (worker) process and record the outcome"""
+        with self.engine.connect() as conn:
+            row = conn.execute(text("SELECT kind, params, checkpoint FROM jobs WHERE id = :id AND runs = :run"),
+                               {"id": job_id, "run": run}).first()
+        if row is None:
+            return
+        kind, params, checkpoint = row
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self._release(job_id, run, f"Unknown job kind: {kind}", retry=False)
+            return
+        ctx = JobContext(self, job_id, run, json.loads(params or "{}"), json.loads(checkpoint or "null") or {})
+        try:
+            artifact = handler(ctx)
+        except JobLost:
+            logger.info("Job %s run %s was superseded", job_id, run)
+            return
+        except JobInterrupted:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    "UPDATE jobs SET status = :queued, owner = NULL, updated_at = :now "
+                    "WHERE id = :id AND runs = :run AND status = :running"
+                ), {"queued": QUEUED, "running": RUNNING, "now": datetime.utcnow(), "id": job_id, "run": run})
+            return
+        except Exception as exc:
+            logger.exception("Job %s failed", job_id)
+            self._release(job_id, run, repr(exc))
+            return
+        artifact_path, media_type = artifact or (None, None)
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE jobs SET status = :succeeded, done = total, artifact_path = :path, artifact_type = :media_type, "
+                "error = NULL, finished_at = :now, updated_at = :now WHERE id = :id AND runs = :run AND status = :running"
+            ), {"succeeded": SUCCEEDED, "path": artifact_path, "media_type": media_type, "now": datetime.utcnow(),
+                "id": job_id, "run": run, "running": RUNNING})
+
+    def _release(self, job_id: int, run: int, error: str, retry: bool = True):
+        """After a failed run: back to the queue to resume from the checkpoint, or failed for good"""
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            failures = conn.execute(text("SELECT failures FROM jobs WHERE id = :id AND runs = :run AND status = :running"),
+                                    {"id": job_id, "run": run, "running": RUNNING}).scalar()
+            if failures is None:
+                return
+            failed = not retry or failures + 1 >= self.max_attempts
+            conn.execute(text(
+                "UPDATE jobs SET status = :status, failures = failures + 1, error = :error, owner = NULL, "
+                "finished_at = :finished, updated_at = :now WHERE id = :id AND runs = :run"
+            ), {"status": FAILED if failed else QUEUED, "error": error[:1000], "finished": now if failed else None,
+                "now": now, "id": job_id, "run": run})
+
+    def _heartbeat(self):
+        with self._lock:
+            running = list(self._active)
+        if running:
+            with self.engine.begin() as conn:
+                conn.execute(text("UPDATE jobs SET heartbeat_at = :now WHERE id = :id AND owner = :owner"),
+                             [{"now": datetime.utcnow(), "id": job_id, "owner": self.owner} for job_id in running])
+
+    def _requeue(self, conn, job_ids) -> int:
+        if not job_ids:
+            return 0
+        return conn.execute(text(
+            "UPDATE jobs SET status = :queued, owner = NULL, updated_at = :now WHERE id = :id AND status = :running"
+        ), [{"queued": QUEUED, "running": RUNNING, "now": datetime.utcnow(), "id": job_id} for job_id in job_ids]).rowcount
+
+    def recover(self) -> int:
+        """Requeue jobs left running by processes on this host that no longer exist (a restart)"""
+        host = socket.gethostname()
+        with self.engine.begin() as conn:
+            orphaned = []
+            for job_id, owner in conn.execute(text("SELECT id, owner FROM jobs WHERE status = :running"),
+                                              {"running": RUNNING}):
+                owner_host, _, pid = (owner or "").rpartition(":")
+                if owner != self.owner and owner_host == host and pid.isdigit() and not _alive(int(pid)):
+                    orphaned.append(job_id)
+            requeued = self._requeue(conn, orphaned)
+        if requeued:
+            logger.info("Requeued %s interrupted jobs", requeued)
+            self._wake.set()
+        return requeued
+
+    def requeue_stale(self) -> int:
+        """Requeue running jobs whose owner stopped sending heartbeats (another host, or a hung process)"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with self.engine.begin() as conn:
+            stale = [job_id for (job_id,) in conn.execute(text(
+                "SELECT id FROM jobs WHERE status = :running AND heartbeat_at < :cutoff"
+            ), {"running": RUNNING, "cutoff": cutoff})]
+            return self._requeue(conn, stale)
+
+    def prune(self) -> int:
+        """Delete finished jobs older than the retention, with their artifacts"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        with self.engine.begin() as conn:
+            expired = conn.execute(text(
+                "SELECT id, artifact_path FROM jobs WHERE status IN (:succeeded, :failed) AND finished_at < :cutoff"
+            ), {"succeeded": SUCCEEDED, "failed": FAILED, "cutoff": cutoff}).all()
+            for job_id, path in expired:
+                if path and os.path.exists(path):
+                    os.remove(path)
+                conn.execute(text("DELETE FROM jobs WHERE id = :id"), {"id": job_id})
+        return len(expired)
+
+    def wait(self, job_id: int, timeout: float = 60.0) -> Optional[str]:
+        """Poll until the job finishes (used by scripts and benchmarks); returns its final status"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.engine.connect() as conn:
+                status = conn.execute(text("SELECT status FROM jobs WHERE id = :id"), {"id": job_id}).scalar()
+            if status in (SUCCEEDED, FAILED, None) or time.monotonic() >= deadline:
+                return status
+            time.sleep(0.05)
@@ -1,15 +1,33 @@
 """
 Main entry point for the QuizMaster backend application.
+
+    python main.py                 # production: no reloader, --workers processes
+    python main.py --reload        # development: restart on code changes
 """
 
+import argparse
+
 import uvicorn
-from app import app
 
-if __name__ == "__main__":
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the QuizMaster API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--reload", action="store_true", help="restart on code changes (development only)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    # The app is passed as an import string so each worker imports it itself, not this process
     uvicorn.run(
         "app:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=None if args.reload else args.workers,
+        log_level=args.log_level,
     )
+
+
+if __name__ == "__main__":
+    main()
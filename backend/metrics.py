@@ -0,0 +1,337 @@
+"""
+Request metrics and opt-in profiling for QuizMaster.
+
+Records per-route latency histograms, SQL statement counts and time (via
+SQLAlchemy engine events) and JSON serialization time, and renders them in
+the Prometheus text exposition format. An optional sampling profiler writes
+folded stacks (flamegraph.pl / speedscope input) for selected requests.
+"""
+
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # bucket counts..., sum, count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {_format_value(float(self.callback()))}"
+
+
+class CallbackCounter(Gauge):
+    """Counter kept by another object (a cache's hit count, say) and read from a callback at scrape time"""
+
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def callback_counter(self, *args, **kwargs) -> CallbackCounter:
+        return self.register(CallbackCounter(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "quizmaster_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+REQUEST_SQL_STATEMENTS = REGISTRY.histogram(
+    "quizmaster_http_request_sql_statements", "SQL statements executed per request", ("route",), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = REGISTRY.histogram(
+    "quizmaster_http_request_sql_duration_seconds", "SQL time spent per request", ("route",))
+SQL_STATEMENTS = REGISTRY.counter("quizmaster_sql_statements_total", "SQL statements executed")
+SQL_SECONDS = REGISTRY.counter("quizmaster_sql_duration_seconds_total", "Time spent executing SQL statements")
+SERIALIZATION_SECONDS = REGISTRY.histogram(
+    "quizmaster_serialization_duration_seconds", "JSON encoding time per response")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestStats:
+    __slots__ = ("sql_statements", "sql_seconds", "profiler")
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.profiler: Optional["SamplingProfiler"] = None
+
+
+# Shared with threadpool workers, which run endpoints in a copy of the request's context
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("quizmaster_request_stats", default=None)
+
+
+def instrument_engine(engine):
+    """Count and time every statement executed through ``engine``"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        SQL_STATEMENTS.inc()
+        SQL_SECONDS.inc(elapsed)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.sql_statements += 1
+            stats.sql_seconds += elapsed
+
+
+def observe_serialization(seconds: float):
+    SERIALIZATION_SECONDS.observe(seconds)
+
+
+def profiled_call(fn: Callable) -> Callable:
+    """Wrap a sync callable run in the threadpool so the request's profiler, if any, samples its thread"""
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        stats = _current_request.get()
+        profiler = stats.profiler if stats is not None else None
+        if profiler is None:
+            return fn(*args, **kwargs)
+        ident = threading.get_ident()
+        profiler.threads.add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.threads.discard(ident)
+    return call
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of one request and aggregates them as folded stacks.
+
+    On the event loop thread, only stacks running through ``request_frame`` (the
+    request's middleware call) are counted, so other requests' coroutines are left
+    out; threadpool threads are sampled while they run the request's work, see
+    ``profiled_call``. Background threads are never sampled.
+    """
+
+    # Leaf frames in these files are threads parked waiting for work
+    _IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+
+    def __init__(self, interval: float, request_frame=None):
+        self.interval = interval
+        self.samples: Dict[str, int] = {}
+        self.loop_thread = threading.get_ident()
+        self.request_frame = request_frame
+        self.threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quizmaster-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in (self.loop_thread, *self.threads):
+                frame = frames.get(ident)
+                if frame is None or frame.f_code.co_filename.endswith(self._IDLE_FILES):
+                    continue
+                stack, ours = [], ident != self.loop_thread
+                while frame is not None:
+                    ours = ours or frame is self.request_frame
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if not ours:
+                    continue
+                folded = ";".join(reversed(stack))
+                self.samples[folded] = self.samples.get(folded, 0) + 1
+
+    def write(self, path: str):
+        with open(path, "w") as out:
+            for stack, count in sorted(self.samples.items()):
+                out.write(f"{stack} {count}\n")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and SQL usage per route, with opt-in profiling.
+
+    A request is profiled when profiling is enabled and it either sends the
+    ``X-Profile: 1`` header or is picked by ``profile_sample_rate``.
+    """
+
+    def __init__(self, app, profiling_enabled: bool = False, profile_dir: str = "profiles",
+                 profile_sample_rate: float = 0.0, profile_interval: float = 0.005):
+        self.app = app
+        self.profiling_enabled = profiling_enabled
+        self.profile_dir = profile_dir
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_interval = profile_interval
+
+    def _wants_profile(self, scope) -> bool:
+        if not self.profiling_enabled:
+            return False
+        if (b"x-profile", b"1") in scope["headers"]:
+            return True
+        return self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        profiler = None
+        if self._wants_profile(scope):
+            profiler = stats.profiler = SamplingProfiler(self.profile_interval, sys._getframe()).start()
+        status_code = 500
+        profile_path = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile_path is not None:
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"x-profile-output", profile_path.encode("latin-1"))]}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = os.path.join(
+                    self.profile_dir, f"{int(time.time() * 1000)}-{scope['path'].strip('/').replace('/', '_') or 'root'}.folded")
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route_path, str(status_code))
+            REQUEST_SQL_STATEMENTS.observe(stats.sql_statements, route_path)
+            REQUEST_SQL_SECONDS.observe(stats.sql_seconds, route_path)
+            if profiler is not None:
+                profiler.stop()
+                profiler.write(profile_path)
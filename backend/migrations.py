@@ -0,0 +1,263 @@
+"""
+Data migrations for QuizMaster databases created by older releases.
+
+Each migration is idempotent and safe to run on every startup. A database
+records the fingerprint of the schema and migrations it was last upgraded
+to in ``schema_state``; when it matches, startup skips DDL and migrations.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+import achievements
+from grading import grade, parse_answers
+from partitions import archived_months, results_table
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def add_missing_columns(engine, table, columns):
+    """Add columns that create_all cannot add to tables that already exist.
+
+    ``columns`` maps column name to its DDL type and default, e.g.
+    ``{"version": "INTEGER NOT NULL DEFAULT 1"}``.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+    missing = [(name, ddl) for name, ddl in columns.items() if name not in existing]
+    if missing:
+        with engine.begin() as conn:
+            for name, ddl in missing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    return [name for name, _ in missing]
+
+
+def ensure_indexes(metadata, engine):
+    """Create indexes declared on models that are missing from existing tables"""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def schema_fingerprint(metadata, *parts) -> str:
+    """Hash of the declared tables, columns and indexes plus anything else an upgrade depends on"""
+    tables = [
+        [table.name,
+         [[column.name, str(column.type), column.nullable, column.primary_key] for column in table.columns],
+         sorted([index.name, index.unique, [column.name for column in index.columns]] for index in table.indexes)]
+        for table in metadata.sorted_tables
+    ]
+    payload = json.dumps([tables, parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schema_is_current(engine, fingerprint: str) -> bool:
+    """Whether the database was last upgraded to ``fingerprint`` (one primary-key read)"""
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(text("SELECT fingerprint FROM schema_state WHERE id = 1")).scalar()
+    except DBAPIError:
+        return False  # no schema_state table yet
+    return stored == fingerprint
+
+
+def record_schema(engine, fingerprint: str):
+    with engine.begin() as conn:
+        updated = conn.execute(text(
+            "UPDATE schema_state SET fingerprint = :fingerprint, updated_at = :now WHERE id = 1"
+        ), {"fingerprint": fingerprint, "now": datetime.utcnow()}).rowcount
+        if not updated:
+            conn.execute(text(
+                "INSERT INTO schema_state (id, fingerprint, updated_at) VALUES (1, :fingerprint, :now)"
+            ), {"fingerprint": fingerprint, "now": datetime.utcnow()})
+
+
+def migrate_question_options(engine):
+    """Move JSON-encoded questions.options text into question_options rows.
+
+    Values that are not a JSON list or object are left in place, and their question ids are logged.
+    """
+    select_legacy = text(
+        "SELECT id, options FROM questions WHERE options IS NOT NULL AND id > :after ORDER BY id LIMIT :limit"
+    )
+    insert_option = text(
+        "INSERT INTO question_options (question_id, position, text) VALUES (:question_id, :position, :text)"
+    )
+    clear_legacy = text("UPDATE questions SET options = NULL WHERE id = :id")
+
+    migrated = 0
+    skipped = []
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_legacy, {"after": last_id, "limit": BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            option_rows, cleared = [], []
+            for question_id, raw in rows:
+                try:
+                    values = json.loads(raw)
+                except ValueError:
+                    values = raw
+                if isinstance(values, dict):
+                    values = list(values.values())
+                if values is not None and not isinstance(values, list):
+                    skipped.append(question_id)
+                    continue
+                for position, value in enumerate(values or []):
+                    option_rows.append({"question_id": question_id, "position": position, "text": str(value)})
+                cleared.append({"id": question_id})
+            if option_rows:
+                conn.execute(insert_option, option_rows)
+            if cleared:
+                conn.execute(clear_legacy, cleared)
+            last_id = rows[-1][0]
+            migrated += len(cleared)
+    if skipped:
+        logger.warning("Left questions.options of %s questions unmigrated, not a JSON list or object: ids %s",
+                       len(skipped), skipped)
+    return migrated
+
+
+def migrate_result_answers(engine):
+    """Grade JSON-encoded quiz_results.answers into result_answers rows, then clear the blob"""
+    select_legacy = text(
+        "SELECT id, answers FROM quiz_results WHERE answers IS NOT NULL AND id > :after ORDER BY id LIMIT :limit"
+    )
+    insert_answer = text(
+        "INSERT INTO result_answers (result_id, question_id, option_id, answer_hash, is_correct, points) "
+        "VALUES (:result_id, :question_id, :option_id, :answer_hash, :is_correct, :points)"
+    )
+    clear_legacy = text("UPDATE quiz_results SET answers = NULL WHERE id = :id")
+
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_legacy, {"after": last_id, "limit": BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            parsed = [(result_id, parse_answers(raw)) for result_id, raw in rows]
+            question_ids = sorted({qid for _, answers in parsed for qid in answers})
+            questions, options = {}, {}
+            for start in range(0, len(question_ids), BATCH_SIZE):
+                chunk = question_ids[start:start + BATCH_SIZE]
+                params = {f"q{i}": qid for i, qid in enumerate(chunk)}
+                placeholders = ", ".join(f":q{i}" for i in range(len(chunk)))
+                for qid, correct, points in conn.execute(text(
+                    f"SELECT id, correct_answer, points FROM questions WHERE id IN ({placeholders})"
+                ), params):
+                    questions[qid] = (correct, points)
+                for option_id, qid, option_text in conn.execute(text(
+                    f"SELECT id, question_id, text FROM question_options WHERE question_id IN ({placeholders})"
+                ), params):
+                    options.setdefault((qid, option_text), option_id)
+            answer_rows = [row for result_id, answers in parsed for row in grade(result_id, answers, questions, options)]
+            if answer_rows:
+                conn.execute(insert_answer, answer_rows)
+            conn.execute(clear_legacy, [{"id": result_id} for result_id, _ in rows])
+            last_id = rows[-1][0]
+            migrated += len(rows)
+    return migrated
+
+
+def backfill_quiz_versions(engine):
+    """Publish quizzes from before versioning as a first version holding their current questions.
+
+    Their results are attributed to that version, the best record there is of what was taken.
+    """
+    with engine.begin() as conn:
+        months = archived_months(conn)
+    for key in months:
+        add_missing_columns(engine, results_table(key).name, {"quiz_version_id": "INTEGER"})
+
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT 1 FROM quizzes WHERE current_version_id IS NULL LIMIT 1")).first():
+            return 0
+        conn.execute(text(
+            "INSERT INTO quiz_versions (quiz_id, version, title, description, category, difficulty, time_limit, "
+            "question_count, created_at) "
+            "SELECT q.id, q.version, q.title, q.description, q.category, q.difficulty, q.time_limit, "
+            "(SELECT COUNT(*) FROM questions qu WHERE qu.quiz_id = q.id), COALESCE(q.updated_at, q.created_at, :now) "
+            "FROM quizzes q WHERE q.current_version_id IS NULL"
+        ), {"now": datetime.utcnow()})
+        conn.execute(text(
+            "INSERT INTO quiz_version_questions (version_id, question_id, position) "
+            "SELECT v.id, qu.id, ROW_NUMBER() OVER (PARTITION BY qu.quiz_id ORDER BY qu.\"order\", qu.id) "
+            "FROM questions qu JOIN quizzes q ON q.id = qu.quiz_id "
+            "JOIN quiz_versions v ON v.quiz_id = q.id AND v.version = q.version WHERE q.current_version_id IS NULL"
+        ))
+        published = conn.execute(text(
+            "UPDATE quizzes SET current_version_id = "
+            "(SELECT v.id FROM quiz_versions v WHERE v.quiz_id = quizzes.id AND v.version = quizzes.version) "
+            "WHERE current_version_id IS NULL"
+        )).rowcount
+        for table in ["quiz_results"] + [results_table(key).name for key in months]:
+            conn.execute(text(
+                f"UPDATE {table} SET quiz_version_id = "
+                f"(SELECT current_version_id FROM quizzes q WHERE q.id = {table}.quiz_id) WHERE quiz_version_id IS NULL"
+            ))
+        return published
+
+
+def backfill_achievements(engine):
+    """Build achievement counters and unlocks from stored results the first time the engine runs"""
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM user_achievement_stats LIMIT 1")).first():
+            return 0
+        return achievements.rebuild(conn)
+
+
+def drop_deleted_quiz_bank_items(engine):
+    """Remove questions of quizzes deleted before deletion took them out of question banks"""
+    deleted = "SELECT q.id FROM questions q JOIN quizzes z ON z.id = q.quiz_id WHERE z.deleted_at IS NOT NULL"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"UPDATE question_banks SET version = version + 1 "
+            f"WHERE id IN (SELECT bank_id FROM question_bank_items WHERE question_id IN ({deleted}))"
+        ))
+        return conn.execute(text(f"DELETE FROM question_bank_items WHERE question_id IN ({deleted})")).rowcount
+
+
+def reset_user_totals(conn, consumer="leaderboard"):
+    """Recompute users.total_score/quizzes_taken and restart the consumer that maintains them.
+
+    Totals come from the hot results plus the monthly rollups of archived ones; the consumer then
+    starts after every event already in the outbox. The UPDATE comes first so that, on SQLite, the
+    transaction holds the write lock before it reads the results and the last event id: nothing can
+    commit in between and be counted twice or not at all.
+    """
+    conn.execute(text(
+        "UPDATE users SET "
+        "total_score = COALESCE((SELECT SUM(score) FROM quiz_results r WHERE r.user_id = users.id), 0) "
+        "+ COALESCE((SELECT SUM(score_sum) FROM user_monthly_stats m WHERE m.user_id = users.id), 0), "
+        "quizzes_taken = (SELECT COUNT(*) FROM quiz_results r WHERE r.user_id = users.id) "
+        "+ COALESCE((SELECT SUM(attempts) FROM user_monthly_stats m WHERE m.user_id = users.id), 0)"
+    ))
+    last_event_id = conn.execute(text("SELECT MAX(id) FROM outbox_events")).scalar() or 0
+    updated = conn.execute(text(
+        "UPDATE outbox_offsets SET last_event_id = :last_event_id, updated_at = :now WHERE consumer = :consumer"
+    ), {"consumer": consumer, "last_event_id": last_event_id, "now": datetime.utcnow()}).rowcount
+    if not updated:
+        conn.execute(text(
+            "INSERT INTO outbox_offsets (consumer, last_event_id, updated_at) VALUES (:consumer, :last_event_id, :now)"
+        ), {"consumer": consumer, "last_event_id": last_event_id, "now": datetime.utcnow()})
+
+
+def backfill_user_totals(engine, consumer="leaderboard"):
+    """Recompute user totals before the outbox consumer that maintains them first runs.
+
+    Older releases only counted some submissions.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM outbox_offsets WHERE consumer = :consumer"),
+                        {"consumer": consumer}).first():
+            return False
+        reset_user_totals(conn, consumer)
+        return True
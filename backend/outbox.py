@@ -0,0 +1,254 @@
+"""
+Transactional outbox and in-process event bus for QuizMaster.
+
+Writes that other features derive data from (a completed quiz, a new
+quiz) add an ``outbox_events`` row with ``publish`` in the same
+transaction, so the request does one extra insert and derived data can
+never miss a committed write. A background ``OutboxDispatcher`` thread
+reads the outbox in id order and hands batches to every registered
+consumer. A consumer's progress is its row in ``outbox_offsets``, which
+is advanced in the same transaction as the consumer's own writes: a
+batch is either applied and acknowledged together or retried.
+
+Delivery is at least once. A consumer may see an event again, after a
+failed batch that had side effects outside the database, or when
+another process's dispatcher delivered the same batch first, so
+consumers must be idempotent. A failing batch is retried with
+exponential backoff, then split into single events; an event that still
+fails after ``max_attempts`` goes to ``outbox_dead_letters`` and is
+skipped so it cannot hold back later events. Events every consumer has
+processed are deleted after ``retention`` seconds.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    payload: dict
+    created_at: datetime
+
+
+@dataclass
+class _Consumer:
+    name: str
+    handler: Callable
+    event_types: Optional[frozenset]
+    failures: int = 0
+    retry_at: float = 0.0
+    isolate_until: int = 0  # deliver one event at a time up to this id, after a batch failed
+    delivered: int = 0
+    registered: bool = False  # its outbox_offsets row exists
+
+
+class _Superseded(Exception):
+    """Another dispatcher advanced the consumer's offset first"""
+
+
+def publish(conn, event_type: str, payload: dict):
+    """Add an event to the outbox inside the caller's transaction (a Connection or Session)"""
+    conn.execute(text(
+        "INSERT INTO outbox_events (event_type, payload, created_at) VALUES (:event_type, :payload, :created_at)"
+    ), {"event_type": event_type, "payload": json.dumps(payload, default=str), "created_at": datetime.utcnow()})
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+class OutboxDispatcher:
+    def __init__(self, engine, batch_size: int = 500, batch_delay: float = 0.05, poll_interval: float = 0.5,
+                 max_attempts: int = 5, retry_backoff: float = 0.5, max_backoff: float = 30.0,
+                 retention: float = 3600.0, lag_histogram=None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay  # after a wakeup, wait this long so a burst of commits forms one batch
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.lag_histogram = lag_histogram  # metrics.Histogram labelled by consumer
+        self.dead_lettered = 0
+        self._consumers: Dict[str, _Consumer] = {}
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_prune = 0.0
+
+    def consumer(self, name: str, *event_types: str):
+        """Decorator registering ``handler(conn, events)``; without event types it receives every event"""
+        def register(handler):
+            self._consumers[name] = _Consumer(name, handler, frozenset(event_types) or None)
+            return handler
+        return register
+
+    @property
+    def delivered(self) -> int:
+        return sum(consumer.delivered for consumer in self._consumers.values())
+
+    def notify(self):
+        """Wake the dispatcher; called after a transaction that published events commits"""
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delivered = self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                delivered = 0
+            if not delivered:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+            if delivered < self.batch_size:
+                self._stopping.wait(self.batch_delay)
+
+    def run_once(self) -> int:
+        """Deliver at most one batch to each consumer that is not backing off; returns events delivered"""
+        delivered = 0
+        now = time.monotonic()
+        for consumer in list(self._consumers.values()):
+            if consumer.retry_at <= now:
+                delivered += self._deliver(consumer)
+        if now >= self._next_prune:
+            self._next_prune = now + min(self.retention, 60.0)
+            self.prune()
+        return delivered
+
+    def drain(self, timeout: float = 30.0) -> int:
+        """Deliver until every consumer is caught up (used by scripts and benchmarks)"""
+        total, deadline = 0, time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            delivered = self.run_once()
+            total += delivered
+            if not delivered and self.backlog() == 0:
+                break
+        return total
+
+    def _offset(self, conn, name: str) -> int:
+        offset = conn.execute(text("SELECT last_event_id FROM outbox_offsets WHERE consumer = :name"),
+                              {"name": name}).scalar()
+        if offset is None:
+            conn.execute(text(
+                "INSERT INTO outbox_offsets (consumer, last_event_id, updated_at) VALUES (:name, 0, :now)"
+            ), {"name": name, "now": datetime.utcnow()})
+            offset = 0
+        return offset
+
+    def _advance(self, conn, name: str, offset: int, last_id: int):
+        advanced = conn.execute(text(
+            "UPDATE outbox_offsets SET last_event_id = :last_id, updated_at = :now "
+            "WHERE consumer = :name AND last_event_id = :offset"
+        ), {"last_id": last_id, "now": datetime.utcnow(), "name": name, "offset": offset}).rowcount
+        if not advanced:
+            raise _Superseded()
+
+    def _deliver(self, consumer: _Consumer) -> int:
+        if not consumer.registered:
+            with self.engine.begin() as conn:
+                self._offset(conn, consumer.name)
+            consumer.registered = True
+        with self.engine.connect() as conn:
+            offset = conn.execute(text("SELECT last_event_id FROM outbox_offsets WHERE consumer = :name"),
+                                  {"name": consumer.name}).scalar()
+            limit = 1 if offset < consumer.isolate_until else self.batch_size
+            rows = conn.execute(text(
+                "SELECT id, event_type, payload, created_at FROM outbox_events WHERE id > :offset ORDER BY id LIMIT :limit"
+            ), {"offset": offset, "limit": limit}).all()
+        if not rows:
+            return 0
+        last_id = rows[-1][0]
+        events = [
+            Event(event_id, event_type, json.loads(payload), _as_datetime(created_at))
+            for event_id, event_type, payload, created_at in rows
+            if consumer.event_types is None or event_type in consumer.event_types
+        ]
+
+        try:
+            with self.engine.begin() as conn:
+                if events:
+                    consumer.handler(conn, events)
+                self._advance(conn, consumer.name, offset, last_id)
+        except _Superseded:
+            return 0
+        except Exception as exc:
+            self._failed(consumer, offset, rows, exc)
+            return 0
+
+        consumer.failures = 0
+        consumer.delivered += len(rows)
+        if self.lag_histogram is not None:
+            now = datetime.utcnow()
+            for event in events:
+                self.lag_histogram.observe((now - event.created_at).total_seconds(), consumer.name)
+        return len(rows)
+
+    def _failed(self, consumer: _Consumer, offset: int, rows: List[tuple], exc: Exception):
+        consumer.failures += 1
+        logger.warning("Outbox consumer %s failed on events %s-%s (attempt %s): %s",
+                       consumer.name, rows[0][0], rows[-1][0], consumer.failures, exc)
+        if consumer.failures < self.max_attempts:
+            backoff = min(self.max_backoff, self.retry_backoff * 2 ** (consumer.failures - 1))
+            consumer.retry_at = time.monotonic() + backoff
+            return
+        consumer.failures = 0
+        if len(rows) > 1:
+            # Find the failing event by delivering the batch one event at a time
+            consumer.isolate_until = rows[-1][0]
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO outbox_dead_letters (consumer, event_id, event_type, payload, error, failed_at) "
+                    "VALUES (:consumer, :event_id, :event_type, :payload, :error, :failed_at)"
+                ), {"consumer": consumer.name, "event_id": rows[0][0], "event_type": rows[0][1],
+                    "payload": rows[0][2], "error": repr(exc)[:1000], "failed_at": datetime.utcnow()})
+                self._advance(conn, consumer.name, offset, rows[0][0])
+        except _Superseded:
+            return
+        self.dead_lettered += 1
+        logger.error("Outbox event %s moved to dead letters for consumer %s", rows[0][0], consumer.name)
+
+    def backlog(self) -> int:
+        """Events not yet processed by the slowest registered consumer"""
+        with self.engine.connect() as conn:
+            last_id = conn.execute(text("SELECT MAX(id) FROM outbox_events")).scalar() or 0
+            offsets = dict(conn.execute(text("SELECT consumer, last_event_id FROM outbox_offsets")).all())
+        return max((last_id - offsets.get(name, 0) for name in self._consumers), default=0)
+
+    def prune(self) -> int:
+        """Delete events that every registered consumer has processed and that are older than the retention"""
+        if not self._consumers:
+            return 0
+        with self.engine.begin() as conn:
+            offsets = dict(conn.execute(text("SELECT consumer, last_event_id FROM outbox_offsets")).all())
+            processed = min(offsets.get(name, 0) for name in self._consumers)
+            return conn.execute(text("DELETE FROM outbox_events WHERE id <= :processed AND created_at < :before"), {
+                "processed": processed, "before": datetime.utcnow() - timedelta(seconds=self.retention),
+            }).rowcount
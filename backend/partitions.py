@@ -0,0 +1,225 @@
+"""
+Monthly partitioning of quiz results for QuizMaster.
+
+``quiz_results`` and ``result_answers`` hold only the hot window: the
+current month and the ``hot_months - 1`` months before it. Older months
+are closed: their rows move into per-month tables
+(``quiz_results_YYYY_MM`` / ``result_answers_YYYY_MM``, created on
+demand) and are rolled up into ``quiz_daily_stats``,
+``user_monthly_stats`` and ``question_monthly_stats``. Monthly tables
+older than the retention window are dropped; the rollups are kept.
+
+Each month moves in a single transaction, so readers see its rows either
+in the hot tables or in the archive plus rollups, never both. Queries over
+recent data (history, live aggregates) therefore only touch the hot
+tables, whose size stays bounded. This works the same on SQLite and
+PostgreSQL, without native partitioning.
+"""
+
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table, Text, Boolean, text
+
+# Score buckets used by analytics; the rollups store one count per bucket
+SCORE_RANGES = (("0-25", 25), ("26-50", 50), ("51-75", 75), ("76-100", None))
+
+_metadata = MetaData()
+
+
+def month_key(moment: datetime) -> str:
+    return f"{moment.year:04d}_{moment.month:02d}"
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def results_table(key: str) -> Table:
+    name = f"quiz_results_{key}"
+    if name not in _metadata.tables:
+        Table(
+            name, _metadata,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, nullable=False),
+            Column("quiz_id", Integer, nullable=False),
+            Column("quiz_version_id", Integer),
+            Column("score", Integer, nullable=False),
+            Column("total_questions", Integer, nullable=False),
+            Column("time_taken", Integer),
+            Column("completed_at", DateTime),
+            Column("answers", Text),
+            Index(f"ix_{name}_user_completed", "user_id", "completed_at"),
+            Index(f"ix_{name}_quiz_completed", "quiz_id", "completed_at"),
+        )
+    return _metadata.tables[name]
+
+
+def answers_table(key: str) -> Table:
+    name = f"result_answers_{key}"
+    if name not in _metadata.tables:
+        Table(
+            name, _metadata,
+            Column("result_id", Integer, primary_key=True),
+            Column("question_id", Integer, primary_key=True),
+            Column("option_id", Integer),
+            Column("answer_hash", Integer),
+            Column("is_correct", Boolean, nullable=False),
+            Column("points", Integer, nullable=False),
+            Index(f"ix_{name}_question_correct", "question_id", "is_correct"),
+        )
+    return _metadata.tables[name]
+
+
+def archived_months(conn) -> List[str]:
+    """Keys of months whose raw rows are still kept in monthly tables, newest first"""
+    rows = conn.execute(text("SELECT month FROM result_partitions WHERE dropped_at IS NULL ORDER BY month DESC"))
+    return [month for (month,) in rows]
+
+
+_RESULT_COLUMNS = "id, user_id, quiz_id, quiz_version_id, score, total_questions, time_taken, completed_at, answers"
+_ANSWER_COLUMNS = "result_id, question_id, option_id, answer_hash, is_correct, points"
+
+
+def _bucket_sums(column: str) -> str:
+    sums, lower = [], None
+    for _, upper in SCORE_RANGES:
+        if upper is None:
+            condition = f"{column} > {lower}"
+        elif lower is None:
+            condition = f"{column} <= {upper}"
+        else:
+            condition = f"{column} > {lower} AND {column} <= {upper}"
+        sums.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END)")
+        lower = upper
+    return ", ".join(sums)
+
+
+def archive_month(conn, start: datetime, keep_from_id: int) -> int:
+    """Move one closed month out of the hot tables and recompute its rollups.
+
+    Rows with id >= ``keep_from_id`` stay hot, so the hot table never empties and
+    SQLite cannot hand out an archived id again.
+    """
+    key = month_key(start)
+    end = add_months(start, 1)
+    results, answers = results_table(key), answers_table(key)
+    results.create(conn, checkfirst=True)
+    answers.create(conn, checkfirst=True)
+    window = {"start": start, "end": end, "keep": keep_from_id}
+    in_month = "completed_at >= :start AND completed_at < :end AND id < :keep"
+
+    conn.execute(text(
+        f"INSERT INTO {answers.name} ({_ANSWER_COLUMNS}) SELECT {_ANSWER_COLUMNS} FROM result_answers "
+        f"WHERE result_id IN (SELECT id FROM quiz_results WHERE {in_month})"
+    ), window)
+    moved = conn.execute(text(
+        f"INSERT INTO {results.name} ({_RESULT_COLUMNS}) SELECT {_RESULT_COLUMNS} FROM quiz_results WHERE {in_month}"
+    ), window).rowcount
+    conn.execute(text(
+        f"DELETE FROM result_answers WHERE result_id IN (SELECT id FROM quiz_results WHERE {in_month})"
+    ), window)
+    conn.execute(text(f"DELETE FROM quiz_results WHERE {in_month}"), window)
+
+    # Rollups are rebuilt from the whole monthly table, so rows that arrive late are counted once
+    rebuild_rollups(conn, key)
+
+    total = conn.execute(text(f"SELECT COUNT(*) FROM {results.name}")).scalar()
+    updated = conn.execute(text(
+        "UPDATE result_partitions SET results = :rows, archived_at = :now WHERE month = :month"
+    ), {"rows": total, "now": datetime.utcnow(), "month": key}).rowcount
+    if not updated:
+        conn.execute(text(
+            "INSERT INTO result_partitions (month, results, archived_at) VALUES (:month, :rows, :now)"
+        ), {"rows": total, "now": datetime.utcnow(), "month": key})
+    return moved
+
+
+def rebuild_rollups(conn, key: str):
+    """Recompute a retained month's rollups from its monthly tables"""
+    start = datetime(int(key[:4]), int(key[5:]), 1)
+    end = add_months(start, 1)
+    results, answers = results_table(key), answers_table(key)
+    month = {"month": key, "start_day": start.date(), "end_day": end.date()}
+    conn.execute(text("DELETE FROM quiz_daily_stats WHERE day >= :start_day AND day < :end_day"), month)
+    conn.execute(text(
+        "INSERT INTO quiz_daily_stats (quiz_id, day, attempts, score_sum, time_sum, "
+        "scores_0_25, scores_26_50, scores_51_75, scores_76_100) "
+        f"SELECT quiz_id, date(completed_at), COUNT(*), SUM(score), SUM(COALESCE(time_taken, 0)), "
+        f"{_bucket_sums('score')} FROM {results.name} GROUP BY quiz_id, date(completed_at)"
+    ))
+    conn.execute(text("DELETE FROM user_monthly_stats WHERE month = :month"), month)
+    conn.execute(text(
+        "INSERT INTO user_monthly_stats (user_id, month, attempts, score_sum) "
+        f"SELECT user_id, :month, COUNT(*), SUM(score) FROM {results.name} GROUP BY user_id"
+    ), month)
+    conn.execute(text("DELETE FROM question_monthly_stats WHERE month = :month"), month)
+    conn.execute(text(
+        "INSERT INTO question_monthly_stats (question_id, month, answered, correct, points) "
+        "SELECT question_id, :month, COUNT(*), SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), SUM(points) "
+        f"FROM {answers.name} GROUP BY question_id"
+    ), month)
+
+
+def drop_expired(conn, before: datetime) -> List[str]:
+    """Drop monthly tables of months starting before ``before``; their rollups remain"""
+    expired = [
+        month for (month,) in conn.execute(text(
+            "SELECT month FROM result_partitions WHERE dropped_at IS NULL AND month < :key"
+        ), {"key": month_key(before)})
+    ]
+    for key in expired:
+        answers_table(key).drop(conn, checkfirst=True)
+        results_table(key).drop(conn, checkfirst=True)
+        conn.execute(text("UPDATE result_partitions SET dropped_at = :now WHERE month = :month"),
+                     {"now": datetime.utcnow(), "month": key})
+    return expired
+
+
+def maintain(engine, hot_months: int = 2, retention_months: int = 24, now: datetime = None) -> dict:
+    """Archive every closed month still in the hot tables, then apply retention"""
+    now = now or datetime.utcnow()
+    cutoff = add_months(month_start(now), -(max(1, hot_months) - 1))
+    archived = {}
+    while True:
+        with engine.begin() as conn:
+            keep_from_id = conn.execute(text("SELECT MAX(id) FROM quiz_results")).scalar()
+            oldest = conn.execute(text(
+                "SELECT MIN(completed_at) FROM quiz_results WHERE completed_at < :cutoff AND id < :keep"
+            ), {"cutoff": cutoff, "keep": keep_from_id or 0}).scalar()
+            if oldest is None:
+                break
+            if isinstance(oldest, str):
+                oldest = datetime.fromisoformat(oldest)
+            start = month_start(oldest)
+            archived[month_key(start)] = archive_month(conn, start, keep_from_id)
+
+    dropped = []
+    if retention_months > 0:
+        with engine.begin() as conn:
+            dropped = drop_expired(conn, add_months(month_start(now), -retention_months))
+    return {"archived": archived, "dropped": dropped}
+
+
+def main():
+    import argparse
+    import json
+
+    from app import Base, engine
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Archive closed months of quiz results and apply retention")
+    parser.add_argument("--hot-months", type=int, default=settings.RESULTS_HOT_MONTHS)
+    parser.add_argument("--retention-months", type=int, default=settings.RESULTS_RETENTION_MONTHS)
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    print(json.dumps(maintain(engine, args.hot_months, args.retention_months), indent=2))
+
+
+if __name__ == "__main__":
+    main()
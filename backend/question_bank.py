@@ -0,0 +1,164 @@
+"""
+Question bank sampling for QuizMaster.
+
+A bank's items are loaded once into a ``BankIndex``: question ids in a
+dense ``array('l')`` plus, per (category, difficulty, points) stratum, an
+array of positions into it. Drawing picks a stratum with Walker's alias
+method (weights = stratum sizes, so every matching question is equally
+likely), then a uniform position inside it, rejecting positions that are
+already chosen or excluded. Exclusions (questions from the user's recent
+draws) are a bitset over positions, so a draw costs O(count) regardless of
+bank size. Indexes are cached per bank and rebuilt when the bank's version
+changes.
+"""
+
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Stratum = Tuple[str, str, int]  # (category, difficulty, points)
+
+# Random probes per pick before falling back to scanning the stratum for free positions
+MAX_REJECTIONS = 32
+
+
+class Bitset:
+    """Fixed-size set of small non-negative integers backed by a bytearray"""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, size: int):
+        self.bits = bytearray((size + 7) >> 3)
+
+    def add(self, position: int):
+        self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, position: int) -> bool:
+        return bool(self.bits[position >> 3] & (1 << (position & 7)))
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted pick"""
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        self.n = n
+        self.probability = [0.0] * n
+        self.alias = [0] * n
+        scaled = [w * n / total for w in weights]
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.probability[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.probability[i] = 1.0
+
+    def pick(self, rng: random.Random) -> int:
+        i = rng.randrange(self.n)
+        return i if rng.random() < self.probability[i] else self.alias[i]
+
+
+class BankIndex:
+    """Dense question ids for one bank, grouped into per-stratum position arrays"""
+
+    def __init__(self, items: Iterable[Tuple[int, str, str, int]]):
+        self.question_ids = array("l")
+        self.strata: Dict[Stratum, array] = {}
+        for question_id, category, difficulty, points in items:
+            position = len(self.question_ids)
+            self.question_ids.append(question_id)
+            self.strata.setdefault((category, difficulty, points), array("l")).append(position)
+        self.positions = {qid: i for i, qid in enumerate(self.question_ids)}
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def matching(self, category: Optional[str] = None, difficulty: Optional[str] = None,
+                 points: Optional[int] = None) -> List[Stratum]:
+        return [
+            key for key in self.strata
+            if (category is None or key[0] == category)
+            and (difficulty is None or key[1] == difficulty)
+            and (points is None or key[2] == points)
+        ]
+
+    def exclusion(self, question_ids: Iterable[int]) -> Bitset:
+        excluded = Bitset(len(self))
+        for question_id in question_ids:
+            position = self.positions.get(question_id)
+            if position is not None:
+                excluded.add(position)
+        return excluded
+
+    def sample(self, strata: List[Stratum], count: int, excluded: Bitset, chosen: Bitset,
+               rng: random.Random) -> Tuple[List[int], int]:
+        """Draw up to ``count`` positions from ``strata`` uniformly without replacement.
+
+        Positions in ``excluded`` are only used once no fresh ones are left; returns
+        (positions, number of excluded positions that had to be reused).
+        """
+        picked: List[int] = []
+        live = [key for key in strata if self.strata[key]]
+        while len(picked) < count and live:
+            table = AliasTable([len(self.strata[key]) for key in live])
+            exhausted = None
+            while len(picked) < count:
+                key = live[table.pick(rng)]
+                position = self._pick_free(self.strata[key], excluded, chosen, rng)
+                if position is None:
+                    exhausted = key
+                    break
+                chosen.add(position)
+                picked.append(position)
+            if exhausted is not None:
+                live.remove(exhausted)
+
+        # Not enough fresh questions: repeat recently seen ones rather than return a short quiz
+        repeats = 0
+        if len(picked) < count:
+            spare = [p for key in strata for p in self.strata[key] if p not in chosen]
+            for position in rng.sample(spare, min(count - len(picked), len(spare))):
+                chosen.add(position)
+                picked.append(position)
+                repeats += 1
+        return picked, repeats
+
+    @staticmethod
+    def _pick_free(positions: array, excluded: Bitset, chosen: Bitset, rng: random.Random) -> Optional[int]:
+        for _ in range(MAX_REJECTIONS):
+            position = positions[rng.randrange(len(positions))]
+            if position not in excluded and position not in chosen:
+                return position
+        free = [p for p in positions if p not in excluded and p not in chosen]
+        return rng.choice(free) if free else None
+
+
+class BankIndexCache:
+    """LRU of built indexes keyed by bank id, valid for one bank version"""
+
+    def __init__(self, max_banks: int = 32):
+        self.max_banks = max_banks
+        self._entries: "OrderedDict[int, Tuple[int, BankIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bank_id: int, version: int) -> Optional[BankIndex]:
+        with self._lock:
+            entry = self._entries.get(bank_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(bank_id)
+            return entry[1]
+
+    def put(self, bank_id: int, version: int, index: BankIndex):
+        with self._lock:
+            self._entries[bank_id] = (version, index)
+            self._entries.move_to_end(bank_id)
+            while len(self._entries) > self.max_banks:
+                self._entries.popitem(last=False)
@@ -0,0 +1,160 @@
+"""
+Admission control and rate limiting for QuizMaster.
+
+Two layers run before a request reaches the app:
+
+* token buckets per route and per (user, route), where the user comes from
+  the bearer token (falling back to the client address); an empty bucket
+  answers 429 with ``Retry-After``;
+* a global cap on in-flight requests; once it is reached a request waits at
+  most ``queue_timeout`` for a slot and is otherwise shed with 503.
+
+Shedding early keeps latency bounded for the requests that are admitted,
+instead of letting every request queue in the threadpool until it times out.
+State is kept in memory per worker process.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class TokenBucketStore:
+    """Token buckets keyed by arbitrary hashable keys, with an LRU bound on idle keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate: float, burst: float, now: Optional[float] = None) -> float:
+        """Take one token; returns 0 if allowed, otherwise seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [burst, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def refund(self, key, burst: float):
+        """Give back a token taken by ``take`` for a request that was rejected by a later bucket"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(burst, bucket[0] + 1)
+
+
+class AdmissionStats:
+    """Counters shared between the middleware and the metrics endpoint"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.shed = 0
+        self.limited = 0
+
+
+def _send_rejection(send, status: int, retry_after: float, detail: str):
+    body = ('{"detail":"%s"}' % detail).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+    ]
+
+    async def respond():
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    return respond()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware enforcing route/user token buckets and a global concurrency cap.
+
+    ``rules`` maps a path prefix to ``{"per_user": [rate, burst], "total": [rate, burst]}``
+    (rates in requests per second); either entry may be omitted. ``identify(scope)``
+    returns the user name for a request or None.
+    """
+
+    def __init__(self, app, identify: Callable[[dict], Optional[str]], rules: Dict[str, dict],
+                 max_concurrency: int = 64, queue_timeout: float = 0.05, exempt=("/metrics",),
+                 store: Optional[TokenBucketStore] = None, stats: Optional[AdmissionStats] = None):
+        self.app = app
+        self.identify = identify
+        # Longest prefix first so "/quiz-history/" rules can override "/quiz-history"
+        self.rules = sorted(
+            ((prefix, rule.get("per_user"), rule.get("total")) for prefix, rule in rules.items()),
+            key=lambda item: len(item[0]), reverse=True,
+        )
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.exempt = tuple(exempt)
+        self.buckets = store or TokenBucketStore()
+        self.stats = stats or AdmissionStats()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _match(self, path: str) -> Optional[Tuple[str, Optional[list], Optional[list]]]:
+        for rule in self.rules:
+            if path.startswith(rule[0]):
+                return rule
+        return None
+
+    def _client_key(self, scope) -> str:
+        user = self.identify(scope)
+        if user:
+            return f"user:{user}"
+        client = scope.get("client")
+        return f"addr:{client[0]}" if client else "addr:unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope["path"])
+        if rule is not None:
+            prefix, per_user, total = rule
+            # The user's own bucket goes first: a client over its limit must not drain the shared one
+            wait = 0.0
+            user_key = ("user", prefix, self._client_key(scope)) if per_user else None
+            if user_key:
+                wait = self.buckets.take(user_key, per_user[0], per_user[1])
+            if not wait and total:
+                wait = self.buckets.take(("route", prefix), total[0], total[1])
+                if wait and user_key:
+                    self.buckets.refund(user_key, per_user[1])
+            if wait:
+                self.stats.limited += 1
+                await _send_rejection(send, 429, wait, "Rate limit exceeded")
+                return
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if self._slots.locked():
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats.shed += 1
+                await _send_rejection(send, 503, 1, "Server overloaded, retry shortly")
+                return
+        else:
+            await self._slots.acquire()
+
+        self.stats.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.stats.in_flight -= 1
+            self._slots.release()
@@ -2,9 +2,8 @@
 Sample data for QuizMaster application
 """
 
-import json
 from sqlalchemy.orm import Session
-from app import Quiz, Question, SessionLocal
+from app import Quiz, Question, SessionLocal, publish_quiz_version
 
 def create_sample_data():
     """Create sample quiz data for testing"""
@@ -79,7 +78,7 @@ def create_sample_data():
                 quiz_id=programming_quiz.id,
                 question_text=q_data["question_text"],
                 question_type=q_data["question_type"],
-                options=json.dumps(q_data["options"]) if q_data["options"] else None,
+                options=q_data["options"],
                 correct_answer=q_data["correct_answer"],
                 points=q_data["points"],
                 order=q_data["order"]
@@ -142,7 +141,7 @@ def create_sample_data():
                 quiz_id=ds_quiz.id,
                 question_text=q_data["question_text"],
                 question_type=q_data["question_type"],
-                options=json.dumps(q_data["options"]) if q_data["options"] else None,
+                options=q_data["options"],
                 correct_answer=q_data["correct_answer"],
                 points=q_data["points"],
                 order=q_data["order"]
@@ -192,7 +191,7 @@ def create_sample_data():
                 quiz_id=math_quiz.id,
                 question_text=q_data["question_text"],
                 question_type=q_data["question_type"],
-                options=json.dumps(q_data["options"]) if q_data["options"] else None,
+                options=q_data["options"],
                 correct_answer=q_data["correct_answer"],
                 points=q_data["points"],
                 order=q_data["order"]
@@ -252,13 +251,18 @@ def create_sample_data():
                 quiz_id=advanced_quiz.id,
                 question_text=q_data["question_text"],
                 question_type=q_data["question_type"],
-                options=json.dumps(q_data["options"]) if q_data["options"] else None,
+                options=q_data["options"],
                 correct_answer=q_data["correct_answer"],
                 points=q_data["points"],
                 order=q_data["order"]
             )
             db.add(question)
 
+        # Publish each quiz's questions as its first version
+        db.flush()
+        for quiz in (programming_quiz, ds_quiz, math_quiz, advanced_quiz):
+            publish_quiz_version(db, quiz, sorted(quiz.questions, key=lambda q: q.order))
+
         db.commit()
         print("Sample data created successfully!")
         
@@ -0,0 +1,123 @@
+"""
+Password hashing for QuizMaster.
+
+Passwords are hashed with scrypt (stdlib ``hashlib``) and stored as
+``scrypt$ln=<log2 n>,r=<r>,p=<p>$<salt>$<hash>``. Hashing is deliberately
+expensive, so it runs in a bounded thread or process pool off the event
+loop, with a cap on how many requests may wait for it. Hashes made with
+older parameters, and plaintext passwords from older databases, report
+``needs_rehash`` so they can be upgraded on the next successful login.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class HasherBusy(Exception):
+    """Raised when no hashing slot frees up within the queue timeout"""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def hash_password(password: str, log_n: int = 14, r: int = 8, p: int = 1) -> str:
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=2 ** log_n, r=r, p=p,
+                            maxmem=2 ** log_n * r * 256, dklen=HASH_BYTES)
+    return f"{SCHEME}$ln={log_n},r={r},p={p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _parse(stored: str) -> Optional[Tuple[int, int, int, bytes, bytes]]:
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != SCHEME:
+        return None
+    try:
+        params = dict(item.split("=", 1) for item in parts[1].split(","))
+        return int(params["ln"]), int(params["r"]), int(params["p"]), _b64decode(parts[2]), _b64decode(parts[3])
+    except (KeyError, ValueError):
+        return None
+
+
+def verify_password(password: str, stored: str, log_n: int = 14, r: int = 8, p: int = 1) -> Tuple[bool, bool]:
+    """Check ``password`` against ``stored``; returns (matches, needs_rehash)"""
+    parsed = _parse(stored)
+    if parsed is None:
+        # Plaintext from databases created before hashing was introduced
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+    stored_log_n, stored_r, stored_p, salt, expected = parsed
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=2 ** stored_log_n, r=stored_r, p=stored_p,
+                            maxmem=2 ** stored_log_n * stored_r * 256, dklen=len(expected))
+    matches = hmac.compare_digest(digest, expected)
+    return matches, (stored_log_n, stored_r, stored_p) != (log_n, r, p)
+
+
+class PasswordHasher:
+    """Runs hashing in a bounded pool and limits how many callers may queue for it"""
+
+    def __init__(self, workers: int = 4, max_pending: int = 64, queue_timeout: float = 5.0,
+                 executor: str = "thread", log_n: int = 14, r: int = 8, p: int = 1, niceness: int = 0):
+        self.workers = workers
+        self.niceness = niceness
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.executor_kind = executor
+        self.params = {"log_n": log_n, "r": r, "p": p}
+        # Unknown users are checked against this, so a login costs one scrypt run whether or not the
+        # user exists; random bytes stand in for the digest, which no password derives
+        self._dummy = (f"{SCHEME}$ln={log_n},r={r},p={p}$"
+                       f"{_b64encode(os.urandom(SALT_BYTES))}${_b64encode(os.urandom(HASH_BYTES))}")
+        self._executor = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _pool(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # Lower-priority workers leave CPU for request handling during login storms
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=os.nice,
+                                                     initargs=(self.niceness,))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy()
+        try:
+            return await asyncio.wrap_future(self._pool().submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.params["log_n"], self.params["r"], self.params["p"])
+
+    async def verify(self, password: str, stored: str) -> Tuple[bool, bool]:
+        return await self._run(verify_password, password, stored,
+                               self.params["log_n"], self.params["r"], self.params["p"])
+
+    async def verify_missing(self, password: str) -> Tuple[bool, bool]:
+        """Spend the same work as ``verify`` for a user that does not exist; never matches"""
+        await self.verify(password, self._dummy)
+        return False, False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
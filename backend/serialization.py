@@ -0,0 +1,66 @@
+"""
+Fast JSON encoding for QuizMaster API responses.
+
+Uses orjson when it is installed, then msgspec, and falls back to the
+standard library so the app still runs in a bare environment.
+"""
+
+import json
+import time
+from datetime import date, datetime
+
+from fastapi.responses import JSONResponse
+
+from metrics import observe_serialization
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+
+    def dumps(content) -> bytes:
+        return _encoder.encode(content)
+
+else:
+    BACKEND = "json"
+
+    def dumps(content) -> bytes:
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered straight to bytes with the fastest available encoder."""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        body = dumps(content)
+        observe_serialization(time.perf_counter() - start)
+        return body
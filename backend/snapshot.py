@@ -0,0 +1,251 @@
+"""
+Memory-mapped, read-only catalog snapshot for QuizMaster.
+
+The catalog is read far more often than it changes, so after each change
+a publisher compiles it into one immutable file: the ``/quizzes`` body and
+every quiz's detail body, pre-serialized, behind a table of fixed-width
+entries sorted by quiz id. Every worker maps the file read-only, so the
+bodies live once in the page cache and are shared by all processes
+instead of being rebuilt from the ORM in each one. Responses are slices
+of the mapping; looking a quiz up is a binary search over the table.
+
+A new file is written next to the old one and renamed over it, so a
+worker sees either the old snapshot or the new one, never a partial
+file. Workers notice the rename with a throttled ``stat`` and swap their
+mapping; requests still holding slices of the old mapping keep it alive
+until they finish. A file is only replaced by one of a newer catalog
+version of the same database.
+
+The header names the database the file was built from (the random epoch
+in its ``catalog_version`` row). A file left behind by a database that has
+since been recreated, or one of a newer catalog version than the database
+holds, is refused when it is mapped.
+
+Layout (little-endian)::
+
+    header   magic, database epoch, catalog version, catalog modified (µs since the epoch), quiz count,
+             table offset, /quizzes body offset and length, quiz array offset and length
+    table    quiz count entries: quiz id, version number, version id, updated (µs), body offset, length
+    bodies   {"quizzes": [...]} (the array inside it is the /api/quizzes body), then each quiz's detail
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QMSNAP02"
+_HEADER = struct.Struct("<8s32sQqIQQQQQ")
+_ENTRY = struct.Struct("<IIIqQI")
+_EPOCH = datetime(1970, 1, 1)
+_LIST_PREFIX, _LIST_SUFFIX = b'{"quizzes":', b"}"
+
+SnapshotEntry = namedtuple("SnapshotEntry", "quiz_id version version_id updated_at offset length")
+
+
+def _to_micros(moment: Optional[datetime]) -> int:
+    return (moment - _EPOCH) // timedelta(microseconds=1) if moment is not None else 0
+
+
+def _from_micros(micros: int) -> Optional[datetime]:
+    return _EPOCH + timedelta(microseconds=micros) if micros else None
+
+
+class CatalogSnapshot:
+    """A mapped snapshot file. Bodies are returned as memoryviews of the mapping, without copying."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        (magic, epoch, self.version, modified, self.quiz_count, self._table_offset, list_offset, list_length,
+         array_offset, array_length) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.epoch = epoch.decode("ascii")
+        self.modified = _from_micros(modified)
+        self._list = self._view[list_offset:list_offset + list_length]
+        self._array = self._view[array_offset:array_offset + array_length]
+
+    def list_body(self) -> memoryview:
+        """The ``/quizzes`` response body"""
+        return self._list
+
+    def array_body(self) -> memoryview:
+        """The unfiltered ``/api/quizzes`` response body"""
+        return self._array
+
+    def _entry(self, index: int) -> SnapshotEntry:
+        quiz_id, version, version_id, updated, offset, length = _ENTRY.unpack_from(
+            self._map, self._table_offset + index * _ENTRY.size
+        )
+        return SnapshotEntry(quiz_id, version, version_id, _from_micros(updated), offset, length)
+
+    def entries(self) -> Iterator[SnapshotEntry]:
+        return (self._entry(index) for index in range(self.quiz_count))
+
+    def find(self, quiz_id: int) -> Optional[SnapshotEntry]:
+        lo, hi = 0, self.quiz_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (mid_id,) = struct.unpack_from("<I", self._map, self._table_offset + mid * _ENTRY.size)
+            if mid_id < quiz_id:
+                lo = mid + 1
+            elif mid_id > quiz_id:
+                hi = mid
+            else:
+                return self._entry(mid)
+        return None
+
+    def detail_body(self, entry: SnapshotEntry) -> memoryview:
+        return self._view[entry.offset:entry.offset + entry.length]
+
+
+def read_header(path: str) -> Optional[Tuple[str, int]]:
+    """(Database epoch, catalog version) of the snapshot at ``path``, or None if there is no readable one"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+        return None
+    _, epoch, version = _HEADER.unpack(header)[:3]
+    return epoch.decode("ascii"), version
+
+
+def write(path: str, epoch: str, version: int, modified: Optional[datetime], quiz_array: bytes,
+          entries: List[tuple], bodies: Iterable[bytes]) -> bool:
+    """Write a snapshot and rename it over ``path`` unless that one, of the same database, is already as new.
+
+    ``entries`` are (quiz id, version number, version id, updated_at) in quiz id order and ``bodies``
+    yields their detail bodies in the same order, so they can be rendered while the file is written.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    table_offset = _HEADER.size
+    list_offset = table_offset + len(entries) * _ENTRY.size
+    table = bytearray(len(entries) * _ENTRY.size)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.seek(list_offset)
+            f.write(_LIST_PREFIX)
+            f.write(quiz_array)
+            f.write(_LIST_SUFFIX)
+            list_length = len(_LIST_PREFIX) + len(quiz_array) + len(_LIST_SUFFIX)
+            offset = list_offset + list_length
+            bodies = iter(bodies)
+            for index, (quiz_id, number, version_id, updated_at) in enumerate(entries):
+                body = next(bodies)
+                f.write(body)
+                _ENTRY.pack_into(table, index * _ENTRY.size, quiz_id, number, version_id, _to_micros(updated_at),
+                                 offset, len(body))
+                offset += len(body)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, epoch.encode("ascii"), version, _to_micros(modified), len(entries), table_offset, list_offset,
+                                 list_length, list_offset + len(_LIST_PREFIX), len(quiz_array)))
+            f.write(table)
+            f.flush()
+            os.fsync(f.fileno())
+        current = read_header(path)
+        if current is not None and current[0] == epoch and current[1] >= version:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SnapshotStore:
+    """The snapshot this worker serves from, swapped when a newer file appears at ``path``.
+
+    ``accept`` is asked once per new file whether it belongs to the database being served.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0,
+                 accept: Optional[Callable[[CatalogSnapshot], bool]] = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.accept = accept
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._file_key = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def latest(self) -> Optional[CatalogSnapshot]:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.refresh()
+        return self._snapshot
+
+    def refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._file_key:
+            return
+        with self._lock:
+            if key == self._file_key:
+                return
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError) as exc:
+                logger.warning("Could not map catalog snapshot %s: %s", self.path, exc)
+                return
+            self._file_key = key
+            if self.accept is not None and not self.accept(snapshot):
+                logger.warning("Ignoring catalog snapshot %s: built from another database or a newer catalog "
+                               "(epoch %s, version %s)", self.path, snapshot.epoch, snapshot.version)
+                return
+            if self._snapshot is None or snapshot.version >= self._snapshot.version:
+                self._snapshot = snapshot
+
+
+class SnapshotPublisher:
+    """Runs ``build`` in a background thread after catalog writes, one build per burst of writes"""
+
+    def __init__(self, build: Callable[[], None], delay: float = 0.5):
+        self.build = build
+        self.delay = delay  # after a wakeup, wait this long so a burst of commits leads to one build
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait()
+            if self._stopping.wait(self.delay):
+                break
+            self._wake.clear()
+            try:
+                self.build()
+            except Exception:
+                logger.exception("Catalog snapshot build failed")
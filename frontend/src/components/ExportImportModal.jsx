@@ -59,7 +59,19 @@ const ExportImportModal = ({ isOpen, onClose, quizId, quizTitle }) => {
     setLoading(true);
     try {
       const quizIds = selectedQuizzes.join(',');
-      const response = await fetch(`http://localhost:8000/export-multiple-quizzes?quiz_ids=${quizIds}`);
+      let response = await fetch(`http://localhost:8000/export-multiple-quizzes?quiz_ids=${quizIds}`);
+      if (response.status === 202) {
+        // Large exports are built by a background job: poll it, then download its result
+        let job = await response.json();
+        while (job.status === 'queued' || job.status === 'running') {
+          setMessage({ type: 'success', text: `Exporting... ${Math.round(job.progress * 100)}%` });
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          job = await (await fetch(`http://localhost:8000/jobs/${job.id}`)).json();
+        }
+        response = job.status === 'succeeded'
+          ? await fetch(`http://localhost:8000${job.artifact_url}`)
+          : { ok: false };
+      }
       if (response.ok) {
         const data = await response.json();
         downloadJSON(data, `quizzes_export_${new Date().toISOString().split('T')[0]}.json`);
@@ -13,15 +13,29 @@ const RatingModal = ({ isOpen, onClose, quizTitle, quizId, username, onRatingSub
 
     setSubmitting(true);
     
-    // For demo purposes - just simulate success
-    setTimeout(() => {
+    try {
+      const response = await fetch(`http://localhost:8000/quizzes/${quizId}/ratings`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${localStorage.getItem('token')}`,
+        },
+        body: JSON.stringify({ rating, review })
+      });
+      if (!response.ok) {
+        throw new Error(`Rating failed with status ${response.status}`);
+      }
+      const data = await response.json();
       if (onRatingSubmitted) {
-        onRatingSubmitted({ rating, review });
+        onRatingSubmitted(data);
       }
       resetForm();
       onClose();
+    } catch (error) {
+      console.error('Failed to submit rating:', error);
+    } finally {
       setSubmitting(false);
-    }, 500);
+    }
   };
 
   const resetForm = () => {
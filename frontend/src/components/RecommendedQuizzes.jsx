@@ -20,11 +20,17 @@ const RecommendedQuizzes = () => {
 
   const fetchRecommendations = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/recommendations/${user.username}`);
+      const response = await fetch(
+        `http://localhost:8000/users/${user.username}/dashboard?fields=stats,recommendations`
+      );
       if (response.ok) {
-        const data = await response.json();
-        setRecommendations(data.recommendations);
-        setUserStats(data.user_stats);
+        const { stats, recommendations } = await response.json();
+        setRecommendations(recommendations);
+        setUserStats({
+          skill_level: stats.averageScore >= 80 ? 'advanced' : stats.averageScore >= 60 ? 'intermediate' : 'beginner',
+          total_attempts: stats.quizzesCompleted,
+          recent_avg_score: stats.averageScore
+        });
       }
     } catch (error) {
       console.error('Error fetching recommendations:', error);
@@ -190,7 +196,7 @@ const RecommendedQuizzes = () => {
                   </div>
                   <div className="meta-item">
                     <TrendingUp size={14} />
-                    <span>{quiz.attempts_count} attempts</span>
+                    <span>{quiz.rating_count} ratings</span>
                   </div>
                 </div>
 
@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import { Play, Users, Trophy, Brain } from 'lucide-react';
 import RecommendedQuizzes from '../components/RecommendedQuizzes';
 import '../components/RecommendedQuizzes.css';
+import { syncCatalog } from '../services/catalog';
 
 const Home = () => {
   const [stats, setStats] = useState({
@@ -18,23 +19,21 @@ const Home = () => {
   const fetchStats = async () => {
     try {
       console.log('Fetching stats from backend...');
-      const [quizzesResponse, leaderboardResponse] = await Promise.all([
-        fetch('http://localhost:8000/quizzes'),
+      const [quizzes, leaderboardResponse] = await Promise.all([
+        syncCatalog(),
         fetch('http://localhost:8000/leaderboard'),
       ]);
       
-      console.log('Quiz response status:', quizzesResponse.status);
       console.log('Leaderboard response status:', leaderboardResponse.status);
       
-      const quizzesData = await quizzesResponse.json();
       const leaderboardData = await leaderboardResponse.json();
       
-      console.log('Quizzes data:', quizzesData);
+      console.log('Quizzes in catalog:', quizzes.length);
       console.log('Leaderboard data:', leaderboardData);
       
       const newStats = {
         totalUsers: leaderboardData.leaderboard?.length || 0,
-        totalQuizzes: quizzesData.quizzes?.length || 0,
+        totalQuizzes: quizzes.length,
         totalAttempts: leaderboardData.leaderboard?.reduce((acc, user) => acc + (user.quizzes_taken || 0), 0) || 0,
       };
       
@@ -12,14 +12,34 @@ const Profile = () => {
   const navigate = useNavigate();
   const [darkMode, setDarkMode] = useState(false);
   const [activeTab, setActiveTab] = useState('overview');
-  const [userStats] = useState({
-    quizzesCompleted: 3,
-    averageScore: 85,
-    perfectScores: 1,
-    fastestTime: 95,
-    totalPoints: 500,
-    currentStreak: 10
+  const [userStats, setUserStats] = useState({
+    quizzesCompleted: 0,
+    averageScore: 0,
+    perfectScores: 0,
+    fastestTime: 0,
+    categoriesExplored: 0,
+    quizzesCreated: 0,
+    currentStreak: 0
   });
+  const [recentActivity, setRecentActivity] = useState([]);
+  const [rank, setRank] = useState(null);
+
+  useEffect(() => {
+    if (!user) {
+      return;
+    }
+    // One request for everything the profile shows; the server caches it per user
+    fetch(`http://localhost:8000/users/${user.username}/dashboard?fields=stats,history,rank&limit=3`)
+      .then(response => (response.ok ? response.json() : null))
+      .then(dashboard => {
+        if (dashboard) {
+          setUserStats(dashboard.stats);
+          setRecentActivity(dashboard.history);
+          setRank(dashboard.rank.rank);
+        }
+      })
+      .catch(error => console.error('Failed to fetch dashboard:', error));
+  }, [user]);
 
   useEffect(() => {
     if (!loading && !isAuthenticated) {
@@ -249,6 +269,10 @@ const Profile = () => {
                       <span className="metric-value">{userStats.currentStreak}</span>
                       <span className="metric-label">Current Streak</span>
                     </div>
+                    <div className="metric">
+                      <span className="metric-value">{rank ? `#${rank}` : '-'}</span>
+                      <span className="metric-label">Leaderboard Rank</span>
+                    </div>
                   </div>
                 </div>
               </div>
@@ -256,21 +280,20 @@ const Profile = () => {
               <div className="recent-activity">
                 <h3>Recent Activity</h3>
                 <div className="activity-list">
-                  <div className="activity-item">
-                    <Trophy size={20} />
-                    <span>Completed "JavaScript Basics" quiz</span>
-                    <span className="activity-time">2 hours ago</span>
-                  </div>
-                  <div className="activity-item">
-                    <Target size={20} />
-                    <span>Achieved "Perfect Score" badge</span>
-                    <span className="activity-time">1 day ago</span>
-                  </div>
-                  <div className="activity-item">
-                    <Clock size={20} />
-                    <span>Finished "React Concepts" in record time</span>
-                    <span className="activity-time">3 days ago</span>
-                  </div>
+                  {recentActivity.length === 0 ? (
+                    <div className="activity-item">
+                      <Target size={20} />
+                      <span>No quizzes completed yet</span>
+                    </div>
+                  ) : (
+                    recentActivity.map(attempt => (
+                      <div className="activity-item" key={attempt.id}>
+                        <Trophy size={20} />
+                        <span>Completed "{attempt.quiz_title}" with a score of {attempt.score}</span>
+                        <span className="activity-time">{new Date(attempt.date).toLocaleDateString()}</span>
+                      </div>
+                    ))
+                  )}
                 </div>
               </div>
             </div>
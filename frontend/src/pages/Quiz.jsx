@@ -114,6 +114,7 @@ const Quiz = () => {
       
       if (response.ok) {
         const resultData = {
+          quiz_id: quiz.id,
           quiz_title: quiz.title,
           total_questions: quiz.questions.length,
           correct_answers: correctAnswers,
@@ -12,7 +12,7 @@ const QuizHistory = () => {
   const fetchQuizHistory = async () => {
     try {
       setLoading(true);
-      const response = await fetch(`http://localhost:8000/quiz-history/${user.username}`);
+      const response = await fetch(`http://localhost:8000/users/${user.username}/dashboard?fields=history&limit=100`);
       if (response.ok) {
         const data = await response.json();
         setHistory(data.history);
@@ -23,6 +23,13 @@ const QuizHistory = () => {
     setLoading(false);
   };
 
+  useEffect(() => {
+    if (user) {
+      fetchQuizHistory();
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [user]);
+
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     return date.toLocaleDateString('en-US', {
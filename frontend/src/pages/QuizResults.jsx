@@ -155,7 +155,7 @@ const QuizResults = () => {
         isOpen={showRatingModal}
         onClose={() => setShowRatingModal(false)}
         quizTitle={quiz_title}
-        quizId={1} // Mock quiz ID
+        quizId={results.quiz_id}
         username="User" // Mock username
         onRatingSubmitted={handleRatingSubmitted}
       />
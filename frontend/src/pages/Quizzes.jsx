@@ -8,6 +8,7 @@ import '../components/ShareModal.css';
 import '../components/ExportImportModal.css';
 import '../components/CollaborationModal.css';
 import { useAuth } from '../services/AuthContext';
+import { syncCatalog } from '../services/catalog';
 
 const Quizzes = () => {
   const [quizzes, setQuizzes] = useState([]);
@@ -55,9 +56,7 @@ const Quizzes = () => {
 
   const fetchQuizzes = async () => {
     try {
-      const response = await fetch('http://localhost:8000/quizzes');
-      const data = await response.json();
-      setQuizzes(data.quizzes);
+      setQuizzes(await syncCatalog());
     } catch (error) {
       console.error('Error fetching quizzes:', error);
     }
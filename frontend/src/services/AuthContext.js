@@ -20,10 +20,10 @@ export const AuthProvider = ({ children }) => {
   const fetchUserProfile = useCallback(async (username) => {
     try {
       if (username) {
-        const response = await fetch(`http://localhost:8000/user-profile/${username}`);
+        const response = await fetch(`http://localhost:8000/users/${username}/dashboard?fields=profile`);
         if (response.ok) {
-          const profileData = await response.json();
-          setUser(prev => ({ ...prev, ...profileData }));
+          const { profile } = await response.json();
+          setUser(prev => ({ ...prev, ...profile }));
         }
       }
     } catch (error) {
@@ -60,7 +60,7 @@ export const AuthProvider = ({ children }) => {
       localStorage.setItem('token', access_token);
       axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
       
-      await fetchUserProfile();
+      await fetchUserProfile(username);
       toast.success('Logged in successfully!');
       return true;
     } catch (error) {
@@ -82,7 +82,7 @@ export const AuthProvider = ({ children }) => {
       localStorage.setItem('token', access_token);
       axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
       
-      await fetchUserProfile();
+      await fetchUserProfile(username);
       toast.success('Registered successfully!');
       return true;
     } catch (error) {
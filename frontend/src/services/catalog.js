@@ -0,0 +1,49 @@
+// Quiz catalog kept in localStorage and brought up to date with GET /quizzes/changes,
+// so a visit only downloads the quizzes that changed since the last one.
+const STORAGE_KEY = 'quizCatalog';
+
+const loadCatalog = () => {
+  try {
+    const stored = JSON.parse(localStorage.getItem(STORAGE_KEY));
+    if (stored && typeof stored.version === 'number' && stored.quizzes) {
+      return stored;
+    }
+  } catch (error) {
+    // Unreadable catalog: start over with a full sync
+  }
+  return { version: 0, quizzes: {} };
+};
+
+const sortedQuizzes = (catalog) => Object.values(catalog.quizzes).sort((a, b) => a.id - b.id);
+
+export const syncCatalog = async () => {
+  const catalog = loadCatalog();
+  let response;
+  try {
+    response = await fetch(`http://localhost:8000/quizzes/changes?since=${catalog.version}`);
+  } catch (error) {
+    // Offline: show what we have
+    if (catalog.version) {
+      return sortedQuizzes(catalog);
+    }
+    throw error;
+  }
+  if (!response.ok) {
+    throw new Error(`Catalog sync failed: ${response.status}`);
+  }
+  const delta = await response.json();
+  const quizzes = delta.reset ? {} : catalog.quizzes;
+  delta.upserts.forEach((quiz) => {
+    quizzes[quiz.id] = quiz;
+  });
+  delta.deletes.forEach((id) => {
+    delete quizzes[id];
+  });
+  const updated = { version: delta.version, quizzes };
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(updated));
+  } catch (error) {
+    // Storage full or disabled: the next visit does a full sync
+  }
+  return sortedQuizzes(updated);
+};